@@ -1,187 +1,523 @@
 # --- START OF FILE main_gui.py ---
 
+import time
+APP_START_TIME = time.perf_counter()  # Taken before the heavy imports, for time-to-interactive
+
 import sys
-import re
 import json
 from pathlib import Path
 import subprocess
 import shlex
-import time
 import os
-import psutil
-import pyqtgraph as pg # For plotting
-import monitoring_engine # NEW IMPORT
+import queue
+import threading
+from collections import deque
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import monitoring_engine # NEW IMPORT; psutil is only imported on its first sample
+from run_log import start_run_log, stop_run_log, log_event, file_size_or_none
 from PyQt6.QtCore import QTimer # For periodic updates
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
                              QPushButton, QLabel, QLineEdit, QFileDialog,QDialog,
-                             QComboBox, QProgressBar, QTextEdit, QListWidget, QTreeWidget,
-                             QTreeWidgetItem, QCheckBox, QSplitter, QSpinBox, QDoubleSpinBox, QGroupBox, QSizePolicy, QHeaderView)
+                             QComboBox, QProgressBar, QPlainTextEdit, QListWidget, QTreeView,
+                             QCheckBox, QSplitter, QSpinBox, QDoubleSpinBox, QGroupBox, QSizePolicy, QHeaderView)
 from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import QThread, pyqtSignal, Qt, QSettings
+from PyQt6.QtCore import QThread, pyqtSignal, Qt, QSettings, QAbstractItemModel, QModelIndex
 
 # Assuming timelapse_engine.py is in the same directory or Python path
 from timelapse_engine import (
-    find_potential_sequence_dirs,
-    generate_ffmpeg_commands_for_sequences_in_dir,
-    count_total_sequences_in_paths,
+    list_subdirectories,
+    find_sequences_in_dir,
+    merge_rollover_sequences,
+    SequenceChain,
+    BatchScheduler,
+    ScanIndex,
+    ProbeCache,
+    StderrRingBuffer,
+    ThroughputTracker,
+    FFmpegProgressParser,
+    add_progress_args,
+    format_duration,
+    format_byte_count,
+    set_probe_cache,
     ENGINE_DEFAULT_FILENAME_PREFIX,
-    ENGINE_DEFAULT_FILENAME_SUFFIX
+    ENGINE_DEFAULT_FILENAME_SUFFIX,
+    ENGINE_DEFAULT_DISCOVERY_WORKERS,
+    ENGINE_DEFAULT_MAX_FRAME_GAP,
+    default_concurrent_jobs,
+    build_common_settings,
+    ENGINE_CODEC_OPTIONS,
+    ENGINE_SCALE_OPTIONS,
+    ENGINE_DEFAULT_X264_X265_PRESET,
+    ENGINE_DEFAULT_PRORES_PROFILE_KEY,
+    ENGINE_DEFAULT_DNXHR_PROFILE_KEY,
+    ENGINE_DEFAULT_VP9_DEADLINE,
+    ENGINE_DEFAULT_VP9_CPU_USED
 )
 
 # --- GUI Default Configuration ---
 DEFAULT_PARENT_IMAGE_DIR = Path("timelapse_projects")
 DEFAULT_OUTPUT_DIR = Path("timelapses_output")  # Changed from your previous script's default
+DEFAULT_SCAN_INDEX_PATH = Path(".") / "timelapse_scan_index.sqlite3"
+DEFAULT_PROBE_CACHE_PATH = Path(".") / "timelapse_probe_cache.sqlite3"
+DEFAULT_RUN_LOG_PATH = Path(".") / "timelapse_run_logs" / "runs.jsonl"
 DEFAULT_INPUT_FPS = 24.0
 DEFAULT_OUTPUT_FPS = 24.0
 DEFAULT_CODEC_ID = "h264_mp4"
-DEFAULT_X264_X265_PRESET = "medium"
-DEFAULT_PRORES_PROFILE_KEY = "HQ"
-DEFAULT_DNXHR_PROFILE_KEY = "dnxhr_hq"  # Default to a profile string
-DEFAULT_VP9_DEADLINE = "good"
-DEFAULT_VP9_CPU_USED = 1
+DEFAULT_X264_X265_PRESET = ENGINE_DEFAULT_X264_X265_PRESET
+DEFAULT_PRORES_PROFILE_KEY = ENGINE_DEFAULT_PRORES_PROFILE_KEY
+DEFAULT_DNXHR_PROFILE_KEY = ENGINE_DEFAULT_DNXHR_PROFILE_KEY  # Default to a profile string
+DEFAULT_VP9_DEADLINE = ENGINE_DEFAULT_VP9_DEADLINE
+DEFAULT_VP9_CPU_USED = ENGINE_DEFAULT_VP9_CPU_USED
+DEFAULT_MAX_PROGRESS_RATE_HZ = 10.0  # Per FFmpeg worker; keeps several concurrent jobs from flooding the GUI
+DEFAULT_LOG_FLUSH_INTERVAL_MS = 100
+DEFAULT_LOG_MAX_LINES = 20000  # Oldest log lines are dropped beyond this, so overnight batches stay bounded
+DEFAULT_GPU_TYPE_CACHE_TTL_S = 7 * 24 * 3600  # Re-run GPU detection weekly; it can block for seconds
+DEFAULT_MONITOR_SAMPLE_INTERVAL_S = 1.0
+DEFAULT_MONITOR_HISTORY_S = 4 * 3600
+DEFAULT_TREE_AUTO_EXPAND_SEQUENCES = 2000  # Directories arriving after this many sequences start collapsed
+DEFAULT_MONITOR_DISPLAY_POINTS = 600  # Plots are downsampled to this many points, whatever the history length
 
 
 class FFmpegWorker(QThread):
-    progress_update = pyqtSignal(int, int)
+    progress_update = pyqtSignal(int, int, object)  # frame, total frames, {"fps", "speed", "out_time_us", "total_size"}
     log_message = pyqtSignal(str)
     finished = pyqtSignal(bool, str)
 
-    def __init__(self, ffmpeg_cmd_list, output_path, total_frames, is_verbose_logging): # Add new param
+    def __init__(self, ffmpeg_cmd_list, output_path, total_frames, is_verbose_logging,
+                 max_progress_rate_hz=DEFAULT_MAX_PROGRESS_RATE_HZ): # Add new param
         super().__init__()
+        self.min_progress_interval = 1.0 / max_progress_rate_hz if max_progress_rate_hz > 0 else 0.0
         self.ffmpeg_cmd_list = [str(arg) for arg in ffmpeg_cmd_list]
         self.output_path = output_path
         self.total_frames = total_frames
         self.process = None
-        self._is_cancelled = False # New flag
+        self._cancel_event = threading.Event() # Set from the GUI thread, polled by run() every few ms
         self.is_verbose_logging = is_verbose_logging # Store it
+        self._stderr_buffer = StderrRingBuffer() # Bounded: last lines plus errors/warnings
 
     def cancel_task(self):
+        """Non-blocking: terminates FFmpeg right away and lets run() wait for it and clean up."""
         self.log_message.emit(f"Cancellation requested for: {self.output_path.name}")
-        self._is_cancelled = True
+        self._cancel_event.set()
         if self.process and self.process.poll() is None: # If process is running
             try:
-                self.log_message.emit(f"Terminating FFmpeg process for {self.output_path.name}...")
                 self.process.terminate() # Try to terminate gracefully
-                # Wait a short moment for terminate to take effect
-                try:
-                    self.process.wait(timeout=2) # Wait up to 2 seconds
-                except subprocess.TimeoutExpired:
-                    self.log_message.emit(f"FFmpeg process for {self.output_path.name} did not terminate gracefully, killing...")
-                    self.process.kill() # Force kill if terminate didn't work
-                self.log_message.emit(f"FFmpeg process for {self.output_path.name} termination attempt complete.")
             except Exception as e:
                 self.log_message.emit(f"Error during FFmpeg process termination: {e}")
-        # The run loop will also check _is_cancelled
+
+    def _drain_stdout(self, pipe, line_queue):
+        """Reader thread: forwards -progress lines to run() and signals EOF with None."""
+        try:
+            for line in pipe:
+                line_queue.put(line)
+        except (OSError, ValueError) as e:
+            line_queue.put(e)
+        line_queue.put(None)
+
+    def _drain_stderr(self, pipe):
+        """
+        Reader thread: keeps reading stderr so a verbose FFmpeg can never block on a full pipe.
+        Lines go into a bounded ring buffer and, with verbose logging, are forwarded to the log as they arrive.
+        """
+        try:
+            for line in pipe:
+                self._stderr_buffer.append(line)
+                if self.is_verbose_logging and line.strip():
+                    self.log_message.emit(f"  [{self.output_path.name}] {line.rstrip()}")
+        except (OSError, ValueError):
+            pass
 
     def run(self):
         self.log_message.emit(f"Starting FFmpeg for: {self.output_path.name} ({self.total_frames} frames)")
 
-        progress_arg = "-progress";
-        progress_pipe = "pipe:1"
-        str_ffmpeg_cmd_list = [str(arg) for arg in self.ffmpeg_cmd_list]
-        ffmpeg_cmd_with_progress = []
-        try:
-            i_index = str_ffmpeg_cmd_list.index('-i')
-            ffmpeg_cmd_with_progress = str_ffmpeg_cmd_list[:i_index] + [progress_arg,
-                                                                        progress_pipe] + str_ffmpeg_cmd_list[i_index:]
-        except ValueError:
-            ffmpeg_cmd_with_progress = [str_ffmpeg_cmd_list[0], progress_arg, progress_pipe] + str_ffmpeg_cmd_list[1:]
-            self.log_message.emit("Warning: Could not reliably place -progress option using -i; attempting fallback.")
+        ffmpeg_cmd_with_progress = add_progress_args(self.ffmpeg_cmd_list)
 
         self.log_message.emit(
             f"  Executing FFmpeg: {' '.join(shlex.quote(arg) for arg in ffmpeg_cmd_with_progress)}")  # Log the actual command
 
         self.process = None
+        self.return_code = None  # FFmpeg's exit code once it has exited; None if it never started
+        reader_threads = []
         try:
             creation_flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             self.process = subprocess.Popen(
                 ffmpeg_cmd_with_progress,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                text=True, bufsize=1, universal_newlines=True,
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                text=True, errors="replace", bufsize=1,  # Localized names and code pages are not always UTF-8
                 creationflags=creation_flags
             )
-
-            if self.process.stdout is None:
-                self.log_message.emit("Error: FFmpeg stdout pipe is None. Cannot read progress.")
-                self.finished.emit(False, f"{str(self.output_path)} (Pipe Error)")
-                return
-
-            # Progress reading loop
-            while self.process.poll() is None:  # Loop while process is running
-                if self._is_cancelled:
-                    self.log_message.emit(f"Cancellation signal received for {self.output_path.name}.")
-                    break
-
-                    # Try to read a line, but don't block indefinitely if Popen/pipe has issues.
-                # This part is tricky without true non-blocking reads or select.
-                # For now, readline() is standard. If it hangs, FFmpeg is not sending newlines or closing stdout.
+            if self._cancel_event.is_set():  # Cancelled while starting up
+                self.process.terminate()
+
+            # Both pipes are drained by their own threads, so neither can fill up and stall the encode
+            stdout_queue = queue.Queue()
+            reader_threads = [
+                threading.Thread(target=self._drain_stdout, args=(self.process.stdout, stdout_queue), daemon=True),
+                threading.Thread(target=self._drain_stderr, args=(self.process.stderr,), daemon=True)]
+            for reader_thread in reader_threads:
+                reader_thread.start()
+
+            # Progress reading loop; wakes up every 10 ms at most to notice cancellation.
+            # Progress blocks are coalesced and emitted at most max_progress_rate_hz times per second,
+            # and the final block is always emitted.
+            progress = FFmpegProgressParser()
+            last_emit_time, has_unsent_progress = 0.0, False
+            while not self._cancel_event.is_set():
                 try:
-                    line = self.process.stdout.readline()  # This is the primary suspect for hangs
-                    if not line:  # Empty line can mean EOF if process also ended
-                        if self.process.poll() is not None:
-                            break  # Break if process ended
-                        else:
-                            time.sleep(0.05); continue  # Process alive, but no data yet, short sleep
-                except Exception as e_readline:
-                    self.log_message.emit(f"Error reading FFmpeg stdout line: {e_readline}")
-                    break  # Exit progress loop on read error
-
-                if line:
-                    line = line.strip()
-                    if '=' in line:
-                        try:
-                            key, value = line.split('=', 1)
-                            key = key.strip();
-                            value = value.strip()
-                            if key == "frame":
-                                self.progress_update.emit(int(value), self.total_frames)
-                            elif key == "progress" and value == "end":
-                                self.progress_update.emit(self.total_frames, self.total_frames)
-                                break  # Break from progress loop
-                        except ValueError:
-                            self.log_message.emit(f"Warning: Could not parse progress: {line}")
+                    line = stdout_queue.get(timeout=0.01)
+                except queue.Empty:
+                    continue
+                if line is None:  # stdout closed: FFmpeg is exiting
+                    break
+                if isinstance(line, Exception):
+                    self.log_message.emit(f"Error reading FFmpeg stdout line: {line}")
+                    continue
+                if not progress.feed(line):
+                    continue
+                has_unsent_progress = True
+                now = time.monotonic()
+                if progress.ended:
+                    self.progress_update.emit(self.total_frames, self.total_frames, dict(progress.stats))
+                    has_unsent_progress = False
+                elif now - last_emit_time >= self.min_progress_interval:
+                    self.progress_update.emit(progress.frame, self.total_frames, dict(progress.stats))
+                    last_emit_time, has_unsent_progress = now, False
+            if has_unsent_progress:  # Latest coalesced value, in case FFmpeg exited without progress=end
+                self.progress_update.emit(progress.frame, self.total_frames, dict(progress.stats))
 
             # After loop, ensure cancellation is handled
-            if self._is_cancelled:
-                if self.process and self.process.poll() is None:  # If still running
+            if self._cancel_event.is_set():
+                self.log_message.emit(f"Cancellation signal received for {self.output_path.name}.")
+                if self.process.poll() is None:  # If still running
                     self.process.terminate()
                     try:
                         self.process.wait(timeout=2)
                     except subprocess.TimeoutExpired:
+                        self.log_message.emit(f"FFmpeg process for {self.output_path.name} did not terminate gracefully, killing...")
                         self.process.kill()
+                self.return_code = self.process.poll()
                 self.log_message.emit(f"Task {self.output_path.name} confirmed cancelled.")
                 self.finished.emit(False, f"{str(self.output_path)} (Cancelled)")
                 return
 
-            # Process finished normally or broke from progress=end
-            # Wait for full termination and get remaining output
-            stdout_final, stderr_final = self.process.communicate(timeout=120)
+            # Process finished normally; wait for full termination and collect remaining stderr
+            self.process.wait(timeout=120)
+            for reader_thread in reader_threads:
+                reader_thread.join(timeout=5)
 
+            self.return_code = self.process.returncode
             if self.process.returncode == 0: # SUCCESS
                 self.log_message.emit(f"Successfully created: {str(self.output_path)}")
-                if self.is_verbose_logging:
-                    if stderr_final and stderr_final.strip(): # Only log if there's actual stderr content
-                        self.log_message.emit(f"FFmpeg messages for {self.output_path.name} (verbose):\n{stderr_final.strip()}")
-                # else: (if not verbose on success) do not log stderr_final
+                # Verbose stderr has already been forwarded line by line
                 self.finished.emit(True, str(self.output_path))
             else: # FAILURE
                 self.log_message.emit(f"ERROR: FFmpeg command failed for {self.output_path} (exit code {self.process.returncode})")
-                # Always log full stderr on actual FFmpeg error, regardless of verbose setting, as it's crucial for debugging.
-                if stderr_final and stderr_final.strip():
-                    self.log_message.emit(f"FFmpeg stderr:\n{stderr_final.strip()}")
+                # Always log stderr diagnostics on actual FFmpeg error, regardless of verbose setting, as it's crucial for debugging.
+                stderr_diagnostics = self._stderr_buffer.format_diagnostics()
+                if stderr_diagnostics:
+                    self.log_message.emit(f"FFmpeg stderr:\n{stderr_diagnostics}")
                 else:
                     self.log_message.emit("FFmpeg stderr: (No further error output from FFmpeg)") # If stderr was empty
                 self.finished.emit(False, str(self.output_path))
 
-        # ... (except FileNotFoundError, subprocess.TimeoutExpired, Exception as e) ...
-        # Ensure these except blocks also emit self.finished(False, ...)
+        except FileNotFoundError:
+            self.log_message.emit("ERROR: ffmpeg executable not found. Is FFmpeg installed and on PATH?")
+            self.finished.emit(False, f"{str(self.output_path)} (FFmpeg not found)")
+        except subprocess.TimeoutExpired:
+            self.log_message.emit(f"ERROR: FFmpeg for {self.output_path.name} did not exit after closing its output.")
+            self.finished.emit(False, f"{str(self.output_path)} (Timeout)")
+        except Exception as e:
+            self.log_message.emit(f"ERROR: Unexpected error running FFmpeg for {self.output_path.name}: {e}")
+            self.finished.emit(False, f"{str(self.output_path)} (Error)")
 
         finally:
             if self.process and self.process.poll() is None:
                 self.log_message.emit(
                     f"Ensuring FFmpeg process termination for {self.output_path.name} (in finally)...")
                 self.process.kill();
-                self.process.communicate()
+                self.process.wait()
+            if self.process:
+                self.return_code = self.process.returncode
+            for reader_thread in reader_threads:
+                reader_thread.join(timeout=1)
+
+class GpuDetectWorker(QThread):
+    """Runs monitoring_engine.detect_gpu_type off the GUI thread; nvidia-smi can take seconds to answer."""
+    gpu_detected = pyqtSignal(str)  # "nvidia", ..., or "" if none
+
+    def run(self):
+        try:
+            gpu_type = monitoring_engine.detect_gpu_type()
+        except Exception:
+            gpu_type = None
+        self.gpu_detected.emit(gpu_type or "")
+
+class RolloverMergeWorker(QThread):
+    """Runs merge_rollover_sequences off the GUI thread; it reads image headers and may start ffprobe."""
+    merged = pyqtSignal(object)  # [Sequence | SequenceChain], or the input list unchanged on error
+    log_message = pyqtSignal(str)
+
+    def __init__(self, sequences):
+        super().__init__()
+        self.sequences = sequences
+
+    def run(self):
+        try:
+            sequences = merge_rollover_sequences(self.sequences)
+        except Exception as e:
+            self.log_message.emit(f"Could not merge camera folder rollovers: {e}")
+            sequences = self.sequences
+        self.merged.emit(sequences)
+
+class ScanWorker(QThread):
+    """Discovers sequence directories and streams each directory's sequences back as soon as it is scanned."""
+    dirs_discovered = pyqtSignal(int)  # Number of subdirectories about to be scanned
+    directory_scanned = pyqtSignal(object, object, str)  # dir Path, [Sequence] ([] if no file matched), error text
+    log_message = pyqtSignal(str)
+    scan_finished = pyqtSignal(bool)  # True if the scan ran to completion, False if cancelled
+
+    def __init__(self, parent_dir_path, filename_prefix, filename_suffix, scan_index, max_workers, ignore_case=False,
+                 max_frame_gap=ENGINE_DEFAULT_MAX_FRAME_GAP):
+        super().__init__()
+        self.parent_dir_path = Path(parent_dir_path)
+        self.filename_prefix = filename_prefix
+        self.filename_suffix = filename_suffix
+        self.ignore_case = ignore_case
+        self.max_frame_gap = max_frame_gap
+        self.scan_index = scan_index
+        self.max_workers = max(1, max_workers)
+        self._is_cancelled = False
+
+    def cancel_scan(self):
+        self._is_cancelled = True
+
+    def _scan_one_dir(self, dir_path):
+        if self._is_cancelled:
+            return dir_path, [], "Cancelled"
+        try:
+            return dir_path, find_sequences_in_dir(dir_path, self.filename_prefix, self.filename_suffix,
+                                                   scan_index=self.scan_index, ignore_case=self.ignore_case,
+                                                   max_frame_gap=self.max_frame_gap), ""
+        except Exception as e:
+            return dir_path, [], str(e)
+
+    def run(self):
+        try:
+            dirs_to_scan = list_subdirectories(self.parent_dir_path)
+        except OSError as e:
+            self.log_message.emit(f"Error while listing sequence directories: {e}")
+            dirs_to_scan = []
+        self.dirs_discovered.emit(len(dirs_to_scan))
+        if self._is_cancelled or not dirs_to_scan:
+            self.scan_finished.emit(not self._is_cancelled)
+            return
+
+        # Each directory is reported as soon as its own scan completes, so one slow directory holds back
+        # nothing else; the model keeps directories sorted by name whatever order they arrive in
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(dirs_to_scan)))
+        try:
+            futures = [executor.submit(self._scan_one_dir, dir_path) for dir_path in dirs_to_scan]
+            for future in as_completed(futures):
+                if self._is_cancelled:
+                    break
+                self.directory_scanned.emit(*future.result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self.scan_finished.emit(not self._is_cancelled)
+
+class _ScannedDirectory:
+    """One scanned directory in SequenceTreeModel: its sequences plus a byte-per-sequence check state."""
+    __slots__ = ("path", "sort_key", "internal_id", "sequences", "message", "checked", "checked_count",
+                 "fetched_count")
+
+    def __init__(self, path, sequences, message, internal_id):
+        self.path = path
+        self.sort_key = (path.name, str(path))
+        self.internal_id = internal_id  # internalId of its sequence rows; stays valid when rows are inserted above
+        self.sequences = sequences
+        self.message = message  # Shown as the only child row when there is nothing to render
+        self.checked = bytearray(b"\x01" * len(sequences))  # Everything starts checked, as before
+        self.checked_count = len(sequences)
+        self.fetched_count = 0  # Sequence rows exposed to the view so far (see fetchMore)
+
+class SequenceTreeModel(QAbstractItemModel):
+    """
+    Two-level model of scan results (directory -> sequences) for a QTreeView.
+    Sequence rows are handed to the view in batches through fetchMore, so huge directories cost nothing
+    until expanded. Each directory keeps a checked count next to its check bytes, so a directory's
+    tri-state and a child toggle are O(1); checking a whole directory is a single bytearray fill.
+    Directories are kept sorted by name as they arrive from the scan, in any order.
+    """
+    FETCH_BATCH_SIZE = 500
+    DIRECTORY_ID = 0  # internalId of directory rows; sequence rows use their directory's internal_id
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._directories = []  # In row order
+        self._sort_keys = []  # Sort key of each row, for bisect
+        self._directories_by_id = []  # In arrival order; internal_id - 1 indexes it
+        self.total_sequences = 0
+
+    # --- Building ---
+    def clear(self):
+        self.beginResetModel()
+        self._directories = []
+        self._sort_keys = []
+        self._directories_by_id = []
+        self.total_sequences = 0
+        self.endResetModel()
+
+    def add_directory(self, dir_path, sequences, error_text=""):
+        if error_text:
+            message = f"(Error scanning: {error_text})"
+        elif not sequences:
+            message = "(No sequences detected with current settings)"
+        else:
+            message = ""
+        directory = _ScannedDirectory(dir_path, list(sequences), message, len(self._directories_by_id) + 1)
+        row = bisect_right(self._sort_keys, directory.sort_key)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._directories.insert(row, directory)
+        self._sort_keys.insert(row, directory.sort_key)
+        self._directories_by_id.append(directory)
+        self.total_sequences += len(sequences)
+        self.endInsertRows()
+        return self.index(row, 0)
+
+    def checked_sequences(self):
+        """Yields (directory path, Sequence) for every checked sequence, fetched into the view or not."""
+        for directory in self._directories:
+            if directory.checked_count == 0:
+                continue
+            for sequence, is_checked in zip(directory.sequences, directory.checked):
+                if is_checked:
+                    yield directory.path, sequence
+
+    # --- Structure ---
+    def _directory_of(self, index):
+        """The _ScannedDirectory of a directory row or sequence row, and whether the index is a sequence row."""
+        if index.internalId() == self.DIRECTORY_ID:
+            return self._directories[index.row()], False
+        return self._directories_by_id[index.internalId() - 1], True
+
+    def index(self, row, column, parent=QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, self.DIRECTORY_ID)
+        return self.createIndex(row, column, self._directories[parent.row()].internal_id)
+
+    def parent(self, index):
+        if not index.isValid() or index.internalId() == self.DIRECTORY_ID:
+            return QModelIndex()
+        directory = self._directories_by_id[index.internalId() - 1]
+        return self.createIndex(bisect_left(self._sort_keys, directory.sort_key), 0, self.DIRECTORY_ID)
+
+    def rowCount(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return len(self._directories)
+        if parent.column() != 0 or parent.internalId() != self.DIRECTORY_ID:
+            return 0
+        directory = self._directories[parent.row()]
+        return 1 if directory.message else directory.fetched_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 2
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._directories)
+        return parent.column() == 0 and parent.internalId() == self.DIRECTORY_ID
+
+    def canFetchMore(self, parent):
+        if not parent.isValid() or parent.internalId() != self.DIRECTORY_ID:
+            return False
+        directory = self._directories[parent.row()]
+        return not directory.message and directory.fetched_count < len(directory.sequences)
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        directory = self._directories[parent.row()]
+        first = directory.fetched_count
+        last = min(len(directory.sequences), first + self.FETCH_BATCH_SIZE) - 1
+        self.beginInsertRows(parent, first, last)
+        directory.fetched_count = last + 1
+        self.endInsertRows()
+
+    # --- Data and check state ---
+    def _directory_check_state(self, directory):
+        if directory.checked_count == 0:
+            return Qt.CheckState.Unchecked
+        if directory.checked_count == len(directory.sequences):
+            return Qt.CheckState.Checked
+        return Qt.CheckState.PartiallyChecked
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        directory, is_sequence_row = self._directory_of(index)
+        if not is_sequence_row and not directory.sequences:
+            return Qt.ItemFlag.NoItemFlags  # Nothing to render in this directory
+        if is_sequence_row and directory.message:
+            return Qt.ItemFlag.ItemIsEnabled
+        item_flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() == 0:
+            item_flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return item_flags
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        directory, is_sequence_row = self._directory_of(index)
+        if not is_sequence_row:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return str(directory.path.name) if index.column() == 0 else str(len(directory.sequences) or "")
+            if role == Qt.ItemDataRole.CheckStateRole and index.column() == 0:
+                return self._directory_check_state(directory)
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return str(directory.path)
+            return None
+        if directory.message:
+            return f"  {directory.message}" if role == Qt.ItemDataRole.DisplayRole and index.column() == 0 else None
+        sequence = directory.sequences[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"  Sequence starting ~{sequence.start_number_str}" if index.column() == 0 else str(sequence.frame_count)
+        if role == Qt.ItemDataRole.CheckStateRole and index.column() == 0:
+            return Qt.CheckState.Checked if directory.checked[index.row()] else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.UserRole:
+            return sequence
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.CheckStateRole or not index.isValid() or index.column() != 0:
+            return False
+        is_checked = Qt.CheckState(value) == Qt.CheckState.Checked
+        directory, is_sequence_row = self._directory_of(index)
+        if is_sequence_row:
+            if directory.message or bool(directory.checked[index.row()]) == is_checked:
+                return False
+            directory.checked[index.row()] = is_checked
+            directory.checked_count += 1 if is_checked else -1
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+            directory_index = self.parent(index)
+            self.dataChanged.emit(directory_index, directory_index, [Qt.ItemDataRole.CheckStateRole])
+            return True
+        if not directory.sequences:
+            return False
+        directory.checked[:] = (b"\x01" if is_checked else b"\x00") * len(directory.sequences)
+        directory.checked_count = len(directory.sequences) if is_checked else 0
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        if directory.fetched_count:
+            self.dataChanged.emit(self.index(0, 0, index), self.index(directory.fetched_count - 1, 0, index),
+                                  [Qt.ItemDataRole.CheckStateRole])
+        return True
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return ["Directory / Sequence", "Frames"][section]
+        return None
 
 class TimelapseApp(QWidget):
     def __init__(self):
@@ -189,88 +525,34 @@ class TimelapseApp(QWidget):
         self.setWindowTitle("Python Timelapse Maker GUI v0.4")
         self.setGeometry(100, 100, 950, 850)  # Adjusted size
 
-        self.codec_data_list_for_ui = [  # Ensure this matches your engine's expectations if separated
-            {"id": "h264_mp4", "name": "H.264 / .mp4 (Compat)", "base_codec": "libx264",
-             "hw_variants": {"nvenc": "h264_nvenc", "qsv": "h264_qsv", "amf": "h264_amf"}, "ext": ".mp4",
-             "pix_fmt": "yuv420p", "quality_type": "crf", "default_crf": 23,
-             "presets": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower",
-                         "veryslow"], "default_preset_key": DEFAULT_X264_X265_PRESET, "hw_quality_type": "cq",
-             "hw_default_cq": 23, "hw_presets": {
-                "nvenc": ["default", "p1", "p2", "p3", "p4", "p5", "p6", "p7", "slow", "medium", "fast", "hp", "hq",
-                          "bd", "ll", "llhq", "llhp", "lossless", "losslesshp"], "qsv": None,
-                "amf": ["ultrafast", "fast", "balanced", "quality", "highquality"]}},
-            {"id": "h265_mp4", "name": "H.265 (HEVC) / .mp4", "base_codec": "libx265",
-             "hw_variants": {"nvenc": "hevc_nvenc", "qsv": "hevc_qsv", "amf": "hevc_amf"}, "ext": ".mp4",
-             "pix_fmt": "yuv420p", "quality_type": "crf", "default_crf": 28,
-             "presets": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower",
-                         "veryslow"], "default_preset_key": DEFAULT_X264_X265_PRESET, "hw_quality_type": "cq",
-             "hw_default_cq": 28, "hw_presets": {
-                "nvenc": ["default", "p1", "p2", "p3", "p4", "p5", "p6", "p7", "slow", "medium", "fast", "hp", "hq",
-                          "bd", "ll", "llhq", "llhp", "lossless", "losslesshp"], "qsv": None,
-                "amf": ["ultrafast", "fast", "balanced", "quality", "highquality"]}},
-            {"id": "h265_mkv", "name": "H.265 (HEVC) / .mkv", "base_codec": "libx265",
-             "hw_variants": {"nvenc": "hevc_nvenc", "qsv": "hevc_qsv", "amf": "hevc_amf"}, "ext": ".mkv",
-             "pix_fmt": "yuv420p", "quality_type": "crf", "default_crf": 28,
-             "presets": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower",
-                         "veryslow"], "default_preset_key": DEFAULT_X264_X265_PRESET, "hw_quality_type": "cq",
-             "hw_default_cq": 28, "hw_presets": {
-                "nvenc": ["default", "p1", "p2", "p3", "p4", "p5", "p6", "p7", "slow", "medium", "fast", "hp", "hq",
-                          "bd", "ll", "llhq", "llhp", "lossless", "losslesshp"], "qsv": None,
-                "amf": ["ultrafast", "fast", "balanced", "quality", "highquality"]}},
-            {"id": "vp9_webm", "name": "VP9 / .webm (Web)", "base_codec": "libvpx-vp9", "hw_variants": {},
-             "ext": ".webm", "pix_fmt": "yuv420p", "quality_type": "crf_vp9", "default_crf": 31,
-             "deadlines": ["realtime", "good", "best"], "default_deadline_key": DEFAULT_VP9_DEADLINE,
-             "default_cpu_used": DEFAULT_VP9_CPU_USED},
-            {"id": "vp9_mkv", "name": "VP9 / .mkv", "base_codec": "libvpx-vp9", "hw_variants": {}, "ext": ".mkv",
-             "pix_fmt": "yuv420p", "quality_type": "crf_vp9", "default_crf": 31,
-             "deadlines": ["realtime", "good", "best"], "default_deadline_key": DEFAULT_VP9_DEADLINE,
-             "default_cpu_used": DEFAULT_VP9_CPU_USED},
-            {"id": "prores_ks_hq_mov", "name": "ProRes 422 HQ / .mov", "base_codec": "prores_ks", "hw_variants": {},
-             "ext": ".mov", "pix_fmt": "yuv422p10le", "quality_type": "prores_profile",
-             "prores_profiles_map": {"Proxy": 0, "LT": 1, "Standard": 2, "HQ": 3, "4444": 4, "4444XQ": 5},
-             "default_profile_key": DEFAULT_PRORES_PROFILE_KEY},
-            {"id": "prores_ks_std_mov", "name": "ProRes 422 Standard / .mov", "base_codec": "prores_ks",
-             "hw_variants": {}, "ext": ".mov", "pix_fmt": "yuv422p10le", "quality_type": "prores_profile",
-             "prores_profiles_map": {"Proxy": 0, "LT": 1, "Standard": 2, "HQ": 3, "4444": 4, "4444XQ": 5},
-             "default_profile_key": "Standard"},
-            {"id": "dnxhr_hqx_mov", "name": "DNxHR HQX (12-bit) / .mov", "base_codec": "dnxhd", "hw_variants": {},
-             "ext": ".mov", "pix_fmt": "yuv422p10le", "quality_type": "dnx_profile",
-             "dnx_profiles_list": ["dnxhr_hqx", "dnxhr_hq", "dnxhr_sq", "dnxhr_lb"],
-             "default_dnx_profile_key": "dnxhr_hqx"},
-            {"id": "dnxhr_hq_mov", "name": "DNxHR HQ (8-bit) / .mov", "base_codec": "dnxhd", "hw_variants": {},
-             "ext": ".mov", "pix_fmt": "yuv420p", "quality_type": "dnx_profile",
-             "dnx_profiles_list": ["dnxhr_hqx", "dnxhr_hq", "dnxhr_sq", "dnxhr_lb"],
-             "default_dnx_profile_key": DEFAULT_DNXHR_PROFILE_KEY}
-        ]
-        self.scale_options_map_for_ui = {
-            "original": {"desc": "Original (no scaling)", "filter": ""},
-            "percentage": {"desc": "Percentage of original",
-                           "filter_template": "scale=w=trunc(iw*{val}/100/2)*2:h=-2:flags=lanczos"},
-            "6K": {"desc": "6k (6016xH)", "filter": "scale=6016:-2:flags=lanczos"},
-            "4K": {"desc": "4k (3840xH)", "filter": "scale=3840:-2:flags=lanczos"},
-            "1080p": {"desc": "1080p (1920xH)", "filter": "scale=1920:-2:flags=lanczos"},
-            "720p": {"desc": "720p (1280xH)", "filter": "scale=1280:-2:flags=lanczos"},
-            "custom": {"desc": "Custom WxH", "filter_template": "scale={w}:{h}:flags=lanczos"}
-        }
+        self.codec_data_list_for_ui = ENGINE_CODEC_OPTIONS
+        self.scale_options_map_for_ui = ENGINE_SCALE_OPTIONS
         self.presets_dir = Path(".") / "timelapse_presets"  # Changed name
         self.presets_dir.mkdir(parents=True, exist_ok=True)
+        self.scan_index = ScanIndex(DEFAULT_SCAN_INDEX_PATH)  # Reuses sequence scans of unchanged directories
+        self.probe_cache = ProbeCache(DEFAULT_PROBE_CACHE_PATH)  # Reuses image probes across renders
+        set_probe_cache(self.probe_cache)
+        start_run_log(DEFAULT_RUN_LOG_PATH)  # JSON-lines history of scans, probes and jobs
         self.settings = QSettings("My Timelapse App", "TimelapseMakerGUI")  # More specific org/app names
         self.current_theme = self.settings.value("theme", "light", type=str)  # Specify type for QSettings
         self.cpu_plot_widget = None
         self.cpu_plot_data_line = None
         self.log_text_edit = None
+        self.pending_log_lines = deque()  # Filled by log() from any thread, drained by log_flush_timer
         self.theme_toggle_button = None # Ensure it's defined before apply_theme is called if init_ui is separate
 
-        self.active_ffmpeg_worker = None # To keep track of the currently running FFmpeg task
+        self.running_jobs = {} # FFmpegWorker -> job progress info, for every currently running FFmpeg task
+        self.batch_scheduler = None # Hands out the jobs of the running batch
+        self.active_scan_worker = None # Background directory scan, if one is running
+        self.rollover_merge_worker = None # Background rollover merge before a batch starts
         self.batch_cancelled_flag = False # Flag to stop processing further items in batch
+        self.batch_job_slots = 1 # Concurrent FFmpeg jobs for the running batch
 
         self.init_ui()
 
-        self.ffmpeg_workers = []
+        self.ffmpeg_workers = [] # Every started worker, kept referenced until its thread exits
         self.sequences_queue_for_batch = []
-        self.current_batch_sequence_index = 0
         self.current_batch_sequence_generator = None
-        self.processed_sequences_in_batch_count = 0  # For overall progress
         self.gpu_type_detected = None  # Store detected GPU type
         self.init_monitoring_data_and_start() # Initialize monitoring components
 
@@ -314,14 +596,34 @@ class TimelapseApp(QWidget):
         filename_layout = QGridLayout();
         filename_layout.addWidget(QLabel("Filename Prefix:"), 0, 0);
         self.filename_prefix_edit = QLineEdit(ENGINE_DEFAULT_FILENAME_PREFIX);
+        self.filename_prefix_edit.setToolTip('Separate alternatives with "|" (e.g. IMG_|DSC). * and ? are wildcards; '
+                                             'a template such as GOPR{frame}.JPG matches whole filenames');
         filename_layout.addWidget(self.filename_prefix_edit, 0, 1);
         filename_layout.addWidget(QLabel("Filename Suffix:"), 0, 2);
         self.filename_suffix_edit = QLineEdit(ENGINE_DEFAULT_FILENAME_SUFFIX);
+        self.filename_suffix_edit.setToolTip('Separate alternatives with "|" (e.g. .JPG|.jpeg)');
         filename_layout.addWidget(self.filename_suffix_edit, 0, 3);
+        self.filename_ignore_case_check = QCheckBox("Ignore Case");
+        filename_layout.addWidget(self.filename_ignore_case_check, 0, 4);
+        self.merge_rollovers_check = QCheckBox("Merge Camera Folder Rollovers");
+        self.merge_rollovers_check.setToolTip("Encode selected sequences that continue into the next camera folder "
+                                              "(e.g. 100CANON/IMG_9999 -> 101CANON/IMG_0001) as one video");
+        filename_layout.addWidget(self.merge_rollovers_check, 2, 0, 1, 2);
+        filename_layout.addWidget(QLabel("Max Frame Gap:"), 2, 2);
+        self.max_frame_gap_spin = QSpinBox();
+        self.max_frame_gap_spin.setRange(0, 10000);
+        self.max_frame_gap_spin.setValue(ENGINE_DEFAULT_MAX_FRAME_GAP);
+        self.max_frame_gap_spin.setSpecialValueText("Split");  # 0 = a sequence ends at the first missing frame
+        self.max_frame_gap_spin.setToolTip("Keep a sequence together across up to this many missing frames (applies on the next scan)");
+        filename_layout.addWidget(self.max_frame_gap_spin, 2, 3);
+        self.hold_frame_gaps_check = QCheckBox("Hold Frame Over Gaps");
+        self.hold_frame_gaps_check.setChecked(True);
+        self.hold_frame_gaps_check.setToolTip("Show the frame before a gap for the missing frames' time; off = skip the gap");
+        filename_layout.addWidget(self.hold_frame_gaps_check, 2, 4);
         filename_layout.addWidget(QLabel("Output File Base Name (Optional):"), 1, 0);
         self.output_basename_edit = QLineEdit();
         self.output_basename_edit.setPlaceholderText("Default: <Input_Directory_Name>");
-        filename_layout.addWidget(self.output_basename_edit, 1, 1, 1, 3);
+        filename_layout.addWidget(self.output_basename_edit, 1, 1, 1, 4);
         filename_group.setLayout(filename_layout);
         main_layout.addWidget(filename_group)
 
@@ -411,13 +713,18 @@ class TimelapseApp(QWidget):
         self.scan_button.clicked.connect(self.scan_directories_action);
         self.scan_button.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed);
         action_and_cancel_layout.addWidget(self.scan_button);
+        self.cancel_scan_button = QPushButton("Cancel Scan");
+        self.cancel_scan_button.clicked.connect(self.cancel_scan_action);
+        self.cancel_scan_button.setEnabled(False);
+        self.cancel_scan_button.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed);
+        action_and_cancel_layout.addWidget(self.cancel_scan_button);
         self.start_button = QPushButton("Start Batch Processing");
         self.start_button.setEnabled(False);
         self.start_button.clicked.connect(self.start_batch_action);
         self.start_button.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed);
         action_and_cancel_layout.addWidget(self.start_button);
         action_and_cancel_layout.addStretch();
-        self.cancel_current_button = QPushButton("Cancel Current Sequence");
+        self.cancel_current_button = QPushButton("Cancel Current Sequence(s)");
         self.cancel_current_button.clicked.connect(self.cancel_current_action);
         self.cancel_current_button.setEnabled(False);
         self.cancel_current_button.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed);
@@ -435,6 +742,17 @@ class TimelapseApp(QWidget):
         self.verbose_log_checkbox.setChecked(False);
         log_options_layout.addWidget(self.verbose_log_checkbox);
         log_options_layout.addStretch();
+        log_options_layout.addWidget(QLabel("Parallel Jobs:"));
+        self.parallel_jobs_spin = QSpinBox();
+        self.parallel_jobs_spin.setRange(0, 64);
+        self.parallel_jobs_spin.setSpecialValueText("Auto");  # 0 = pick from core count and codec
+        self.parallel_jobs_spin.setToolTip("Number of sequences encoded at the same time (Auto = based on CPU cores and codec)");
+        log_options_layout.addWidget(self.parallel_jobs_spin);
+        log_options_layout.addWidget(QLabel("Chunks per Sequence:"));
+        self.chunks_per_sequence_spin = QSpinBox();
+        self.chunks_per_sequence_spin.setRange(1, 64);
+        self.chunks_per_sequence_spin.setToolTip("Split long sequences into this many parts encoded in parallel, then joined losslessly (1 = off)");
+        log_options_layout.addWidget(self.chunks_per_sequence_spin);
         main_layout.addLayout(log_options_layout)
 
         # --- Create a QSplitter for the main display areas ---
@@ -444,10 +762,16 @@ class TimelapseApp(QWidget):
         tree_container_widget = QWidget()
         tree_layout = QVBoxLayout(tree_container_widget)
         tree_layout.setContentsMargins(0, 0, 0, 0)
-        tree_layout.addWidget(QLabel("Found Sequence Directories / Sequences:"))
-        self.dir_tree_widget = QTreeWidget()
-        self.dir_tree_widget.setHeaderLabels(["Directory / Sequence", "Frames"])
-        self.dir_tree_widget.itemChanged.connect(self.handle_tree_item_changed)
+        tree_header_layout = QHBoxLayout()
+        tree_header_layout.addWidget(QLabel("Found Sequence Directories / Sequences:"))
+        tree_header_layout.addStretch()
+        self.scan_progress_label = QLabel("")
+        tree_header_layout.addWidget(self.scan_progress_label)
+        tree_layout.addLayout(tree_header_layout)
+        self.sequence_model = SequenceTreeModel(self)
+        self.dir_tree_widget = QTreeView()
+        self.dir_tree_widget.setModel(self.sequence_model)
+        self.dir_tree_widget.setUniformRowHeights(True)  # Lets the view skip measuring every row
         # Make the first column (Directory/Sequence Name) stretch
         self.dir_tree_widget.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         # Give the second column (Frames) a fixed or interactive size initially
@@ -459,9 +783,13 @@ class TimelapseApp(QWidget):
         log_layout = QVBoxLayout(log_container_widget)
         log_layout.setContentsMargins(0, 0, 0, 0)
         log_layout.addWidget(QLabel("Log:"))
-        self.log_text_edit = QTextEdit()
+        self.log_text_edit = QPlainTextEdit()
         self.log_text_edit.setReadOnly(True)
+        self.log_text_edit.setMaximumBlockCount(DEFAULT_LOG_MAX_LINES)
         log_layout.addWidget(self.log_text_edit)
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.timeout.connect(self.flush_pending_log_lines)
+        self.log_flush_timer.start(DEFAULT_LOG_FLUSH_INTERVAL_MS)
 
         # Set a minimum height for the log area
         tree_container_widget.setMinimumHeight(150)
@@ -477,17 +805,58 @@ class TimelapseApp(QWidget):
         # --- Add Progress Bars AFTER the splitter ---
         self.current_sequence_progress_bar = QProgressBar();
         self.current_sequence_progress_bar.setTextVisible(True);
+        self.current_throughput_label = QLabel("");
         main_layout.addWidget(QLabel("Current Sequence Progress:"));
-        main_layout.addWidget(self.current_sequence_progress_bar)
+        current_progress_layout = QHBoxLayout()
+        current_progress_layout.addWidget(self.current_sequence_progress_bar, 1)
+        current_progress_layout.addWidget(self.current_throughput_label)
+        main_layout.addLayout(current_progress_layout)
         self.overall_batch_progress_bar = QProgressBar();
         self.overall_batch_progress_bar.setTextVisible(True);
+        self.batch_throughput_label = QLabel("");
         main_layout.addWidget(QLabel("Overall Batch Progress:"));
-        main_layout.addWidget(self.overall_batch_progress_bar)
+        batch_progress_layout = QHBoxLayout()
+        batch_progress_layout.addWidget(self.overall_batch_progress_bar, 1)
+        batch_progress_layout.addWidget(self.batch_throughput_label)
+        main_layout.addLayout(batch_progress_layout)
 
         # --- System Monitor Group ---
         monitor_group = QGroupBox("System Activity Monitor")
         monitor_layout = QVBoxLayout()
-        # You need to import pyqtgraph as pg at the top of the file
+        # Plots are created by setup_monitor_plots once the window is up; pyqtgraph is slow to import
+        self.monitor_layout = monitor_layout
+        self.monitor_placeholder_label = QLabel("Starting system monitor...")
+        monitor_layout.addWidget(self.monitor_placeholder_label)
+        monitor_group.setLayout(monitor_layout)
+        main_layout.addWidget(monitor_group)
+
+        self.setLayout(main_layout)
+
+        # --- Final UI state updates ---
+        self.update_scaling_options_ui()
+        self.update_dynamic_codec_options_ui()
+        self.apply_theme(self.current_theme)
+
+    def show_about_dialog(self):
+        # If using the custom AboutDialog:
+        dialog = AboutDialog(self) # Pass parent
+        dialog.exec() # Show as a modal dialog
+
+    def init_monitoring_data_and_start(self):  # RENAMED and MODIFIED
+        self.monitor_sampler = None  # Created with the plots; samples on its own thread
+
+        self.monitor_timer = QTimer(self)
+        self.monitor_timer.timeout.connect(self.update_monitors_display)
+        self.gpu_detect_worker = None
+
+        # Runs from the event loop, after the window has been shown
+        QTimer.singleShot(0, self.setup_monitor_plots)
+
+    def setup_monitor_plots(self):
+        import pyqtgraph as pg # Deferred: importing it costs more than building the rest of the window
+        monitor_layout = self.monitor_layout
+        monitor_layout.removeWidget(self.monitor_placeholder_label)
+        self.monitor_placeholder_label.deleteLater()
         self.cpu_plot_widget = pg.PlotWidget(title="CPU Usage (%)")
         self.cpu_plot_widget.setYRange(0, 100, padding=0.05)
         self.cpu_plot_widget.showGrid(x=True, y=True, alpha=0.3)
@@ -510,88 +879,34 @@ class TimelapseApp(QWidget):
         self.gpu_plot_widget.setVisible(False)  # Hide initially
         monitor_layout.addWidget(self.gpu_plot_widget)
 
-        monitor_group.setLayout(monitor_layout)
-        main_layout.addWidget(monitor_group)
-
-        self.setLayout(main_layout)
-
-        # --- Final UI state updates ---
-        self.update_scaling_options_ui()
-        self.update_dynamic_codec_options_ui()
-        self.apply_theme(self.current_theme)
-
-    def show_about_dialog(self):
-        # If using the custom AboutDialog:
-        dialog = AboutDialog(self) # Pass parent
-        dialog.exec() # Show as a modal dialog
-
-    def handle_tree_item_changed(self, item: QTreeWidgetItem, column: int):
-        if column == 0:  # Only act on changes in the first column (where checkboxes are)
-            # Block signals to prevent recursive calls while we programmatically change states
-            self.dir_tree_widget.blockSignals(True)
-
-            current_check_state = item.checkState(0)
-
-            # --- Case 1: A PARENT item's check state was changed by the user ---
-            if item.parent() is None:  # This is a top-level (parent) item
-                # If parent is checked or unchecked by user, propagate to all children
-                if current_check_state == Qt.CheckState.Checked or current_check_state == Qt.CheckState.Unchecked:
-                    for i in range(item.childCount()):
-                        child = item.child(i)
-                        if child.flags() & Qt.ItemFlag.ItemIsUserCheckable:  # Only if child is checkable
-                            child.setCheckState(0, current_check_state)
-                # Note: A parent item usually won't be set to PartiallyChecked by direct user click
-                # if ItemIsAutoTristate is working correctly with its children.
-                # If a parent IS partially checked, we don't automatically propagate that to children.
-
-            # --- Case 2: A CHILD item's check state was changed by the user ---
-            else:
-                parent = item.parent()
-                if parent:  # Should always have a parent if it's a child
-                    num_children = parent.childCount()
-                    checked_children_count = 0
-                    unchecked_children_count = 0
-
-                    for i in range(num_children):
-                        child = parent.child(i)
-                        if child.flags() & Qt.ItemFlag.ItemIsUserCheckable:
-                            if child.checkState(0) == Qt.CheckState.Checked:
-                                checked_children_count += 1
-                            elif child.checkState(0) == Qt.CheckState.Unchecked:
-                                unchecked_children_count += 1
-
-                    if checked_children_count == num_children:
-                        # All children are checked, so parent becomes fully checked
-                        parent.setCheckState(0, Qt.CheckState.Checked)
-                    elif unchecked_children_count == num_children:
-                        # All children are unchecked, so parent becomes fully unchecked
-                        parent.setCheckState(0, Qt.CheckState.Unchecked)
-                    else:
-                        # Some are checked, some are not (or some are partially checked themselves if they were parents)
-                        # So, parent becomes partially checked
-                        parent.setCheckState(0, Qt.CheckState.PartiallyChecked)
-
-            # Re-enable signals
-            self.dir_tree_widget.blockSignals(False)
-
-    def init_monitoring_data_and_start(self):  # RENAMED and MODIFIED
-        self.cpu_data_history = [0] * 60  # Or a different history length
-        self.mem_data_history = [0] * 60
-        self.gpu_data_history = [0] * 60
-
-        self.monitor_timer = QTimer(self)
-        self.monitor_timer.timeout.connect(self.update_monitors_display)
-
-        self.check_gpu_availability_and_setup_plot()  # Sets up the GPU plot visibility
-
+        sample_interval_s = self.settings.value("monitor_sample_interval_s", DEFAULT_MONITOR_SAMPLE_INTERVAL_S, type=float)
+        self.monitor_sampler = monitoring_engine.MonitorSampler(sample_interval_s, DEFAULT_MONITOR_HISTORY_S)
+        self.monitor_sampler.start()
         self.monitor_timer.start(1000)  # START THE TIMER HERE (e.g., update every 1 second)
         self.log("System monitoring started.")
-
-    # check_gpu_availability_and_setup_plot remains the same
-    # update_monitors_display remains the same
-
-    def check_gpu_availability_and_setup_plot(self): # Renamed and modified
-        self.gpu_type_detected = monitoring_engine.detect_gpu_type() # Call engine
+        self.start_gpu_detection()
+
+    def start_gpu_detection(self):
+        """Uses the GPU type cached in QSettings while it is fresh, otherwise detects it on a worker thread."""
+        if self.settings.contains("gpu_type"):
+            cached_at = self.settings.value("gpu_type_detected_at", 0.0, type=float)
+            if 0 <= time.time() - cached_at < DEFAULT_GPU_TYPE_CACHE_TTL_S:
+                cached_gpu_type = self.settings.value("gpu_type", "", type=str)
+                monitoring_engine.set_detected_gpu_type(cached_gpu_type or None)
+                self.check_gpu_availability_and_setup_plot(cached_gpu_type)
+                return
+        self.gpu_detect_worker = GpuDetectWorker()
+        self.gpu_detect_worker.gpu_detected.connect(self.on_gpu_detected_slot)
+        self.gpu_detect_worker.start()
+
+    def on_gpu_detected_slot(self, gpu_type):
+        self.settings.setValue("gpu_type", gpu_type)
+        self.settings.setValue("gpu_type_detected_at", time.time())
+        self.check_gpu_availability_and_setup_plot(gpu_type)
+
+    def check_gpu_availability_and_setup_plot(self, gpu_type): # Renamed and modified
+        self.gpu_type_detected = gpu_type or None
+        self.monitor_sampler.set_gpu_type(self.gpu_type_detected)
         if self.gpu_type_detected:
             self.gpu_plot_widget.setVisible(True)
             self.gpu_plot_widget.setTitle(f"{self.gpu_type_detected.upper()} GPU Usage (%)")
@@ -601,35 +916,29 @@ class TimelapseApp(QWidget):
             self.log("No common GPU monitoring tool found or supported for detailed stats by engine.")
 
     def update_monitors_display(self): # Renamed from update_monitors
-        cpu_usage = monitoring_engine.get_cpu_usage()
-        if cpu_usage is not None:
-            self.cpu_data_history.pop(0); self.cpu_data_history.append(cpu_usage)
-            self.cpu_plot_data_line.setData(self.cpu_data_history)
-
-        mem_usage = monitoring_engine.get_memory_usage()
-        if mem_usage is not None:
-            self.mem_data_history.pop(0); self.mem_data_history.append(mem_usage)
-            self.mem_plot_data_line.setData(self.mem_data_history)
-
+        """Redraws the plots from a snapshot of the sampler's history; no sampling happens on the GUI thread."""
+        if self.monitor_sampler is None:
+            return
+        seconds_ago, history = self.monitor_sampler.snapshot(DEFAULT_MONITOR_DISPLAY_POINTS)
+        self.cpu_plot_data_line.setData(seconds_ago, history["cpu"], connect="finite")
+        self.mem_plot_data_line.setData(seconds_ago, history["mem"], connect="finite")
         if self.gpu_type_detected:
-            # get_gpu_usage now returns type and util, but we already have type
-            _, gpu_util = monitoring_engine.get_gpu_usage() # Engine handles which specific util func to call
-            if gpu_util is not None:
-                self.gpu_data_history.pop(0); self.gpu_data_history.append(gpu_util)
-            else: # Error or no data for this tick
-                self.gpu_data_history.pop(0); self.gpu_data_history.append(0) # Append 0
-            self.gpu_plot_data_line.setData(self.gpu_data_history)
+            self.gpu_plot_data_line.setData(seconds_ago, history["gpu"], connect="finite")
 
     def cancel_current_action(self):
-        if self.active_ffmpeg_worker and self.active_ffmpeg_worker.isRunning():
-            self.log("Sending cancel signal to current FFmpeg task...")
-            self.active_ffmpeg_worker.cancel_task()
+        running_workers = [w for w in self.running_jobs if w.isRunning()]
+        if running_workers:
+            self.log(f"Sending cancel signal to {len(running_workers)} running FFmpeg task(s)...")
+            for worker in running_workers:
+                worker.cancel_task()
         else:
             self.log("No FFmpeg task currently running to cancel.")
 
     def cancel_batch_action(self):  # <<< THIS IS THE METHOD
         self.log("Batch cancellation requested...")
         self.batch_cancelled_flag = True
+        if self.batch_scheduler is not None:
+            self.batch_scheduler.cancel()  # Drops queued chunks and joins, and removes their files
         self.cancel_current_action()  # Attempt to cancel current task as well
         # UI updates to reflect cancellation state
         self.start_button.setEnabled(False)  # Can't restart a cancelled batch easily this way
@@ -664,11 +973,23 @@ class TimelapseApp(QWidget):
         self.apply_theme(self.current_theme)
 
     def log(self, message: str):
+        """Queues a message for the log view; safe to call from any thread, shown on the next flush tick."""
         if hasattr(self, 'log_text_edit') and self.log_text_edit is not None:
-            self.log_text_edit.append(str(message)); QApplication.processEvents()
+            self.pending_log_lines.append(str(message))
         else:
             print(f"LOG (UI not ready): {message}")
 
+    def flush_pending_log_lines(self):
+        """Appends everything logged since the last tick in a single edit."""
+        lines = []
+        try:
+            while True:
+                lines.append(self.pending_log_lines.popleft())
+        except IndexError:
+            pass
+        if lines:
+            self.log_text_edit.appendPlainText("\n".join(lines))
+
     def browse_parent_dir(self):
         initial_dir = self.parent_dir_edit.text() or str(DEFAULT_PARENT_IMAGE_DIR)
         dir_path = QFileDialog.getExistingDirectory(self, "Select Parent Timelapse Directory", initial_dir,
@@ -790,106 +1111,15 @@ class TimelapseApp(QWidget):
             if not main_output_dir.is_dir(): main_output_dir.mkdir(parents=True, exist_ok=True)
         except Exception as e:
             self.log(f"Error with main output directory: {e}."); return None
-        settings = {"input_fps": self.input_fps_spin.value(), "output_fps": self.output_fps_spin.value(),
-                    "main_output_dir": main_output_dir,
-                    "filename_prefix_ui": self.filename_prefix_edit.text() or ENGINE_DEFAULT_FILENAME_PREFIX,
-                    "filename_suffix_ui": self.filename_suffix_edit.text() or ENGINE_DEFAULT_FILENAME_SUFFIX,
-                    "output_basename_ui": self.output_basename_edit.text().strip(),
-                    "video_codec_option_name": "Unknown", "video_codec": "libx264", "base_codec": "libx264",
-                    "output_extension": ".mp4", "pixel_format_final": "yuv420p", "is_crf_based": False,
-                    "crf_value": None, "codec_preset": None, "prores_profile_val": None, "dnx_bitrate_or_profile": None,
-                    "vp9_cpu_used": None, "prores_profiles_map": None, "hwaccel_type": "none", "hw_cq_value": None,
-                    "hw_preset": None, "scale_filter_string": "", "resolution_desc": "Original"}
-        selected_codec_idx_ui = self.codec_combo.currentIndex()
-        if selected_codec_idx_ui < 0: self.log("Error: No base codec selected."); return None
-        chosen_base_codec_data = self.codec_combo.itemData(selected_codec_idx_ui)
-        if not chosen_base_codec_data: self.log("Error: No data for selected codec."); return None
-        settings.update({"video_codec_option_name": chosen_base_codec_data["name"],
-                         "base_codec": chosen_base_codec_data["base_codec"],
-                         "video_codec": chosen_base_codec_data["base_codec"],
-                         "output_extension": chosen_base_codec_data["ext"],
-                         "pixel_format_final": chosen_base_codec_data["pix_fmt"]})
-        if "prores_profiles_map" in chosen_base_codec_data: settings["prores_profiles_map"] = chosen_base_codec_data[
-            "prores_profiles_map"]
-        selected_hwaccel_type_idx = self.hw_accel_combo.currentIndex()
-        hwaccel_type = ["none", "nvenc", "qsv", "amf"][
-            selected_hwaccel_type_idx] if selected_hwaccel_type_idx < 4 else "none"
-        settings["hwaccel_type"] = hwaccel_type
-        is_hw_active = False
-        if hwaccel_type != "none" and hwaccel_type in chosen_base_codec_data.get("hw_variants", {}):
-            hw_variant = chosen_base_codec_data["hw_variants"].get(hwaccel_type)
-            if hw_variant:
-                settings["video_codec"] = hw_variant;
-                settings["video_codec_option_name"] += f" ({hwaccel_type.upper()})";
-                is_hw_active = True
-                if settings["video_codec"].startswith("hevc_nvenc") and settings["pixel_format_final"] == "yuv422p10le":
-                    settings["pixel_format_final"] = "p010le"
-                elif settings["video_codec"].startswith("h264_nvenc") and settings["pixel_format_final"] not in [
-                    "yuv420p", "nv12"]:
-                    settings["pixel_format_final"] = "yuv420p"
-        if is_hw_active:
-            if chosen_base_codec_data.get("hw_quality_type") == "cq" and self.quality_spin.isVisible(): settings[
-                "hw_cq_value"] = self.quality_spin.value()
-            hw_presets_for_this_hw_type = chosen_base_codec_data.get("hw_presets", {}).get(hwaccel_type)
-            if hw_presets_for_this_hw_type and self.preset_combo.isVisible() and self.preset_combo.currentText() in hw_presets_for_this_hw_type:
-                settings["hw_preset"] = self.preset_combo.currentText()
-        else:
-            quality_type = chosen_base_codec_data["quality_type"]
-            if quality_type == "crf":
-                settings["is_crf_based"] = True
-                if self.quality_spin.isVisible(): settings["crf_value"] = self.quality_spin.value()
-                if "presets" in chosen_base_codec_data and self.preset_combo.isVisible(): settings[
-                    "codec_preset"] = self.preset_combo.currentText()
-            elif quality_type == "crf_vp9":
-                settings["is_crf_based"] = True
-                if self.quality_spin.isVisible(): settings["crf_value"] = self.quality_spin.value()
-                if "deadlines" in chosen_base_codec_data and self.preset_combo.isVisible(): settings[
-                    "codec_preset"] = self.preset_combo.currentText()
-                settings["vp9_cpu_used"] = chosen_base_codec_data.get("default_cpu_used", DEFAULT_VP9_CPU_USED)
-            elif quality_type == "prores_profile":
-                if self.quality_combo.isVisible():
-                    selected_profile_name = self.quality_combo.currentText()
-                    if "prores_profiles_map" in chosen_base_codec_data: settings["prores_profile_val"] = \
-                    chosen_base_codec_data["prores_profiles_map"].get(selected_profile_name)
-                    if selected_profile_name in ["4444", "4444XQ"]: settings["pixel_format_final"] = "yuv444p10le"
-            elif quality_type == "dnx_profile":
-                if self.quality_combo.isVisible():
-                    settings["dnx_bitrate_or_profile"] = self.quality_combo.currentText()
-                    if settings["dnx_bitrate_or_profile"] == "dnxhr_hqx":
-                        settings["pixel_format_final"] = "yuv422p10le"
-                    elif settings["dnx_bitrate_or_profile"] in ["dnxhr_hq", "dnxhr_sq",
-                                                                "dnxhr_lb"] and chosen_base_codec_data.get(
-                        "pix_fmt") != "yuv420p":
-                        settings["pixel_format_final"] = "yuv422p"
-        selected_scale_key = self.scale_type_combo.currentData()
-        if selected_scale_key and selected_scale_key in self.scale_options_map_for_ui:
-            chosen_scale_data = self.scale_options_map_for_ui[selected_scale_key]
-            settings["resolution_desc"] = self.scale_type_combo.currentText()
-            if selected_scale_key == "original":
-                settings["scale_filter_string"] = ""
-            elif selected_scale_key == "percentage":
-                percentage = self.scale_percentage_spin.value()
-                settings["scale_filter_string"] = chosen_scale_data["filter_template"].replace("{val}",
-                                                                                               str(percentage));
-                settings["resolution_desc"] = f"{percentage}% of original (approx, even dimensions)"
-            elif selected_scale_key == "custom":
-                w, h = self.scale_custom_width_edit.text(), self.scale_custom_height_edit.text()
-                try:
-                    iw, ih_str_val = int(w), h
-                    if not (iw > 0 and iw % 2 == 0): raise ValueError("Width must be positive and even.")
-                    if not (ih_str_val == "-2" or (ih_str_val.isdigit() and int(ih_str_val) > 0 and int(
-                        ih_str_val) % 2 == 0)): raise ValueError("Height must be -2 or a positive even integer.")
-                    settings["scale_filter_string"] = chosen_scale_data["filter_template"].replace("{w}", w).replace(
-                        "{h}", h);
-                    settings["resolution_desc"] = f"Custom {w}x{h if h != '-2' else '(auto_H)'}"
-                except ValueError as e_scale:
-                    self.log(f"Warning: Invalid custom scale: {e_scale}. No scaling."); settings[
-                        "scale_filter_string"] = ""; settings["resolution_desc"] = "Original (Custom Err)"
-            else:
-                settings["scale_filter_string"] = chosen_scale_data.get("filter", "")
-        else:
-            self.log("Warning: No valid scale type. No scaling."); settings["scale_filter_string"] = ""; settings[
-                "resolution_desc"] = "Original (No Scale Sel)"
+        # The UI state is exactly what a preset stores, so the GUI and the headless CLI build identical settings
+        try:
+            settings = build_common_settings(self.gather_ui_state_for_preset(), main_output_dir,
+                                             self.filename_prefix_edit.text(), self.filename_suffix_edit.text(),
+                                             self.output_basename_edit.text())
+        except ValueError as e:
+            self.log(f"Error: {e}"); return None
+        if settings["resolution_desc"] in ("Original (Custom Err)", "Original (No Scale Sel)"):
+            self.log("Warning: Invalid or missing scale settings. No scaling.")
         self.log(f"Settings gathered. Codec: {settings.get('video_codec')}, Res: {settings.get('resolution_desc')}")
         return settings
 
@@ -903,7 +1133,11 @@ class TimelapseApp(QWidget):
                  "scale_type_combo_idx": self.scale_type_combo.currentIndex(),
                  "scale_percentage_value": self.scale_percentage_spin.value(),
                  "scale_custom_width_text": self.scale_custom_width_edit.text(),
-                 "scale_custom_height_text": self.scale_custom_height_edit.text()}
+                 "scale_custom_height_text": self.scale_custom_height_edit.text(),
+                 "parallel_jobs": self.parallel_jobs_spin.value(),
+                 "chunks_per_sequence": self.chunks_per_sequence_spin.value(),
+                 "max_frame_gap": self.max_frame_gap_spin.value(),
+                 "hold_frame_gaps": self.hold_frame_gaps_check.isChecked()}
         return state
 
     def apply_settings_to_ui(self, settings_to_load: dict):
@@ -912,6 +1146,10 @@ class TimelapseApp(QWidget):
             self.input_fps_spin.setValue(settings_to_load.get("input_fps", DEFAULT_INPUT_FPS))
             self.output_fps_spin.setValue(settings_to_load.get("output_fps", DEFAULT_OUTPUT_FPS))
             self.output_dir_edit.setText(settings_to_load.get("output_dir_str", str(DEFAULT_OUTPUT_DIR)))
+            self.parallel_jobs_spin.setValue(settings_to_load.get("parallel_jobs", 0))
+            self.chunks_per_sequence_spin.setValue(settings_to_load.get("chunks_per_sequence", 1))
+            self.max_frame_gap_spin.setValue(settings_to_load.get("max_frame_gap", ENGINE_DEFAULT_MAX_FRAME_GAP))
+            self.hold_frame_gaps_check.setChecked(settings_to_load.get("hold_frame_gaps", True))
             self.hw_accel_combo.setCurrentIndex(settings_to_load.get("hwaccel_choice_idx", 0))
             self.codec_combo.setCurrentIndex(settings_to_load.get("codec_choice_idx", 0))
             self.update_dynamic_codec_options_ui();
@@ -969,97 +1207,121 @@ class TimelapseApp(QWidget):
                 self.log(f"Error loading preset: {e}")
 
     def scan_directories_action(self):
+        if self.active_scan_worker and self.active_scan_worker.isRunning():
+            self.log("A scan is already running.")
+            return
         self.log("Scanning for sequence directories...")
         parent_dir_ui = Path(self.parent_dir_edit.text())
         current_prefix = self.filename_prefix_edit.text() or ENGINE_DEFAULT_FILENAME_PREFIX
         current_suffix = self.filename_suffix_edit.text() or ENGINE_DEFAULT_FILENAME_SUFFIX
 
-        self.dir_tree_widget.clear()
-        self.dirs_to_process_cache = find_potential_sequence_dirs(parent_dir_ui, current_prefix, current_suffix)
-
-        if not self.dirs_to_process_cache:
+        self.sequence_model.clear()
+        self.dirs_to_process_cache = []
+        self.scan_parent_dir = parent_dir_ui
+        self.scan_prefix, self.scan_suffix = current_prefix, current_suffix
+        self.scan_total_dirs = 0
+        self.scan_sequences_added_count = 0
+        self.scan_progress_label.setText("Discovering directories...")
+        self.scan_button.setEnabled(False)
+        self.start_button.setEnabled(False)
+        self.cancel_scan_button.setEnabled(True)
+
+        discovery_workers = self.settings.value("discovery_workers", ENGINE_DEFAULT_DISCOVERY_WORKERS, type=int)
+        self.active_scan_worker = ScanWorker(parent_dir_ui, current_prefix, current_suffix, self.scan_index,
+                                             discovery_workers, self.filename_ignore_case_check.isChecked(),
+                                             self.max_frame_gap_spin.value())
+        self.active_scan_worker.dirs_discovered.connect(self.on_scan_dirs_discovered_slot)
+        self.active_scan_worker.directory_scanned.connect(self.on_scan_directory_scanned_slot)
+        self.active_scan_worker.log_message.connect(self.log)
+        self.active_scan_worker.scan_finished.connect(self.on_scan_finished_slot)
+        self.scan_start_time = time.monotonic()
+        log_event("scan_start", parent_dir=parent_dir_ui, prefix=current_prefix, suffix=current_suffix)
+        self.active_scan_worker.start()
+
+    def cancel_scan_action(self):
+        if self.active_scan_worker and self.active_scan_worker.isRunning():
+            self.log("Cancelling directory scan...")
+            self.active_scan_worker.cancel_scan()
+            self.cancel_scan_button.setEnabled(False)
+
+    def on_scan_dirs_discovered_slot(self, total_dirs):
+        self.scan_total_dirs = total_dirs
+        if total_dirs > 0:
+            self.log(f"Found {total_dirs} subdirectory(s). Now scanning for sequences within them...")
+        self.scan_progress_label.setText(f"Scanned 0/{total_dirs} directories")
+
+    def on_scan_directory_scanned_slot(self, parent_dir_path, sequences, error_text):
+        self.dirs_to_process_cache.append(parent_dir_path)
+        if error_text:
+            self.log(f"Error while scanning sequences in '{parent_dir_path.name}': {error_text}")
+        if sequences or error_text:  # Directories without a single matching file are left out of the tree
+            directory_index = self.sequence_model.add_directory(parent_dir_path, sequences, error_text)
+            self.scan_sequences_added_count += len(sequences)
+            if self.scan_sequences_added_count <= DEFAULT_TREE_AUTO_EXPAND_SEQUENCES:  # Later ones expand on demand
+                self.dir_tree_widget.expand(directory_index)
+        self.scan_progress_label.setText(
+            f"Scanned {len(self.dirs_to_process_cache)}/{self.scan_total_dirs} directories, "
+            f"{self.scan_sequences_added_count} sequence(s)")
+
+    def on_scan_finished_slot(self, completed):
+        self.active_scan_worker = None
+        log_event("scan_finish", parent_dir=self.scan_parent_dir, completed=completed,
+                  dirs_scanned=len(self.dirs_to_process_cache), sequences=self.scan_sequences_added_count,
+                  duration_s=round(time.monotonic() - self.scan_start_time, 3))
+        self.scan_button.setEnabled(True)
+        self.cancel_scan_button.setEnabled(False)
+        if not completed:
+            self.log(f"Scan cancelled after {len(self.dirs_to_process_cache)}/{self.scan_total_dirs} directory(s).")
+            self.scan_progress_label.setText(self.scan_progress_label.text() + " (cancelled)")
+        elif self.scan_total_dirs == 0:
             self.log(
-                f"No potential sequence subdirectories found in '{parent_dir_ui}' matching prefix='{current_prefix}', suffix='{current_suffix}'.")
-            self.start_button.setEnabled(False)
-            return
-
-        self.log(
-            f"Found {len(self.dirs_to_process_cache)} potential directory(s). Now scanning for sequences within them...")
-
-        temp_settings_for_scan = self.gather_common_settings_from_ui()
-        if not temp_settings_for_scan:
-            self.log("Error: Could not gather current settings for sequence scanning. Using minimal defaults.")
-            temp_settings_for_scan = {
-                "main_output_dir": Path(self.output_dir_edit.text() or DEFAULT_OUTPUT_DIR),
-                "filename_prefix_ui": current_prefix, "filename_suffix_ui": current_suffix,
-                "output_extension": ".mp4", "video_codec": "libx264",
-                "input_fps": DEFAULT_INPUT_FPS, "output_fps": DEFAULT_OUTPUT_FPS
-            }
-
-        total_sequences_added_to_tree = 0
-        for parent_dir_path in self.dirs_to_process_cache:
-            parent_item = QTreeWidgetItem(self.dir_tree_widget, [str(parent_dir_path.name)])
-            parent_item.setData(0, Qt.ItemDataRole.UserRole, {"type": "parent_dir", "path": parent_dir_path})
-            parent_item.setFlags(
-                parent_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)  # Removed ItemIsAutoTristate for now
-            parent_item.setCheckState(0, Qt.CheckState.Checked)  # <<<<<< CHANGED TO CHECKED BY DEFAULT
-
-            sequences_found_in_this_parent = 0
-            try:
-                for _, output_p, frames in generate_ffmpeg_commands_for_sequences_in_dir(
-                        parent_dir_path, current_prefix, current_suffix, temp_settings_for_scan):
-                    seq_start_num_match = re.search(r"seq(\d+)", output_p.name)
-                    seq_start_display = seq_start_num_match.group(1) if seq_start_num_match else "UnknownStart"
-
-                    child_item = QTreeWidgetItem(parent_item,
-                                                 [f"  Sequence starting ~{seq_start_display}", str(frames)])
-                    child_item.setData(0, Qt.ItemDataRole.UserRole, {
-                        "type": "sequence", "parent_path": parent_dir_path,
-                        "start_number_str_approx": seq_start_display,
-                        "num_frames_approx": frames
-                    })
-                    child_item.setFlags(child_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-                    child_item.setCheckState(0, Qt.CheckState.Checked)  # <<<<<< CHANGED TO CHECKED BY DEFAULT
-                    sequences_found_in_this_parent += 1
-                    total_sequences_added_to_tree += 1
-            except Exception as e:
-                self.log(f"Error while scanning sequences in '{parent_dir_path.name}': {e}")
-                error_child = QTreeWidgetItem(parent_item, [f"  (Error scanning: {e})", ""])
-                error_child.setFlags(error_child.flags() & ~Qt.ItemFlag.ItemIsUserCheckable)
-
-            if sequences_found_in_this_parent == 0:
-                no_seq_child = QTreeWidgetItem(parent_item, ["  (No sequences detected with current settings)", ""])
-                no_seq_child.setFlags(no_seq_child.flags() & ~Qt.ItemFlag.ItemIsUserCheckable)
-                parent_item.setCheckState(0, Qt.CheckState.Unchecked)  # Uncheck parent if no children
-                parent_item.setDisabled(True)  # Optionally disable parent if no sequences
-
-            parent_item.setExpanded(True)
-
-        if total_sequences_added_to_tree > 0:
+                f"No subdirectories found in '{self.scan_parent_dir}' to scan for prefix='{self.scan_prefix}', suffix='{self.scan_suffix}'.")
+            self.scan_progress_label.setText("")
+        elif self.scan_sequences_added_count > 0:
             self.log(
-                f"Scan complete. Displaying {total_sequences_added_to_tree} sequence(s) across {len(self.dirs_to_process_cache)} directory(s).")
-            self.start_button.setEnabled(True)
+                f"Scan complete. Displaying {self.scan_sequences_added_count} sequence(s) across {self.sequence_model.rowCount()} directory(s).")
         else:
             self.log("Scan complete. No processable sequences found with current settings.")
-            self.start_button.setEnabled(False)
+        self.start_button.setEnabled(self.scan_sequences_added_count > 0)
 
     def start_batch_action(self):
         self.log("Start batch action triggered.")
         self.sequences_queue_for_batch = []  # THIS WILL BE OUR QUEUE of sequence data dicts
 
-        root = self.dir_tree_widget.invisibleRootItem()
-        for i in range(root.childCount()):  # Iterate through parent directory items
-            parent_item = root.child(i)
-            # Iterate through child sequence items of this parent
-            for j in range(parent_item.childCount()):
-                child_item = parent_item.child(j)
-                # We only care if the child (sequence) item itself is checked
-                if child_item.checkState(0) == Qt.CheckState.Checked:
-                    seq_data = child_item.data(0, Qt.ItemDataRole.UserRole)
-                    # Ensure seq_data is the expected dictionary and type
-                    if isinstance(seq_data, dict) and seq_data.get("type") == "sequence":
-                        self.sequences_queue_for_batch.append(seq_data)
+        # Checked sequences come from the model's check bytes, including rows never shown in the view
+        for parent_dir_path, sequence in self.sequence_model.checked_sequences():
+            self.sequences_queue_for_batch.append({"type": "sequence", "parent_path": parent_dir_path,
+                                                   "sequence": sequence})
 
+        if self.sequences_queue_for_batch and self.merge_rollovers_check.isChecked():
+            self.start_button.setEnabled(False)
+            self.scan_button.setEnabled(False)
+            self.log("Looking for camera folder rollovers among the selected sequences...")
+            self.rollover_merge_worker = RolloverMergeWorker(
+                [seq_data["sequence"] for seq_data in self.sequences_queue_for_batch])
+            self.rollover_merge_worker.log_message.connect(self.log)
+            self.rollover_merge_worker.merged.connect(self.on_rollovers_merged_slot)
+            self.rollover_merge_worker.start()
+            return
+        self.start_queued_batch()
+
+    def on_rollovers_merged_slot(self, sequences):
+        parent_by_sequence = {id(seq_data["sequence"]): seq_data["parent_path"]
+                              for seq_data in self.sequences_queue_for_batch}
+        self.sequences_queue_for_batch = []
+        for sequence in sequences:
+            first_part = sequence
+            if isinstance(sequence, SequenceChain):
+                first_part = sequence.parts[0]
+                self.log(f"Merging {len(sequence.parts)} folder rollovers into one sequence: "
+                         f"{', '.join(part.directory_path.name for part in sequence.parts)}")
+            self.sequences_queue_for_batch.append({"type": "sequence", "parent_path": parent_by_sequence[id(first_part)],
+                                                   "sequence": sequence})
+        self.rollover_merge_worker = None
+        self.start_queued_batch()
+
+    def start_queued_batch(self):
+        """Starts the batch for sequences_queue_for_batch, once rollovers (if requested) have been merged."""
         if not self.sequences_queue_for_batch:
             self.log(
                 "No sequences selected for processing. Please check the boxes next to the individual sequences you want to render.")
@@ -1080,103 +1342,142 @@ class TimelapseApp(QWidget):
             self.cancel_batch_button.setEnabled(False)  # Disable cancel if batch aborted
             return
 
-            # Now we know the exact number of sequences
-            self.current_batch_total_sequences = len(self.sequences_queue_for_batch)
-            self.processed_sequences_in_batch_count = 0
+        # Overall progress is frame-weighted so several partially done jobs are counted accurately
+        self.batch_scheduler = BatchScheduler(
+            [seq_data["sequence"] for seq_data in self.sequences_queue_for_batch], self.common_settings_for_batch,
+            self.chunks_per_sequence_spin.value(), log=self.log, on_sequence_finished=self.on_batch_sequence_finished)
+        self.batch_finished_bytes = 0
+        self.batch_throughput = ThroughputTracker(self.batch_scheduler.total_frames)
+        self.batch_start_time = time.monotonic()
+        self.running_jobs = {}  # FFmpegWorker -> job dict from the scheduler, plus "throughput" and "start_time"
 
-            self.overall_batch_progress_bar.setMaximum(
-                self.current_batch_total_sequences if self.current_batch_total_sequences > 0 else 1)  # Good check
-            self.overall_batch_progress_bar.setValue(0)
-            self.overall_batch_progress_bar.setFormat(
-                f"Overall Sequences: %v/{self.current_batch_total_sequences if self.current_batch_total_sequences > 0 else 'N/A'}")
+        self.batch_job_slots = self.parallel_jobs_spin.value() or default_concurrent_jobs(
+            self.common_settings_for_batch.get("video_codec", "libx264"))
+        self.log(f"Running up to {self.batch_job_slots} FFmpeg job(s) at once.")
+        log_event("batch_start", sequences=self.batch_scheduler.sequence_count, frames=self.batch_scheduler.total_frames,
+                  job_slots=self.batch_job_slots, video_codec=self.common_settings_for_batch.get("video_codec"))
 
-            # Start the monitor timer if needed
-            if hasattr(self, 'monitor_timer') and not self.monitor_timer.isActive():
-                self.monitor_timer.start(1000)
-                self.log("System monitoring started for batch.")
+        self.overall_batch_progress_bar.setMaximum(max(1, self.batch_scheduler.total_frames))
+        self.overall_batch_progress_bar.setValue(0)
+        self.update_overall_batch_progress()
 
-            # Set the index to the first sequence and kick off the process
-            self.current_batch_sequence_index = 0
-            self.process_next_individual_sequence()  # Correctly calls the simplified processing method
-
-    def process_next_individual_sequence(self):
-            if self.batch_cancelled_flag:
-                self.log("Batch was cancelled. Halting further processing.")
-                self.cleanup_after_batch_or_cancel()
-                return
-
-            # Check if we have processed all items in our queue
-            if self.current_batch_sequence_index >= len(self.sequences_queue_for_batch):
-                self.log("===== Batch processing fully completed. =====")
-                self.cleanup_after_batch_or_cancel()
-                return
+        # Start the monitor timer if needed
+        if hasattr(self, 'monitor_timer') and not self.monitor_timer.isActive():
+            self.monitor_timer.start(1000)
+            self.log("System monitoring started for batch.")
 
-            # Get the next specific sequence from our queue
-            sequence_to_process_data = self.sequences_queue_for_batch[self.current_batch_sequence_index]
+        self.process_next_individual_sequence()  # Fills every free job slot
 
-            parent_dir = sequence_to_process_data["parent_path"]
-            start_num = sequence_to_process_data["start_number_str"]  # This is just for logging/finding
-
-            self.log(
-                f"--- Preparing sequence starting ~{start_num} in {parent_dir.name} ({self.current_batch_sequence_index + 1}/{len(self.sequences_queue_for_batch)}) ---")
-
-            # Now, call the engine generator for this parent directory, but find the specific sequence we want.
-            # This is still inefficient, but it's the bridge to a better engine function later.
-            prefix_to_use = self.common_settings_for_batch.get("filename_prefix_ui", ENGINE_DEFAULT_FILENAME_PREFIX)
-            suffix_to_use = self.common_settings_for_batch.get("filename_suffix_ui", ENGINE_DEFAULT_FILENAME_SUFFIX)
-
-            cmd_to_run, path_to_run, frames_to_run = None, None, None
-
-            # Find the specific command for the sequence we're currently processing from the queue
-            for ffmpeg_cmd, output_path, total_frames in generate_ffmpeg_commands_for_sequences_in_dir(
-                    parent_dir, prefix_to_use, suffix_to_use, self.common_settings_for_batch):
-
-                seq_start_num_match = re.search(r"seq(\d+)", output_path.name)
-                if seq_start_num_match and seq_start_num_match.group(1) == sequence_data[
-                    "start_number_str_approx"]:  # Use the stored approx
-                    cmd_to_run, path_to_run, frames_to_run = ffmpeg_cmd, output_path, total_frames
-                    break
-
-            if cmd_to_run:
-                self.current_sequence_progress_bar.setFormat(f"{path_to_run.name} - %p%")
-                self.current_sequence_progress_bar.setValue(0)
-                self.current_sequence_progress_bar.setMaximum(frames_to_run if frames_to_run > 0 else 100)
+    def process_next_individual_sequence(self):
+        """Starts queued jobs until all job slots are busy; finishes the batch once nothing is left running."""
+        self.ffmpeg_workers = [w for w in self.ffmpeg_workers if w.isRunning()]  # Drop threads that have exited
 
-                is_verbose = self.verbose_log_checkbox.isChecked()
-                self.active_ffmpeg_worker = FFmpegWorker(cmd_to_run, path_to_run, frames_to_run, is_verbose)
-                self.active_ffmpeg_worker.progress_update.connect(self.update_current_sequence_progress_slot)
-                self.active_ffmpeg_worker.log_message.connect(self.log)
-                self.active_ffmpeg_worker.finished.connect(self.on_ffmpeg_worker_finished_slot)
+        while not self.batch_cancelled_flag and len(self.running_jobs) < self.batch_job_slots:
+            job = self.batch_scheduler.next_job()  # Chunks and joins of already started sequences come first
+            if job is None:
+                break
+            self.start_ffmpeg_job(job)
 
-                self.cancel_current_button.setEnabled(True)
-                self.active_ffmpeg_worker.start()
-            else:
-                # This specific sequence was not found by the engine, maybe files were deleted since scanning.
-                self.log(f"  Could not find/generate command for sequence starting ~{start_num}. Skipping.")
-                # We must still call the 'finished' slot logic to move to the next item
-                self.on_ffmpeg_worker_finished_slot(False, f"Sequence starting {start_num} not found by engine.")
-
-    def on_ffmpeg_worker_finished_slot(self, success, output_file_str):
-        self.active_ffmpeg_worker = None
-        self.cancel_current_button.setEnabled(False)
+        self.cancel_current_button.setEnabled(bool(self.running_jobs))
+        self.update_running_jobs_progress()
 
+        if self.running_jobs:
+            return
+        if self.batch_cancelled_flag:
+            self.log("Batch was cancelled. Halting further processing.")
+            self.cleanup_after_batch_or_cancel()
+        elif not self.batch_scheduler.has_queued_jobs:
+            self.log("===== Batch processing fully completed. =====")
+            self.cleanup_after_batch_or_cancel()
+
+    def start_ffmpeg_job(self, job):
+        is_verbose = self.verbose_log_checkbox.isChecked()
+        worker = FFmpegWorker(job["cmd"], job["output_path"], job["total_frames"], is_verbose)
+        worker.progress_update.connect(
+            lambda current_frame, total_frames, progress_stats, w=worker: self.update_current_sequence_progress_slot(
+                w, current_frame, total_frames, progress_stats))
+        worker.log_message.connect(self.log)
+        worker.finished.connect(
+            lambda success, output_file_str, w=worker: self.on_ffmpeg_worker_finished_slot(
+                w, success, output_file_str))
+        job["frames_done"] = 0
+        job["throughput"] = ThroughputTracker(job["total_frames"])
+        job["start_time"] = time.monotonic()
+        self.running_jobs[worker] = job
+        log_event("job_start", kind=job["kind"], output=job["output_path"], frames=job["total_frames"],
+                  cmd=[str(arg) for arg in job["cmd"]])
+        self.ffmpeg_workers.append(worker)  # Keep a reference until the thread has really exited
+        worker.start()
+
+    def on_batch_sequence_finished(self, sequence, success, output_file_str):
         if success: self.log(f"  Sequence finished: {output_file_str}")
         else: self.log(f"  Sequence FAILED or CANCELLED: {output_file_str}")
-
-        if not self.batch_cancelled_flag:
-            self.processed_sequences_in_batch_count += 1
-            if self.overall_batch_progress_bar.maximum() > 0:
-                self.overall_batch_progress_bar.setValue(self.processed_sequences_in_batch_count)
-
-        self.current_batch_sequence_index += 1 # IMPORTANT: Move to the next sequence in our queue
-        self.process_next_individual_sequence() # Trigger processing for the next item
+        self.update_overall_batch_progress()
+
+    def on_ffmpeg_worker_finished_slot(self, worker, success, output_file_str):
+        job = self.running_jobs.pop(worker, None)
+        if job is not None:
+            log_event("job_finish", kind=job["kind"], output=job["output_path"], success=success,
+                      exit_code=worker.return_code, duration_s=round(time.monotonic() - job["start_time"], 3),
+                      frames=job["total_frames"], bytes=file_size_or_none(job["output_path"]))
+            if job["kind"] != "concat":  # Joins only copy bytes that were already counted
+                self.batch_finished_bytes += job["throughput"].bytes_written
+            jobs_to_stop = self.batch_scheduler.job_finished(job, success)
+            for running_worker, running_job in self.running_jobs.items():
+                if any(running_job is job_to_stop for job_to_stop in jobs_to_stop):
+                    running_worker.cancel_task()  # A sibling chunk failed, so this one can never be joined
+            self.update_overall_batch_progress()
+        self.process_next_individual_sequence() # Refill the freed slot, or finish the batch
+
+    def update_overall_batch_progress(self):
+        encoding_jobs = [job for job in self.running_jobs.values() if job["kind"] != "concat"]
+        running_frames = sum(job["frames_done"] for job in encoding_jobs)
+        finished_frames = self.batch_scheduler.finished_frames
+        self.overall_batch_progress_bar.setValue(min(finished_frames + running_frames,
+                                                     self.overall_batch_progress_bar.maximum()))
+        self.overall_batch_progress_bar.setFormat(f"Overall Sequences: {self.batch_scheduler.sequences_finished}"
+                                                  f"/{self.batch_scheduler.sequence_count} (%p%)")
+        running_bytes = sum(job["throughput"].bytes_written for job in encoding_jobs)
+        batch_throughput = self.batch_throughput
+        batch_throughput.update(finished_frames + running_frames, self.batch_finished_bytes + running_bytes)
+        fps_text = f"{batch_throughput.frames_per_second:.1f} fps" if batch_throughput.frames_per_second is not None else "-- fps"
+        self.batch_throughput_label.setText(
+            f"{fps_text} | {format_byte_count(batch_throughput.bytes_written)} written"
+            f" | Remaining ETA {format_duration(batch_throughput.eta_seconds)}")
+
+    def update_running_jobs_progress(self):
+        """Shows the combined progress of all running jobs in the current-sequence bar."""
+        if not self.running_jobs:
+            return
+        total_frames = sum(job["total_frames"] for job in self.running_jobs.values())
+        frames_done = sum(job["frames_done"] for job in self.running_jobs.values())
+        self.current_sequence_progress_bar.setMaximum(total_frames if total_frames > 0 else 100)
+        self.current_sequence_progress_bar.setValue(min(frames_done, self.current_sequence_progress_bar.maximum()))
+        if len(self.running_jobs) == 1:
+            only_job = next(iter(self.running_jobs.values()))
+            self.current_sequence_progress_bar.setFormat(f"{only_job['output_path'].name} - %p%")
+        else:
+            self.current_sequence_progress_bar.setFormat(f"{len(self.running_jobs)} sequences running - %p%")
+
+        # Running jobs side by side: rates and speeds add up, and the slowest job sets the ETA
+        trackers = [job["throughput"] for job in self.running_jobs.values()]
+        fps_values = [t.frames_per_second for t in trackers if t.frames_per_second is not None]
+        speed_values = [t.speed for t in trackers if t.speed is not None]
+        bitrate_values = [t.bitrate_bps for t in trackers if t.bitrate_bps is not None]
+        eta_values = [t.eta_seconds for t in trackers if t.eta_seconds is not None]
+        self.current_throughput_label.setText(
+            (f"{sum(fps_values):.1f} fps" if fps_values else "-- fps")
+            + (f" | {sum(speed_values):.2f}x" if speed_values else "")
+            + (f" | {sum(bitrate_values) / 1_000_000:.1f} Mbit/s" if bitrate_values else "")
+            + f" | {format_byte_count(sum(t.bytes_written for t in trackers))}"
+            + f" | ETA {format_duration(max(eta_values) if eta_values else None)}")
 
     def cleanup_after_batch_or_cancel(self):
         """Resets UI elements after batch completion or cancellation."""
         # if self.monitor_timer.isActive():
         #   self.monitor_timer.stop()
         self.scan_button.setEnabled(True)
-        self.start_button.setEnabled(True if self.dir_tree_widget.topLevelItemCount() > 0 else False)
+        self.start_button.setEnabled(True if self.sequence_model.rowCount() > 0 else False)
         self.cancel_batch_button.setEnabled(False)
         self.cancel_current_button.setEnabled(False)
         if self.batch_cancelled_flag :
@@ -1185,30 +1486,59 @@ class TimelapseApp(QWidget):
             self.overall_batch_progress_bar.setFormat("Batch Complete!")
             if self.overall_batch_progress_bar.maximum() > 0 : # Ensure it shows 100% if tasks ran
                  self.overall_batch_progress_bar.setValue(self.overall_batch_progress_bar.maximum())
-        self.active_ffmpeg_worker = None # Ensure cleared
+        self.current_throughput_label.setText("")
+        log_event("batch_finish", cancelled=self.batch_cancelled_flag,
+                  sequences_processed=self.batch_scheduler.sequences_finished,
+                  bytes=self.batch_finished_bytes, duration_s=round(time.monotonic() - self.batch_start_time, 3))
+        self.batch_throughput_label.setText(
+            f"{format_byte_count(self.batch_finished_bytes)} written"
+            f" in {format_duration(time.monotonic() - self.batch_start_time)}")
+        self.running_jobs = {} # Ensure cleared
         self.batch_cancelled_flag = False # Reset for next run
 
-    def update_current_sequence_progress_slot(self, current_frame, total_frames):
-        if total_frames > 0: # Check total_frames before setting maximum
-            if self.current_sequence_progress_bar.maximum() != total_frames:
-                 self.current_sequence_progress_bar.setMaximum(total_frames)
-            self.current_sequence_progress_bar.setValue(current_frame)
-        else: # Handle case where total_frames might be 0 (e.g., error or empty sequence)
-            self.current_sequence_progress_bar.setMaximum(100) # Default max
-            self.current_sequence_progress_bar.setValue(0)
+    def update_current_sequence_progress_slot(self, worker, current_frame, total_frames, progress_stats):
+        job = self.running_jobs.get(worker)
+        if job is None:  # Late signal from a job that has already finished
+            return
+        job["frames_done"] = min(current_frame, total_frames) if total_frames > 0 else 0
+        job["progress_stats"] = progress_stats
+        job["throughput"].update(job["frames_done"], progress_stats.get("total_size"),
+                                 progress_stats.get("out_time_us"), progress_stats.get("speed"))
+        self.update_running_jobs_progress()
+        self.update_overall_batch_progress()
 
     def closeEvent(self, event):
         """Ensure timer is stopped when the application window is closed."""
         self.log("Application closing, stopping monitor timer...")
         if hasattr(self, 'monitor_timer') and self.monitor_timer.isActive():
             self.monitor_timer.stop()
+        if self.monitor_sampler is not None:
+            self.monitor_sampler.stop()
+        if self.gpu_detect_worker is not None and self.gpu_detect_worker.isRunning():
+            self.gpu_detect_worker.wait(6000)  # Bounded by detect_gpu_type's own nvidia-smi timeout
+        if self.rollover_merge_worker is not None and self.rollover_merge_worker.isRunning():
+            self.rollover_merge_worker.merged.disconnect()  # Too late to start the batch
+            self.rollover_merge_worker.wait(3000)
         # Clean up any running FFmpeg workers if necessary
-        if self.active_ffmpeg_worker and self.active_ffmpeg_worker.isRunning():
-            self.log("Stopping active FFmpeg worker...")
-            self.active_ffmpeg_worker.cancel_task() # Ask it to terminate
-            if not self.active_ffmpeg_worker.wait(3000): # Wait up to 3s
-                 self.log("FFmpeg worker did not terminate gracefully on close.")
-                 # It should be killed by its own finally block or OS
+        running_workers = [w for w in self.ffmpeg_workers if w.isRunning()]
+        if running_workers:
+            self.log(f"Stopping {len(running_workers)} active FFmpeg worker(s)...")
+            self.batch_cancelled_flag = True
+            if self.batch_scheduler is not None:
+                self.batch_scheduler.cancel()
+            for worker in running_workers:
+                worker.cancel_task() # Ask it to terminate
+            for worker in running_workers:
+                if not worker.wait(3000): # Wait up to 3s
+                    self.log("FFmpeg worker did not terminate gracefully on close.")
+                    # It should be killed by its own finally block or OS
+        if self.active_scan_worker and self.active_scan_worker.isRunning():
+            self.active_scan_worker.cancel_scan()
+            self.active_scan_worker.wait(3000)
+        self.scan_index.close()
+        set_probe_cache(None)
+        self.probe_cache.close()
+        stop_run_log()
         super().closeEvent(event) # Important to call the base class method
 
 class AboutDialog(QDialog):  # Import QDialog from PyQt6.QtWidgets
@@ -1293,6 +1623,12 @@ if __name__ == '__main__':
     load_stylesheet(app, stylesheet_path)
     window = TimelapseApp()
     window.show()
+
+    def report_time_to_interactive():  # First event loop pass after show(): the window is painted and responsive
+        startup_ms = (time.perf_counter() - APP_START_TIME) * 1000
+        window.log(f"Window interactive after {startup_ms:.0f} ms.")
+        log_event("startup", time_to_interactive_ms=round(startup_ms, 1))
+    QTimer.singleShot(0, report_time_to_interactive)
     sys.exit(app.exec())
 
 # --- END OF FILE ---
\ No newline at end of file
@@ -1,6 +1,7 @@
-import psutil
 import subprocess
 import os
+import threading
+import time
 from pathlib import Path  # Might not be needed here if functions take simple paths
 
 
@@ -8,6 +9,7 @@ from pathlib import Path  # Might not be needed here if functions take simple pa
 def get_cpu_usage() -> float | None:
     """Returns overall CPU utilization as a percentage, or None on error."""
     try:
+        import psutil  # Imported on first use, so importing this module stays cheap at GUI startup
         return psutil.cpu_percent(interval=None)  # Non-blocking after first call
     except Exception as e:
         print(f"MonitoringEngine Error: Could not get CPU usage: {e}")
@@ -17,6 +19,7 @@ def get_cpu_usage() -> float | None:
 def get_memory_usage() -> float | None:
     """Returns overall memory utilization as a percentage, or None on error."""
     try:
+        import psutil
         mem_info = psutil.virtual_memory()
         return mem_info.percent
     except Exception as e:
@@ -28,6 +31,7 @@ def get_memory_usage() -> float | None:
 # This section will be the most platform-dependent
 
 _gpu_type_cache = None  # Simple cache for detected GPU type
+NVIDIA_SMI_EXECUTABLE = os.environ.get("TIMELAPSE_NVIDIA_SMI", "nvidia-smi")  # Overridable, e.g. with a stub script
 
 
 def detect_gpu_type() -> str | None:
@@ -44,7 +48,7 @@ def detect_gpu_type() -> str | None:
     try:
         # Use creationflags to hide console window on Windows for subprocess
         creation_flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-        result = subprocess.run(['nvidia-smi', '-L'], capture_output=True, text=True, check=False,
+        result = subprocess.run([NVIDIA_SMI_EXECUTABLE, '-L'], capture_output=True, text=True, check=False,
                                 creationflags=creation_flags, timeout=5)
         if result.returncode == 0 and "GPU 0:" in result.stdout:
             _gpu_type_cache = "nvidia"
@@ -68,12 +72,18 @@ def detect_gpu_type() -> str | None:
     return None
 
 
+def set_detected_gpu_type(gpu_type: str | None):
+    """Seeds the detection cache with a previously detected type (e.g. persisted by the GUI)."""
+    global _gpu_type_cache
+    _gpu_type_cache = gpu_type or "unknown"
+
+
 def get_nvidia_gpu_utilization() -> float | None:
     """Gets NVIDIA GPU utilization percentage using nvidia-smi."""
     try:
         creation_flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
         result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=utilization.gpu', '--format=csv,noheader,nounits'],
+            [NVIDIA_SMI_EXECUTABLE, '--query-gpu=utilization.gpu', '--format=csv,noheader,nounits'],
             capture_output=True, text=True, check=True, creationflags=creation_flags, timeout=5
         )
         return float(result.stdout.strip().replace('%', ''))
@@ -85,6 +95,104 @@ def get_nvidia_gpu_utilization() -> float | None:
         return None
 
 
+class NvidiaSmiSession:
+    """
+    One long-lived `nvidia-smi --query-gpu=... --loop-ms=N` process whose CSV output is parsed line by line
+    on a reader thread, instead of starting nvidia-smi for every sample. The process is restarted (with
+    growing back-off) if it exits or cannot be started. Readings older than a few loop periods count as missing.
+    """
+    FIELDS = ("index", "utilization.gpu", "utilization.memory", "memory.used", "memory.total")
+
+    def __init__(self, executable: str | None = None, loop_ms: int = 1000, restart_delay_s: float = 2.0,
+                 max_restart_delay_s: float = 60.0):
+        self.executable = executable or NVIDIA_SMI_EXECUTABLE
+        self.loop_ms = loop_ms
+        self.restart_delay_s = restart_delay_s
+        self.max_restart_delay_s = max_restart_delay_s
+        self.restart_count = 0
+        self._readings = {}  # GPU index -> ({field: float | None}, monotonic time)
+        self._lock = threading.Lock()
+        self._process_lock = threading.Lock()  # Orders stop()'s terminate against the reader thread's Popen
+        self._stop_event = threading.Event()
+        self._process = None
+        self._thread = None
+
+    @classmethod
+    def parse_line(cls, line: str) -> dict | None:
+        """Parses one csv,noheader,nounits line into {field: float or None}; None if it is not a data line."""
+        parts = [part.strip() for part in line.split(",")]
+        if len(parts) != len(cls.FIELDS):
+            return None
+        reading = {}
+        for field, part in zip(cls.FIELDS, parts):
+            try:
+                reading[field] = float(part.rstrip(" %"))
+            except ValueError:  # "[N/A]", "[Not Supported]"
+                reading[field] = None
+        return reading if reading["index"] is not None else None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="NvidiaSmiSession", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_event.set()
+        with self._process_lock:
+            process = self._process
+            if process is not None and process.poll() is None:
+                process.terminate()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        delay = self.restart_delay_s
+        cmd = [self.executable, f"--query-gpu={','.join(self.FIELDS)}", "--format=csv,noheader,nounits",
+               f"--loop-ms={self.loop_ms}"]
+        creation_flags = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        while not self._stop_event.is_set():
+            got_data = False
+            try:
+                process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                           stderr=subprocess.DEVNULL, text=True, bufsize=1,
+                                           creationflags=creation_flags)
+                with self._process_lock:
+                    self._process = process
+                    if self._stop_event.is_set():  # stop() ran while the process was starting
+                        process.terminate()
+                with process:  # Closes stdout and waits for the process on the way out
+                    for line in process.stdout:
+                        reading = self.parse_line(line)
+                        if reading is None:
+                            continue
+                        got_data = True
+                        with self._lock:
+                            self._readings[int(reading["index"])] = (reading, time.monotonic())
+            except OSError as e:
+                print(f"MonitoringEngine Error (NVIDIA): Could not run {self.executable}: {e}")
+            if self._stop_event.is_set():
+                break
+            delay = self.restart_delay_s if got_data else min(delay * 2, self.max_restart_delay_s)
+            self.restart_count += 1
+            self._stop_event.wait(delay)
+        with self._process_lock:
+            self._process = None
+
+    def latest_readings(self) -> dict[int, dict]:
+        """Fresh readings per GPU index; stale ones (nvidia-smi stalled or restarting) are left out."""
+        max_age_s = 3 * self.loop_ms / 1000
+        now = time.monotonic()
+        with self._lock:
+            return {index: reading for index, (reading, read_at) in self._readings.items() if now - read_at <= max_age_s}
+
+    def utilization(self) -> float | None:
+        """Utilization of the busiest GPU, or None if there is no fresh reading."""
+        values = [reading["utilization.gpu"] for reading in self.latest_readings().values()
+                  if reading["utilization.gpu"] is not None]
+        return max(values) if values else None
+
+
 def get_gpu_usage() -> tuple[str, float] | tuple[None, None]:
     """
     Attempts to get GPU usage.
@@ -106,6 +214,95 @@ def get_gpu_usage() -> tuple[str, float] | tuple[None, None]:
     return None, None
 
 
+# --- Background Sampling ---
+class MonitorSampler:
+    """
+    Samples CPU, memory and (when a GPU type is set) GPU utilization on its own thread every interval_s
+    seconds, into fixed-size NumPy ring buffers holding history_s seconds. Readers only take snapshots,
+    so a slow nvidia-smi call never stalls the GUI, and memory use is fixed however long the app runs.
+    """
+    METRICS = ("cpu", "mem", "gpu")
+
+    def __init__(self, interval_s: float = 1.0, history_s: float = 4 * 3600, gpu_type: str | None = None):
+        import numpy as np  # Imported here so importing this module stays cheap at GUI startup
+        self.interval_s = interval_s
+        self.gpu_type = gpu_type
+        self.capacity = max(2, int(history_s / interval_s))
+        self._times = np.zeros(self.capacity, dtype=np.float64)
+        self._values = np.full((len(self.METRICS), self.capacity), np.nan, dtype=np.float32)
+        self._next_index = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._nvidia_session = None
+        self.set_gpu_type(gpu_type)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="MonitorSampler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.set_gpu_type(None)
+
+    def set_gpu_type(self, gpu_type: str | None):
+        """Selects the GPU source; for NVIDIA this starts (or stops) one streaming nvidia-smi session."""
+        self.gpu_type = gpu_type
+        if gpu_type == "nvidia" and self._nvidia_session is None:
+            self._nvidia_session = NvidiaSmiSession(loop_ms=max(100, int(self.interval_s * 1000)))
+            self._nvidia_session.start()
+        elif gpu_type != "nvidia" and self._nvidia_session is not None:
+            self._nvidia_session.stop()
+            self._nvidia_session = None
+
+    def _sample(self) -> tuple:
+        nvidia_session = self._nvidia_session
+        gpu_usage = nvidia_session.utilization() if nvidia_session is not None else None
+        return get_cpu_usage(), get_memory_usage(), gpu_usage
+
+    def _run(self):
+        next_sample_time = time.monotonic()
+        while not self._stop_event.is_set():
+            values = [float("nan") if value is None else value for value in self._sample()]
+            with self._lock:
+                self._times[self._next_index] = time.monotonic()
+                self._values[:, self._next_index] = values
+                self._next_index = (self._next_index + 1) % self.capacity
+                self._count = min(self._count + 1, self.capacity)
+            next_sample_time += self.interval_s
+            delay = next_sample_time - time.monotonic()
+            if delay < 0:  # A sample took longer than the interval; skip ahead rather than burst
+                next_sample_time, delay = time.monotonic(), 0
+            self._stop_event.wait(delay)
+
+    def snapshot(self, max_points: int = 600):
+        """
+        Returns (seconds_ago, {metric: values}) in chronological order, NaN where a sample was missing.
+        Longer histories are reduced to about max_points buckets, keeping each bucket's peak so short
+        spikes stay visible.
+        """
+        import numpy as np
+        with self._lock:
+            count, end = self._count, self._next_index
+            order = (np.arange(end - count, end)) % self.capacity
+            times = self._times[order]
+            values = self._values[:, order]
+        if count > max_points:
+            bucket = -(-count // max_points)  # Ceiling division
+            usable = count - count % bucket
+            times = times[count - usable:].reshape(-1, bucket)[:, -1]
+            buckets = values[:, count - usable:].reshape(len(self.METRICS), -1, bucket)
+            peaks = np.where(np.isnan(buckets), -np.inf, buckets).max(axis=2)
+            values = np.where(np.isneginf(peaks), np.nan, peaks)  # Buckets with no valid sample stay NaN
+        seconds_ago = times - time.monotonic() if count else times
+        return seconds_ago, {metric: values[i] for i, metric in enumerate(self.METRICS)}
+
+
 # Example of how the GUI might use this engine:
 if __name__ == "__main__":
     print("Monitoring Engine Test:")
@@ -0,0 +1,78 @@
+# run_log.py
+"""
+Structured run history: one JSON object per line in a rotating file.
+Events are handed to a queue and written by a background listener thread, so callers never wait on disk.
+Until start_run_log() is called, log_event() does nothing.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+from pathlib import Path
+
+RUN_LOG_DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+RUN_LOG_DEFAULT_BACKUP_COUNT = 20
+
+_run_logger = logging.getLogger("timelapse.run")
+_run_logger.setLevel(logging.INFO)
+_run_logger.propagate = False  # Keep run events out of any root/console logging
+_queue_handler = None
+_listener = None
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+                 "event": record.msg, "pid": record.process, "thread": record.threadName}
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class _PassthroughQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # Formatting happens on the listener thread, not in the caller
+
+def start_run_log(log_path: Path, max_bytes: int = RUN_LOG_DEFAULT_MAX_BYTES,
+                  backup_count: int = RUN_LOG_DEFAULT_BACKUP_COUNT) -> bool:
+    """Starts writing events to log_path (rotated at max_bytes). Returns False if the file cannot be opened."""
+    global _queue_handler, _listener
+    if _listener is not None:
+        return True
+    try:
+        log_path = Path(log_path)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=max_bytes,
+                                                            backupCount=backup_count, encoding="utf-8")
+    except OSError as e:
+        print(f"Run log Warning: Could not open '{log_path}': {e}")
+        return False
+    file_handler.setFormatter(JsonLinesFormatter())
+    event_queue = queue.SimpleQueue()
+    _queue_handler = _PassthroughQueueHandler(event_queue)
+    _listener = logging.handlers.QueueListener(event_queue, file_handler)
+    _listener.start()
+    _run_logger.addHandler(_queue_handler)
+    return True
+
+def stop_run_log():
+    """Writes out every queued event and closes the file."""
+    global _queue_handler, _listener
+    if _listener is None:
+        return
+    _run_logger.removeHandler(_queue_handler)
+    _listener.stop()  # Drains the queue before returning
+    for handler in _listener.handlers:
+        handler.close()
+    _queue_handler, _listener = None, None
+
+def log_event(event: str, **fields):
+    """Records one event, e.g. log_event("job_finish", output="a.mp4", exit_code=0). Cheap no-op when disabled."""
+    if _listener is None:
+        return
+    _run_logger.info(event, extra={"fields": fields})
+
+def file_size_or_none(path) -> int | None:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
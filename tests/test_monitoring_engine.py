@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from monitoring_engine import NvidiaSmiSession
+
+# Stands in for `nvidia-smi --query-gpu=... --loop-ms=N`: the first run prints one block and exits (as when
+# the driver resets), every later run keeps printing blocks until it is terminated.
+STUB_NVIDIA_SMI = """#!{python}
+import sys, time
+from pathlib import Path
+runs_path = Path(__file__).with_name("runs")
+run = int(runs_path.read_text()) + 1 if runs_path.exists() else 1
+runs_path.write_text(str(run))
+utilization = 10 if run == 1 else 90
+while True:
+    print(f"0, {{utilization}}, 5, 1000, 8192")
+    print("1, [N/A], [Not Supported], 512, 4096")
+    print("not a data line")
+    sys.stdout.flush()
+    if run == 1:
+        break
+    time.sleep(0.05)
+"""
+
+
+def wait_for(condition, timeout_s=10.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@unittest.skipIf(os.name == "nt", "the stub nvidia-smi is a shebang script")
+class NvidiaSmiSessionTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.stub_path = Path(temp_dir.name) / "nvidia-smi"
+        self.stub_path.write_text(STUB_NVIDIA_SMI.format(python=sys.executable))
+        self.stub_path.chmod(0o755)
+        self.session = NvidiaSmiSession(str(self.stub_path), loop_ms=1000, restart_delay_s=0.05)
+        self.addCleanup(self.session.stop)
+
+    def test_parse_line(self):
+        self.assertEqual(NvidiaSmiSession.parse_line("1, [N/A], 7 %, 512, 4096"),
+                         {"index": 1.0, "utilization.gpu": None, "utilization.memory": 7.0,
+                          "memory.used": 512.0, "memory.total": 4096.0})
+        self.assertIsNone(NvidiaSmiSession.parse_line("[N/A], 1, 2, 3, 4"))
+        self.assertIsNone(NvidiaSmiSession.parse_line("index, utilization.gpu"))
+
+    def test_readings_of_every_gpu_survive_a_restart(self):
+        self.session.start()
+        self.assertTrue(wait_for(lambda: self.session.utilization() == 90))
+        self.assertGreaterEqual(self.session.restart_count, 1)
+        readings = self.session.latest_readings()
+        self.assertEqual(sorted(readings), [0, 1])
+        self.assertEqual(readings[0]["memory.total"], 8192)
+        self.assertIsNone(readings[1]["utilization.gpu"])
+        self.assertIsNone(readings[1]["utilization.memory"])
+        self.assertEqual(readings[1]["memory.used"], 512)
+
+    def test_stop_ends_the_process(self):
+        self.session.start()
+        self.assertTrue(wait_for(lambda: self.session.utilization() == 90))
+        process = self.session._process
+        self.session.stop()
+        self.assertFalse(self.session._thread.is_alive())
+        self.assertIsNotNone(process.poll())
+
+    def test_stop_right_after_start(self):
+        for _ in range(5):
+            self.session.start()
+            self.session.stop()
+            self.assertFalse(self.session._thread.is_alive())
+            self.assertIsNone(self.session._process)
+
+
+if __name__ == "__main__":
+    unittest.main()
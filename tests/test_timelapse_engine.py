@@ -0,0 +1,223 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+
+from timelapse_engine import (ScanIndex, bridge_frame_gaps, compile_filename_pattern, find_sequences_in_dir,
+                              plan_chunk_ranges, write_concat_list, write_frame_list)
+
+
+def read_concat_entries(list_path: Path) -> list[str]:
+    """The file entries of an ffconcat list, unquoted as ffmpeg reads them."""
+    entries = []
+    for line in list_path.read_text(encoding="utf-8").splitlines():
+        if line.startswith("file "):
+            entries.append(line[len("file "):].strip("'").replace("'\\''", "'"))
+    return entries
+
+
+def read_frame_list(list_path: Path) -> list[tuple[str, float]]:
+    """(file name, duration) pairs of a frame list, without the repeated last entry."""
+    frames = []
+    for line in list_path.read_text(encoding="utf-8").splitlines():
+        if line.startswith("file "):
+            frames.append([Path(line[len("file "):].strip("'")).name, None])
+        elif line.startswith("duration "):
+            frames[-1][1] = float(line[len("duration "):])
+    return [(name, duration) for name, duration in frames if duration is not None]
+
+
+class ConcatListTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(temp_dir.name)
+        Path("out").mkdir()
+        Path("proj/it's").mkdir(parents=True)
+        for frame_number in (1, 2, 5):
+            Path(f"proj/it's/P{frame_number:04d}.JPG").touch()
+
+    def assert_entries_resolve(self, list_path: Path):
+        entries = read_concat_entries(list_path)
+        self.assertTrue(entries)
+        for entry in entries:  # ffmpeg joins relative entries to the list's own directory
+            self.assertTrue((list_path.parent / entry).is_file(), entry)
+
+    def test_frame_list_from_relative_paths(self):
+        sequence = find_sequences_in_dir(Path("proj/it's"), "P", ".JPG", max_frame_gap=2)[0]
+        list_path = Path("out/a.frames.ffconcat")
+        self.assertEqual(write_frame_list(sequence, list_path, 10.0), 5)
+        self.assert_entries_resolve(list_path)
+
+    def test_concat_list_from_relative_paths(self):
+        chunk_paths = [Path("out/a.part000.mov"), Path("out/a.part001.mov")]
+        for chunk_path in chunk_paths:
+            chunk_path.touch()
+        list_path = Path("out/a.concat.txt")
+        write_concat_list(list_path, chunk_paths)
+        self.assert_entries_resolve(list_path)
+
+
+class FilenamePatternTest(unittest.TestCase):
+    def test_prefix_and_suffix_alternatives(self):
+        pattern = compile_filename_pattern("IMG_|DSC", ".JPG|.jpeg")
+        self.assertEqual(pattern.match("IMG_0001.JPG"), ("IMG_", "0001", ".JPG"))
+        self.assertEqual(pattern.match("DSC0042.jpeg"), ("DSC", "0042", ".jpeg"))
+        self.assertIsNone(pattern.match("IMG_0001.jpg"))
+        self.assertIsNone(pattern.match("GOPR0001.JPG"))
+
+    def test_ignore_case(self):
+        pattern = compile_filename_pattern("img_", ".jpg", ignore_case=True)
+        self.assertEqual(pattern.match("IMG_0001.JPG"), ("IMG_", "0001", ".JPG"))
+
+    def test_globs_leave_the_digits_to_the_frame_number(self):
+        pattern = compile_filename_pattern("*_", ".?IF")
+        self.assertEqual(pattern.match("cam_2_0123.TIF"), ("cam_2_", "0123", ".TIF"))
+        self.assertEqual(pattern.match("a_7.GIF"), ("a_", "7", ".GIF"))
+
+    def test_template_is_a_whole_filename(self):
+        pattern = compile_filename_pattern("GOPR{frame}.JPG|IMG_", ".CR2")
+        self.assertEqual(pattern.match("GOPR0007.JPG"), ("GOPR", "0007", ".JPG"))
+        self.assertIsNone(pattern.match("GOPR0007.CR2"))
+        self.assertEqual(pattern.match("IMG_0001.CR2"), ("IMG_", "0001", ".CR2"))
+
+    def test_iter_matches_skips_other_names(self):
+        pattern = compile_filename_pattern("P", ".JPG")
+        names = ["P0001.JPG", "notes.txt", "P0002.JPG", "bad\nP0003.JPG", "P0004.JPG.xmp"]
+        self.assertEqual(list(pattern.iter_matches(names)), [("P", "0001", ".JPG"), ("P", "0002", ".JPG")])
+
+
+class PlanChunkRangesTest(unittest.TestCase):
+    def assert_covers(self, ranges, frame_count):
+        self.assertEqual(ranges[0][0], 0)
+        for (offset, count), (next_offset, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(offset + count, next_offset)
+        self.assertEqual(ranges[-1][0] + ranges[-1][1], frame_count)
+
+    def test_chunks_map_to_whole_output_frames(self):
+        ranges = plan_chunk_ranges(1001, 3, 24.0, 30.0, min_frames_per_chunk=100)
+        self.assertEqual(len(ranges), 3)
+        self.assert_covers(ranges, 1001)
+        for _, count in ranges[:-1]:  # 24 -> 30 fps turns every 4 input frames into 5 output frames
+            self.assertEqual(count % 4, 0)
+
+    def test_chunk_count_is_limited_by_the_minimum_chunk_length(self):
+        self.assertEqual(plan_chunk_ranges(400, 4, 10.0, 30.0), [(0, 400)])
+        ranges = plan_chunk_ranges(2000, 8, 10.0, 30.0, min_frames_per_chunk=500)
+        self.assertEqual(len(ranges), 4)
+        self.assert_covers(ranges, 2000)
+
+    def test_single_chunk(self):
+        self.assertEqual(plan_chunk_ranges(5000, 1, 10.0, 30.0), [(0, 5000)])
+
+
+class FrameGapTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory_path = Path(temp_dir.name)
+        for name in ("P0001.JPG", "P0002.JPG", "P0005.JPG", "P0006.JPG", "P0020.JPG", "P07.JPG", "P08.JPG"):
+            (self.directory_path / name).touch()
+
+    def bridged_sequence(self):
+        sequences = find_sequences_in_dir(self.directory_path, "P", ".JPG", max_frame_gap=2)
+        return next(sequence for sequence in sequences if sequence.start_number_str == "0001")
+
+    def test_bridge_frame_gaps(self):
+        sequences = find_sequences_in_dir(self.directory_path, "P", ".JPG")
+        self.assertEqual(len(sequences), 4)
+        bridged = {sequence.start_number_str: sequence for sequence in bridge_frame_gaps(sequences, 2)}
+        self.assertEqual(sorted(bridged), ["0001", "0020", "07"])  # Other padding is another naming scheme
+        self.assertEqual(bridged["0001"].frame_count, 4)
+        self.assertEqual(bridged["0001"].slot_count(), 6)
+        self.assertEqual(bridged["0001"].last_number, 6)
+        self.assertEqual(len(bridge_frame_gaps(sequences, 1)), 4)  # Two frames missing after P0002
+
+    def test_frame_list_chunks_split_inside_a_held_gap(self):
+        sequence = self.bridged_sequence()
+        self.assertEqual(sequence.slot_count(), 6)  # 1, 2 held for 3 and 4, 5, 6
+        list_path = self.directory_path / "chunk.ffconcat"
+        chunks = []
+        for slot_offset, slot_count in ((0, 2), (2, 3), (5, 1)):
+            self.assertEqual(write_frame_list(sequence, list_path, 10.0, slot_offset, slot_count), slot_count)
+            chunks.append(read_frame_list(list_path))
+        self.assertEqual(chunks, [[("P0001.JPG", 0.1), ("P0002.JPG", 0.1)],
+                                  [("P0002.JPG", 0.2), ("P0005.JPG", 0.1)],
+                                  [("P0006.JPG", 0.1)]])
+
+    def test_frame_list_without_held_gaps(self):
+        sequence = self.bridged_sequence()
+        list_path = self.directory_path / "all.ffconcat"
+        self.assertEqual(write_frame_list(sequence, list_path, 10.0, hold_gaps=False), 4)
+        self.assertEqual(read_frame_list(list_path), [("P0001.JPG", 0.1), ("P0002.JPG", 0.1),
+                                                      ("P0005.JPG", 0.1), ("P0006.JPG", 0.1)])
+
+
+class ScanIndexTest(unittest.TestCase):
+    SETTLED_MTIME_NS = 1_600_000_000 * 10**9  # Well before MTIME_SETTLE_S of the scan
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory_path = Path(temp_dir.name) / "frames"
+        self.directory_path.mkdir()
+        for frame_number in (1, 2, 3):
+            (self.directory_path / f"P{frame_number:04d}.JPG").touch()
+        self.scan_index = ScanIndex(Path(temp_dir.name) / "index.sqlite3")
+        self.addCleanup(self.scan_index.close)
+
+    def settle(self):
+        os.utime(self.directory_path, ns=(self.SETTLED_MTIME_NS, self.SETTLED_MTIME_NS))
+
+    def test_same_mtime_with_a_new_file_is_rescanned(self):
+        self.settle()
+        self.assertEqual(self.scan_index.get_runs(self.directory_path, "P", ".JPG"), [("P", ".JPG", "0001", 3)])
+        self.assertIsNotNone(self.scan_index.lookup(self.directory_path, "P", ".JPG"))
+        (self.directory_path / "P0004.JPG").touch()
+        self.settle()  # As on a 2 s FAT/exFAT mtime that did not tick over
+        self.assertIsNone(self.scan_index.lookup(self.directory_path, "P", ".JPG"))
+        self.assertEqual(self.scan_index.get_runs(self.directory_path, "P", ".JPG"), [("P", ".JPG", "0001", 4)])
+
+    def test_recently_modified_directory_is_not_stored(self):
+        self.assertEqual(self.scan_index.get_runs(self.directory_path, "P", ".JPG"), [("P", ".JPG", "0001", 3)])
+        self.assertIsNone(self.scan_index.lookup(self.directory_path, "P", ".JPG"))
+
+
+class ScanMemoryTest(unittest.TestCase):
+    FRAME_COUNT = 50_000
+    GAP = range(20_001, 20_011)  # Ten missing frames, bridged with max_frame_gap
+    MAX_PEAK_BYTES_PER_FRAME = 128  # A (Path, str, int) tuple per file, as scans used to build, is several hundred
+    MAX_RETAINED_BYTES = 16 * 1024  # The result is run pairs, not per-frame objects
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.directory_path = Path(temp_dir.name)
+        for frame_number in range(1, self.FRAME_COUNT + 1):
+            if frame_number not in self.GAP:
+                (self.directory_path / f"P{frame_number:06d}.JPG").touch()
+        find_sequences_in_dir(self.directory_path, "P", ".JPG")  # Compiles and caches the filename pattern
+
+    def test_peak_scan_memory_per_frame(self):
+        frames_on_disk = self.FRAME_COUNT - len(self.GAP)
+        tracemalloc.start()
+        try:
+            sequences = find_sequences_in_dir(self.directory_path, "P", ".JPG", max_frame_gap=len(self.GAP))
+            retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(len(sequences), 1)
+        self.assertEqual(sequences[0].frame_count, frames_on_disk)
+        self.assertEqual(sequences[0].slot_count(), self.FRAME_COUNT)
+        peak_bytes_per_frame = peak_bytes / frames_on_disk
+        print(f"\nScan of {frames_on_disk} frames: peak {peak_bytes_per_frame:.1f} bytes/frame, "
+              f"{retained_bytes} bytes retained")
+        self.assertLess(peak_bytes_per_frame, self.MAX_PEAK_BYTES_PER_FRAME)
+        self.assertLess(retained_bytes, self.MAX_RETAINED_BYTES)
+
+
+if __name__ == "__main__":
+    unittest.main()
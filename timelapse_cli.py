@@ -0,0 +1,313 @@
+# timelapse_cli.py
+"""
+Headless batch rendering for machines without a display. Imports only the engine (standard library),
+never Qt, pyqtgraph or psutil.
+
+Scans a parent directory, encodes every sequence found with the settings of a preset saved by the GUI,
+and writes one JSON object per line to stdout (scan results, job start/progress/finish, batch totals).
+Human-readable engine messages go to stderr.
+
+Example:
+    python timelapse_cli.py timelapse_projects --preset timelapse_presets/prores_4k.json --jobs 3
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+from run_log import start_run_log, stop_run_log, log_event, file_size_or_none
+from timelapse_engine import (
+    find_potential_sequence_dirs,
+    find_sequences_in_dir,
+    build_chunked_ffmpeg_commands,
+    build_common_settings,
+    merge_rollover_sequences,
+    SequenceChain,
+    BatchScheduler,
+    default_concurrent_jobs,
+    ScanIndex,
+    ProbeCache,
+    StderrRingBuffer,
+    ThroughputTracker,
+    FFmpegProgressParser,
+    add_progress_args,
+    set_probe_cache,
+    ENGINE_DEFAULT_FILENAME_PREFIX,
+    ENGINE_DEFAULT_FILENAME_SUFFIX,
+    ENGINE_DEFAULT_DISCOVERY_WORKERS,
+    ENGINE_DEFAULT_ROLLOVER_MAX_GAP_S,
+)
+
+# --- CLI Default Configuration (same files as the GUI, so both share caches and history) ---
+CLI_DEFAULT_OUTPUT_DIR = Path("timelapses_output")
+CLI_DEFAULT_SCAN_INDEX_PATH = Path(".") / "timelapse_scan_index.sqlite3"
+CLI_DEFAULT_PROBE_CACHE_PATH = Path(".") / "timelapse_probe_cache.sqlite3"
+CLI_DEFAULT_RUN_LOG_PATH = Path(".") / "timelapse_run_logs" / "runs.jsonl"
+CLI_DEFAULT_PROGRESS_INTERVAL_S = 1.0
+
+class JsonEventWriter:
+    """Writes events as JSON lines; shared by all job threads."""
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        line = json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+def _drain_stderr(pipe, stderr_buffer: StderrRingBuffer):
+    try:
+        for line in pipe:
+            stderr_buffer.append(line)
+    except (OSError, ValueError):
+        pass
+
+def run_ffmpeg_job(job: dict, events: JsonEventWriter, progress_interval: float) -> dict:
+    """Runs one ffmpeg command to completion, emitting throttled progress events. Returns the job dict."""
+    cmd = add_progress_args(job["cmd"])
+    tracker = job["throughput"]
+    stderr_buffer = StderrRingBuffer()
+    job["start_time"] = time.monotonic()
+    events.emit("job_start", job=job["id"], kind=job["kind"], output=job["output_path"], frames=job["total_frames"])
+    log_event("job_start", kind=job["kind"], output=job["output_path"], frames=job["total_frames"], cmd=cmd)
+    try:
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, errors="replace", bufsize=1)  # ffmpeg output is not always UTF-8
+    except OSError as e:
+        job.update(return_code=None, diagnostics=f"Could not start ffmpeg: {e}")
+        return job
+    job["process"] = process
+    if job.get("stop_requested"):  # stop_job() ran before the process existed
+        process.terminate()
+    stderr_thread = threading.Thread(target=_drain_stderr, args=(process.stderr, stderr_buffer), daemon=True)
+    stderr_thread.start()
+
+    progress, last_emit_time = FFmpegProgressParser(), 0.0
+    try:
+        for line in process.stdout:
+            if not progress.feed(line):
+                continue
+            job["frames_done"] = job["total_frames"] if progress.ended else min(progress.frame, job["total_frames"])
+            tracker.update(job["frames_done"], progress.stats.get("total_size"), progress.stats.get("out_time_us"),
+                           progress.stats.get("speed"))
+            now = time.monotonic()
+            if progress.ended or now - last_emit_time >= progress_interval:
+                last_emit_time = now
+                events.emit("job_progress", job=job["id"], output=job["output_path"], frame=job["frames_done"],
+                            total_frames=job["total_frames"], fps=tracker.frames_per_second, speed=tracker.speed,
+                            bitrate_bps=tracker.bitrate_bps, bytes=tracker.bytes_written, eta_s=tracker.eta_seconds)
+        process.wait()
+    finally:
+        if process.poll() is None:  # The job runner itself failed; never leave ffmpeg running
+            process.kill()
+            process.wait()
+    stderr_thread.join(timeout=5)
+    job["return_code"] = process.returncode
+    job["diagnostics"] = stderr_buffer.format_diagnostics() if process.returncode != 0 else ""
+    return job
+
+def stop_job(job: dict):
+    """Asks a running job's ffmpeg to exit; a job whose process has not started yet terminates it on start."""
+    job["stop_requested"] = True
+    process = job.get("process")
+    if process and process.poll() is None:
+        process.terminate()
+
+def scan_sequences(parent_dir: Path, prefix: str, suffix: str, scan_index, events: JsonEventWriter,
+                   ignore_case: bool = False, max_frame_gap: int = 0) -> list:
+    dirs_to_scan = find_potential_sequence_dirs(parent_dir, prefix, suffix, scan_index=scan_index,
+                                                max_workers=ENGINE_DEFAULT_DISCOVERY_WORKERS,
+                                                ignore_case=ignore_case)
+    sequences = []
+    if not dirs_to_scan:
+        return sequences
+    with ThreadPoolExecutor(max_workers=min(ENGINE_DEFAULT_DISCOVERY_WORKERS, len(dirs_to_scan))) as executor:
+        for dir_sequences in executor.map(
+                lambda d: find_sequences_in_dir(d, prefix, suffix, scan_index=scan_index, ignore_case=ignore_case,
+                                                max_frame_gap=max_frame_gap),
+                dirs_to_scan):
+            for sequence in dir_sequences:
+                events.emit("sequence", dir=sequence.directory_path, pattern=sequence.image_pattern,
+                            start_number=sequence.start_number_str, frames=sequence.frame_count)
+            sequences.extend(dir_sequences)
+    return sequences
+
+def run_batch(sequences: list, settings: dict, job_slots: int, chunks_per_sequence: int,
+              events: JsonEventWriter, progress_interval: float) -> bool:
+    """Encodes all sequences, up to job_slots ffmpeg processes at a time. Returns True if every one succeeded."""
+    def sequence_finished(sequence, success, output):
+        events.emit("sequence_finish", dir=sequence.directory_path, start_number=sequence.start_number_str,
+                    success=success, output=output)
+
+    scheduler = BatchScheduler(sequences, settings, chunks_per_sequence,
+                               log=lambda message: print(message, file=sys.stderr),
+                               on_sequence_finished=sequence_finished)
+    events.emit("batch_start", sequences=len(sequences), frames=scheduler.total_frames, job_slots=job_slots,
+                video_codec=settings["video_codec"])
+    log_event("batch_start", sequences=len(sequences), frames=scheduler.total_frames, job_slots=job_slots,
+              video_codec=settings["video_codec"])
+    batch_throughput = ThroughputTracker(scheduler.total_frames)
+    batch_start_time = time.monotonic()
+    running = {}  # Future -> job dict
+    finished_bytes = 0
+
+    executor = ThreadPoolExecutor(max_workers=job_slots)
+    try:
+        while True:
+            while len(running) < job_slots:
+                job = scheduler.next_job()
+                if job is None:
+                    break
+                job["throughput"] = ThroughputTracker(job["total_frames"])
+                running[executor.submit(run_ffmpeg_job, job, events, progress_interval)] = job
+            if not running:
+                break
+
+            done_futures, _ = wait(running, timeout=progress_interval, return_when=FIRST_COMPLETED)
+            for future in done_futures:
+                job = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:  # A runner error fails this job only, not the whole batch
+                    job.update(return_code=None, diagnostics=f"Error running ffmpeg: {e!r}")
+                success = job.get("return_code") == 0
+                duration_s = round(time.monotonic() - job.get("start_time", batch_start_time), 3)
+                events.emit("job_finish", job=job["id"], kind=job["kind"], output=job["output_path"],
+                            success=success, exit_code=job.get("return_code"), duration_s=duration_s,
+                            bytes=file_size_or_none(job["output_path"]), diagnostics=job.get("diagnostics") or None)
+                log_event("job_finish", kind=job["kind"], output=job["output_path"], success=success,
+                          exit_code=job.get("return_code"), duration_s=duration_s, frames=job["total_frames"],
+                          bytes=file_size_or_none(job["output_path"]))
+                if job["kind"] != "concat":  # Joins only copy bytes that were already counted
+                    finished_bytes += job["throughput"].bytes_written
+                for job_to_stop in scheduler.job_finished(job, success):
+                    stop_job(job_to_stop)  # A sibling chunk failed, so this one can never be joined
+
+            encoding_jobs = [job for job in running.values() if job["kind"] != "concat"]
+            batch_throughput.update(scheduler.finished_frames + sum(job["frames_done"] for job in encoding_jobs),
+                                    finished_bytes + sum(job["throughput"].bytes_written for job in encoding_jobs))
+            events.emit("batch_progress", frames_done=batch_throughput.frames_done,
+                        total_frames=scheduler.total_frames, running_jobs=len(running),
+                        fps=batch_throughput.frames_per_second, bytes=batch_throughput.bytes_written,
+                        eta_s=batch_throughput.eta_seconds)
+    except KeyboardInterrupt:
+        events.emit("batch_cancelled")
+        scheduler.cancel()
+        for job in running.values():
+            stop_job(job)
+        executor.shutdown(wait=True, cancel_futures=True)
+        for job in running.values():  # Lets the scheduler remove the files of interrupted chunk groups
+            scheduler.job_finished(job, False)
+        log_event("batch_finish", cancelled=True, sequences_processed=scheduler.sequences_finished,
+                  bytes=finished_bytes, duration_s=round(time.monotonic() - batch_start_time, 3))
+        raise
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    duration_s = round(time.monotonic() - batch_start_time, 3)
+    events.emit("batch_finish", succeeded=scheduler.succeeded, failed=scheduler.failed, bytes=finished_bytes,
+                duration_s=duration_s)
+    log_event("batch_finish", cancelled=False, sequences_processed=scheduler.sequences_finished,
+              bytes=finished_bytes, duration_s=duration_s)
+    return scheduler.failed == 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render timelapse sequences without the GUI.")
+    parser.add_argument("parent_dir", type=Path, help="Directory whose subdirectories hold the image sequences")
+    parser.add_argument("--preset", type=Path, required=True, help="Preset JSON saved by the GUI")
+    parser.add_argument("--prefix", default=ENGINE_DEFAULT_FILENAME_PREFIX,
+                        help='Image filename prefix; "|" separates alternatives, * and ? are globs, '
+                             'and a template like "GOPR{frame}.JPG" matches whole names')
+    parser.add_argument("--suffix", default=ENGINE_DEFAULT_FILENAME_SUFFIX,
+                        help='Image filename suffix; "|" separates alternatives, e.g. ".JPG|.jpeg"')
+    parser.add_argument("--ignore-case", action="store_true", help="Match the prefix and suffix case-insensitively")
+    parser.add_argument("--max-frame-gap", type=int,
+                        help="Keep sequences together across up to this many missing frames (default from preset)")
+    parser.add_argument("--merge-rollovers", action="store_true",
+                        help="Encode sequences continued across camera folders (100CANON, 101CANON, ...) as one")
+    parser.add_argument("--rollover-max-gap", type=float, default=ENGINE_DEFAULT_ROLLOVER_MAX_GAP_S,
+                        help="Longest capture-time gap in seconds bridged by --merge-rollovers")
+    parser.add_argument("--output-dir", type=Path, help="Overrides the preset's output directory")
+    parser.add_argument("--output-basename", default="", help="Base name for output files")
+    parser.add_argument("--jobs", type=int, help="Concurrent ffmpeg jobs (0 = auto; default from preset)")
+    parser.add_argument("--chunks", type=int, help="Chunks per long sequence (default from preset)")
+    parser.add_argument("--progress-interval", type=float, default=CLI_DEFAULT_PROGRESS_INTERVAL_S,
+                        help="Seconds between progress events per job")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the scan index and probe cache files")
+    parser.add_argument("--run-log", type=Path, default=CLI_DEFAULT_RUN_LOG_PATH,
+                        help="JSON-lines run history file")
+    parser.add_argument("--dry-run", action="store_true", help="Only scan and print each sequence's ffmpeg command")
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 0:
+        parser.error("--jobs must be 0 (auto) or a positive number of jobs")
+    if args.chunks is not None and args.chunks < 1:
+        parser.error("--chunks must be at least 1")
+
+    events = JsonEventWriter(sys.stdout)
+    with contextlib.redirect_stdout(sys.stderr):  # Engine print() output must not mix with the JSON event stream
+        return _run(args, events)
+
+def _run(args: argparse.Namespace, events: JsonEventWriter) -> int:
+    try:
+        with open(args.preset, "r") as f:
+            preset = json.load(f)
+        output_dir = args.output_dir or Path(preset.get("output_dir_str") or CLI_DEFAULT_OUTPUT_DIR)
+        settings = build_common_settings(preset, output_dir, args.prefix, args.suffix, args.output_basename)
+    except (OSError, ValueError) as e:
+        events.emit("error", message=f"Could not load preset {args.preset}: {e}")
+        return 2
+
+    start_run_log(args.run_log)
+    scan_index = None if args.no_cache else ScanIndex(CLI_DEFAULT_SCAN_INDEX_PATH)
+    probe_cache = ProbeCache(None if args.no_cache else CLI_DEFAULT_PROBE_CACHE_PATH)
+    set_probe_cache(probe_cache)
+    try:
+        scan_start = time.monotonic()
+        if args.max_frame_gap is not None:
+            settings["max_frame_gap"] = max(0, args.max_frame_gap)
+        sequences = scan_sequences(args.parent_dir, args.prefix, args.suffix, scan_index, events, args.ignore_case,
+                                   settings["max_frame_gap"])
+        if args.merge_rollovers:
+            sequences = merge_rollover_sequences(sequences, args.rollover_max_gap)
+            for chain in (s for s in sequences if isinstance(s, SequenceChain)):
+                events.emit("sequence_chain", dirs=[part.directory_path for part in chain.parts],
+                            frames=chain.frame_count)
+        events.emit("scan_finish", parent_dir=args.parent_dir, sequences=len(sequences),
+                    frames=sum(sequence.frame_count for sequence in sequences),
+                    duration_s=round(time.monotonic() - scan_start, 3))
+        chunks = args.chunks if args.chunks is not None else preset.get("chunks_per_sequence", 1)
+        if args.dry_run:  # Building commands writes nothing; lists are only written when a job starts
+            for sequence in sequences:
+                chunk_jobs, concat_cmd, output_path, _ = build_chunked_ffmpeg_commands(sequence, settings,
+                                                                                      max(1, chunks))
+                for cmd, chunk_path, frames, _ in chunk_jobs:
+                    events.emit("command", output=chunk_path, frames=frames, cmd=[str(arg) for arg in cmd])
+                if concat_cmd is not None:
+                    events.emit("command", output=output_path, frames=sum(frames for _, _, frames, _ in chunk_jobs),
+                                cmd=[str(arg) for arg in concat_cmd])
+            return 0
+        if not sequences:
+            return 0
+        output_dir.mkdir(parents=True, exist_ok=True)
+        jobs = args.jobs if args.jobs is not None else preset.get("parallel_jobs", 0)
+        job_slots = jobs or default_concurrent_jobs(settings["video_codec"], os.cpu_count())
+        return 0 if run_batch(sequences, settings, job_slots, max(1, chunks), events, args.progress_interval) else 1
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if scan_index is not None:
+            scan_index.close()
+        set_probe_cache(None)
+        probe_cache.close()
+        stop_run_log()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,224 @@
 # timelapse_engine.py
 import os
 import re
+import json
+import math
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from datetime import datetime
+from fractions import Fraction
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import subprocess # For ffprobe
 import shlex # For joining command for display if needed by engine
+from run_log import log_event
 
 # --- Engine Default Configurations ---
 # These are defaults for the core processing logic.
 # The GUI might have its own defaults for UI elements that override these or provide choices.
 ENGINE_DEFAULT_FILENAME_PREFIX = "P"
 ENGINE_DEFAULT_FILENAME_SUFFIX = ".JPG"
+ENGINE_DEFAULT_DISCOVERY_WORKERS = 8  # Concurrent subdirectory checks; mostly waiting on I/O, not CPU
+ENGINE_DEFAULT_MAX_FRAME_GAP = 0  # Missing frames bridged inside one sequence; 0 splits at every gap
+ENGINE_DEFAULT_ROLLOVER_MAX_GAP_S = 120.0  # Longest capture-time gap bridged when merging camera folder rollovers
 # Add other engine-specific defaults if any (e.g., a fallback pixel format if not specified)
+ENGINE_DEFAULT_X264_X265_PRESET = "medium"
+ENGINE_DEFAULT_PRORES_PROFILE_KEY = "HQ"
+ENGINE_DEFAULT_DNXHR_PROFILE_KEY = "dnxhr_hq"
+ENGINE_DEFAULT_VP9_DEADLINE = "good"
+ENGINE_DEFAULT_VP9_CPU_USED = 1
+
+# --- Encoding Options and Presets ---
+ENGINE_CODEC_OPTIONS = [  # Codec choices offered by the GUI; presets store an index into this list
+    {"id": "h264_mp4", "name": "H.264 / .mp4 (Compat)", "base_codec": "libx264",
+     "hw_variants": {"nvenc": "h264_nvenc", "qsv": "h264_qsv", "amf": "h264_amf"}, "ext": ".mp4",
+     "pix_fmt": "yuv420p", "quality_type": "crf", "default_crf": 23,
+     "presets": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower",
+                 "veryslow"], "default_preset_key": ENGINE_DEFAULT_X264_X265_PRESET, "hw_quality_type": "cq",
+     "hw_default_cq": 23, "hw_presets": {
+        "nvenc": ["default", "p1", "p2", "p3", "p4", "p5", "p6", "p7", "slow", "medium", "fast", "hp", "hq",
+                  "bd", "ll", "llhq", "llhp", "lossless", "losslesshp"], "qsv": None,
+        "amf": ["ultrafast", "fast", "balanced", "quality", "highquality"]}},
+    {"id": "h265_mp4", "name": "H.265 (HEVC) / .mp4", "base_codec": "libx265",
+     "hw_variants": {"nvenc": "hevc_nvenc", "qsv": "hevc_qsv", "amf": "hevc_amf"}, "ext": ".mp4",
+     "pix_fmt": "yuv420p", "quality_type": "crf", "default_crf": 28,
+     "presets": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower",
+                 "veryslow"], "default_preset_key": ENGINE_DEFAULT_X264_X265_PRESET, "hw_quality_type": "cq",
+     "hw_default_cq": 28, "hw_presets": {
+        "nvenc": ["default", "p1", "p2", "p3", "p4", "p5", "p6", "p7", "slow", "medium", "fast", "hp", "hq",
+                  "bd", "ll", "llhq", "llhp", "lossless", "losslesshp"], "qsv": None,
+        "amf": ["ultrafast", "fast", "balanced", "quality", "highquality"]}},
+    {"id": "h265_mkv", "name": "H.265 (HEVC) / .mkv", "base_codec": "libx265",
+     "hw_variants": {"nvenc": "hevc_nvenc", "qsv": "hevc_qsv", "amf": "hevc_amf"}, "ext": ".mkv",
+     "pix_fmt": "yuv420p", "quality_type": "crf", "default_crf": 28,
+     "presets": ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower",
+                 "veryslow"], "default_preset_key": ENGINE_DEFAULT_X264_X265_PRESET, "hw_quality_type": "cq",
+     "hw_default_cq": 28, "hw_presets": {
+        "nvenc": ["default", "p1", "p2", "p3", "p4", "p5", "p6", "p7", "slow", "medium", "fast", "hp", "hq",
+                  "bd", "ll", "llhq", "llhp", "lossless", "losslesshp"], "qsv": None,
+        "amf": ["ultrafast", "fast", "balanced", "quality", "highquality"]}},
+    {"id": "vp9_webm", "name": "VP9 / .webm (Web)", "base_codec": "libvpx-vp9", "hw_variants": {},
+     "ext": ".webm", "pix_fmt": "yuv420p", "quality_type": "crf_vp9", "default_crf": 31,
+     "deadlines": ["realtime", "good", "best"], "default_deadline_key": ENGINE_DEFAULT_VP9_DEADLINE,
+     "default_cpu_used": ENGINE_DEFAULT_VP9_CPU_USED},
+    {"id": "vp9_mkv", "name": "VP9 / .mkv", "base_codec": "libvpx-vp9", "hw_variants": {}, "ext": ".mkv",
+     "pix_fmt": "yuv420p", "quality_type": "crf_vp9", "default_crf": 31,
+     "deadlines": ["realtime", "good", "best"], "default_deadline_key": ENGINE_DEFAULT_VP9_DEADLINE,
+     "default_cpu_used": ENGINE_DEFAULT_VP9_CPU_USED},
+    {"id": "prores_ks_hq_mov", "name": "ProRes 422 HQ / .mov", "base_codec": "prores_ks", "hw_variants": {},
+     "ext": ".mov", "pix_fmt": "yuv422p10le", "quality_type": "prores_profile",
+     "prores_profiles_map": {"Proxy": 0, "LT": 1, "Standard": 2, "HQ": 3, "4444": 4, "4444XQ": 5},
+     "default_profile_key": ENGINE_DEFAULT_PRORES_PROFILE_KEY},
+    {"id": "prores_ks_std_mov", "name": "ProRes 422 Standard / .mov", "base_codec": "prores_ks",
+     "hw_variants": {}, "ext": ".mov", "pix_fmt": "yuv422p10le", "quality_type": "prores_profile",
+     "prores_profiles_map": {"Proxy": 0, "LT": 1, "Standard": 2, "HQ": 3, "4444": 4, "4444XQ": 5},
+     "default_profile_key": "Standard"},
+    {"id": "dnxhr_hqx_mov", "name": "DNxHR HQX (12-bit) / .mov", "base_codec": "dnxhd", "hw_variants": {},
+     "ext": ".mov", "pix_fmt": "yuv422p10le", "quality_type": "dnx_profile",
+     "dnx_profiles_list": ["dnxhr_hqx", "dnxhr_hq", "dnxhr_sq", "dnxhr_lb"],
+     "default_dnx_profile_key": "dnxhr_hqx"},
+    {"id": "dnxhr_hq_mov", "name": "DNxHR HQ (8-bit) / .mov", "base_codec": "dnxhd", "hw_variants": {},
+     "ext": ".mov", "pix_fmt": "yuv420p", "quality_type": "dnx_profile",
+     "dnx_profiles_list": ["dnxhr_hqx", "dnxhr_hq", "dnxhr_sq", "dnxhr_lb"],
+     "default_dnx_profile_key": ENGINE_DEFAULT_DNXHR_PROFILE_KEY}
+]
+ENGINE_SCALE_OPTIONS = {  # Scale choices; presets store an index into this (ordered) mapping
+    "original": {"desc": "Original (no scaling)", "filter": ""},
+    "percentage": {"desc": "Percentage of original",
+                   "filter_template": "scale=w=trunc(iw*{val}/100/2)*2:h=-2:flags=lanczos"},
+    "6K": {"desc": "6k (6016xH)", "filter": "scale=6016:-2:flags=lanczos"},
+    "4K": {"desc": "4k (3840xH)", "filter": "scale=3840:-2:flags=lanczos"},
+    "1080p": {"desc": "1080p (1920xH)", "filter": "scale=1920:-2:flags=lanczos"},
+    "720p": {"desc": "720p (1280xH)", "filter": "scale=1280:-2:flags=lanczos"},
+    "custom": {"desc": "Custom WxH", "filter_template": "scale={w}:{h}:flags=lanczos"}
+}
+
+ENGINE_HWACCEL_TYPES = ["none", "nvenc", "qsv", "amf"]  # Presets store an index into this list
+
+def _default_hw_preset(hw_presets: list[str]) -> str:
+    if "medium" in hw_presets: return "medium"
+    if "p4" in hw_presets: return "p4"
+    return hw_presets[len(hw_presets) // 2]
+
+def _default_sw_preset(codec_data: dict) -> str:
+    presets = codec_data["presets"]
+    default_preset = codec_data.get("default_preset_key", ENGINE_DEFAULT_X264_X265_PRESET)
+    if default_preset in presets: return default_preset
+    return "medium" if "medium" in presets else presets[len(presets) // 2]
+
+def build_common_settings(preset: dict, main_output_dir: Path, filename_prefix: str = ENGINE_DEFAULT_FILENAME_PREFIX,
+                          filename_suffix: str = ENGINE_DEFAULT_FILENAME_SUFFIX, output_basename: str = "") -> dict:
+    """
+    Turns a saved preset (the GUI's index-based JSON format) into the settings dict used by
+    build_ffmpeg_command_for_sequence. Options that do not apply to the chosen codec are ignored,
+    and choices that are not offered for it fall back to the codec's default, as in the GUI.
+    Raises ValueError for an unknown codec index.
+    """
+    settings = {"input_fps": preset.get("input_fps", 24.0), "output_fps": preset.get("output_fps", 24.0),
+                "main_output_dir": Path(main_output_dir),
+                "filename_prefix_ui": filename_prefix or ENGINE_DEFAULT_FILENAME_PREFIX,
+                "filename_suffix_ui": filename_suffix or ENGINE_DEFAULT_FILENAME_SUFFIX,
+                "output_basename_ui": output_basename.strip(),
+                "max_frame_gap": max(0, int(preset.get("max_frame_gap", ENGINE_DEFAULT_MAX_FRAME_GAP))),
+                "hold_frame_gaps": bool(preset.get("hold_frame_gaps", True)),
+                "video_codec_option_name": "Unknown", "video_codec": "libx264", "base_codec": "libx264",
+                "output_extension": ".mp4", "pixel_format_final": "yuv420p", "is_crf_based": False,
+                "crf_value": None, "codec_preset": None, "prores_profile_val": None, "dnx_bitrate_or_profile": None,
+                "vp9_cpu_used": None, "prores_profiles_map": None, "hwaccel_type": "none", "hw_cq_value": None,
+                "hw_preset": None, "scale_filter_string": "", "resolution_desc": "Original"}
+    codec_idx = preset.get("codec_choice_idx", 0)
+    if not 0 <= codec_idx < len(ENGINE_CODEC_OPTIONS):
+        raise ValueError(f"Unknown codec index {codec_idx} in preset.")
+    codec_data = ENGINE_CODEC_OPTIONS[codec_idx]
+    settings.update({"video_codec_option_name": codec_data["name"], "base_codec": codec_data["base_codec"],
+                     "video_codec": codec_data["base_codec"], "output_extension": codec_data["ext"],
+                     "pixel_format_final": codec_data["pix_fmt"]})
+    if "prores_profiles_map" in codec_data: settings["prores_profiles_map"] = codec_data["prores_profiles_map"]
+    hwaccel_idx = preset.get("hwaccel_choice_idx", 0)
+    hwaccel_type = ENGINE_HWACCEL_TYPES[hwaccel_idx] if 0 <= hwaccel_idx < len(ENGINE_HWACCEL_TYPES) else "none"
+    settings["hwaccel_type"] = hwaccel_type
+    quality_value = preset.get("quality_spin_value")
+    quality_text = preset.get("quality_combo_text")
+    preset_text = preset.get("preset_combo_text")
+
+    hw_variant = codec_data.get("hw_variants", {}).get(hwaccel_type) if hwaccel_type != "none" else None
+    if hw_variant:
+        settings["video_codec"] = hw_variant
+        settings["video_codec_option_name"] += f" ({hwaccel_type.upper()})"
+        if hw_variant.startswith("hevc_nvenc") and settings["pixel_format_final"] == "yuv422p10le":
+            settings["pixel_format_final"] = "p010le"
+        elif hw_variant.startswith("h264_nvenc") and settings["pixel_format_final"] not in ["yuv420p", "nv12"]:
+            settings["pixel_format_final"] = "yuv420p"
+        if codec_data.get("hw_quality_type") == "cq":
+            settings["hw_cq_value"] = min(max(int(quality_value), 0), 51) if quality_value is not None \
+                else codec_data.get("hw_default_cq", 23)
+        hw_presets = codec_data.get("hw_presets", {}).get(hwaccel_type)
+        if hw_presets:
+            settings["hw_preset"] = preset_text if preset_text in hw_presets else _default_hw_preset(hw_presets)
+    else:
+        quality_type = codec_data["quality_type"]
+        if quality_type in ("crf", "crf_vp9"):
+            settings["is_crf_based"] = True
+            max_crf = 63 if quality_type == "crf_vp9" else 51
+            settings["crf_value"] = min(max(int(quality_value), 0), max_crf) if quality_value is not None \
+                else codec_data.get("default_crf")
+            if quality_type == "crf" and "presets" in codec_data:
+                settings["codec_preset"] = preset_text if preset_text in codec_data["presets"] \
+                    else _default_sw_preset(codec_data)
+            elif quality_type == "crf_vp9":
+                if "deadlines" in codec_data:
+                    default_deadline = codec_data.get("default_deadline_key", ENGINE_DEFAULT_VP9_DEADLINE)
+                    settings["codec_preset"] = preset_text if preset_text in codec_data["deadlines"] else (
+                        default_deadline if default_deadline in codec_data["deadlines"] else codec_data["deadlines"][0])
+                settings["vp9_cpu_used"] = codec_data.get("default_cpu_used", ENGINE_DEFAULT_VP9_CPU_USED)
+        elif quality_type == "prores_profile":
+            profile_name = quality_text if quality_text in codec_data["prores_profiles_map"] \
+                else codec_data.get("default_profile_key", ENGINE_DEFAULT_PRORES_PROFILE_KEY)
+            settings["prores_profile_val"] = codec_data["prores_profiles_map"].get(profile_name)
+            if profile_name in ["4444", "4444XQ"]: settings["pixel_format_final"] = "yuv444p10le"
+        elif quality_type == "dnx_profile":
+            dnx_profile = quality_text if quality_text in codec_data["dnx_profiles_list"] \
+                else codec_data.get("default_dnx_profile_key", ENGINE_DEFAULT_DNXHR_PROFILE_KEY)
+            settings["dnx_bitrate_or_profile"] = dnx_profile
+            if dnx_profile == "dnxhr_hqx":
+                settings["pixel_format_final"] = "yuv422p10le"
+            elif dnx_profile in ["dnxhr_hq", "dnxhr_sq", "dnxhr_lb"] and codec_data.get("pix_fmt") != "yuv420p":
+                settings["pixel_format_final"] = "yuv422p"
+
+    scale_keys = list(ENGINE_SCALE_OPTIONS)
+    scale_idx = preset.get("scale_type_combo_idx", 0)
+    if not 0 <= scale_idx < len(scale_keys):
+        print(f"Engine Warning: Unknown scale index {scale_idx} in preset. No scaling.")
+        settings["resolution_desc"] = "Original (No Scale Sel)"
+        return settings
+    scale_key = scale_keys[scale_idx]
+    scale_data = ENGINE_SCALE_OPTIONS[scale_key]
+    settings["resolution_desc"] = scale_data["desc"]
+    if scale_key == "percentage":
+        percentage = min(max(int(preset.get("scale_percentage_value", 50)), 1), 200)
+        settings["scale_filter_string"] = scale_data["filter_template"].replace("{val}", str(percentage))
+        settings["resolution_desc"] = f"{percentage}% of original (approx, even dimensions)"
+    elif scale_key == "custom":
+        w, h = preset.get("scale_custom_width_text", "1920"), preset.get("scale_custom_height_text", "1080")
+        try:
+            if not (w.isdigit() and int(w) > 0 and int(w) % 2 == 0): raise ValueError("Width must be positive and even.")
+            if not (h == "-2" or (h.isdigit() and int(h) > 0 and int(h) % 2 == 0)):
+                raise ValueError("Height must be -2 or a positive even integer.")
+            settings["scale_filter_string"] = scale_data["filter_template"].replace("{w}", w).replace("{h}", h)
+            settings["resolution_desc"] = f"Custom {w}x{h if h != '-2' else '(auto_H)'}"
+        except ValueError as e_scale:
+            print(f"Engine Warning: Invalid custom scale: {e_scale}. No scaling.")
+            settings["scale_filter_string"] = ""
+            settings["resolution_desc"] = "Original (Custom Err)"
+    else:
+        settings["scale_filter_string"] = scale_data.get("filter", "")
+    return settings
+
 
 # --- Helper Functions ---
 def get_numeric_part(filename_str: str, prefix: str, suffix: str) -> str | None:
@@ -24,297 +232,1474 @@ def get_numeric_part(filename_str: str, prefix: str, suffix: str) -> str | None:
             return potential_num_part
     return None
 
-def get_image_dimensions(image_path: Path) -> tuple[int, int] | None:
-    """Gets width and height of an image using ffprobe."""
+class FilenamePattern:
+    """
+    Compiled frame filename matcher.
+    prefix_text and suffix_text hold "|"-separated alternatives (e.g. "IMG_|DSC" and ".JPG|.jpeg"), and any
+    part may use the * and ? globs. A prefix alternative containing {frame} is a whole filename template
+    (e.g. "GOPR{frame}.JPG") and is not combined with the suffixes. Everything compiles into one regex,
+    which is run over a newline-joined block of names per call instead of once per file.
+    """
+    NAME_BLOCK_SIZE = 4096  # Names per finditer call; bounds the joined string on huge directories
+
+    def __init__(self, prefix_text: str, suffix_text: str, ignore_case: bool = False):
+        self.prefix_text, self.suffix_text, self.ignore_case = prefix_text, suffix_text, ignore_case
+        prefixes, templates = [], []
+        for part in (p.strip() for p in prefix_text.split("|")):
+            if "{frame}" in part:
+                templates.append(tuple(part.split("{frame}", 1)))
+            else:
+                prefixes.append(part)
+        suffixes = [s.strip() for s in suffix_text.split("|")]
+        # Every branch has exactly three groups (prefix, digits, suffix), so m.lastindex locates the match
+        branches = []
+        if prefixes:
+            branches.append(f"({'|'.join(map(self._glob_to_regex, prefixes))})([0-9]+)"
+                            f"({'|'.join(map(self._glob_to_regex, suffixes))})")
+        for before, after in templates:
+            branches.append(f"({self._glob_to_regex(before)})([0-9]+)({self._glob_to_regex(after)})")
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        self._regex = re.compile(f"^(?:{'|'.join(branches)})$", flags)
+
+    @staticmethod
+    def _glob_to_regex(glob_text: str) -> str:
+        # Lazy * so the frame number takes as many trailing digits as possible
+        return "".join("[^\n]*?" if c == "*" else "[^\n]" if c == "?" else re.escape(c) for c in glob_text)
+
+    def match(self, filename: str) -> tuple[str, str, str] | None:
+        """Returns (prefix, numeric string, suffix) as written in filename, or None if it does not match."""
+        m = self._regex.fullmatch(filename) if "\n" not in filename else None
+        if m is None:
+            return None
+        return m.group(m.lastindex - 2, m.lastindex - 1, m.lastindex)
+
+    def iter_matches(self, filenames):
+        """Yields (prefix, numeric string, suffix) for every matching name, one regex call per block of names."""
+        block = []
+        for filename in filenames:
+            if "\n" not in filename:
+                block.append(filename)
+            if len(block) >= self.NAME_BLOCK_SIZE:
+                yield from self._match_block(block)
+                block.clear()
+        if block:
+            yield from self._match_block(block)
+
+    def _match_block(self, block: list[str]):
+        for m in self._regex.finditer("\n".join(block)):
+            yield m.group(m.lastindex - 2, m.lastindex - 1, m.lastindex)
+
+@lru_cache(maxsize=32)
+def compile_filename_pattern(prefix_text: str, suffix_text: str, ignore_case: bool = False) -> FilenamePattern:
+    return FilenamePattern(prefix_text, suffix_text, ignore_case)
+
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_TIFF_SUFFIXES = {".tif", ".tiff"}  # RAW formats are TIFF-based too, but IFD0 is often a thumbnail there
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 7: 1}  # BYTE, ASCII, SHORT, LONG, UNDEFINED
+_JPEG_SAMPLING_PIX_FMTS = {(2, 2): "yuvj420p", (2, 1): "yuvj422p", (1, 1): "yuvj444p", (4, 1): "yuvj411p",
+                           (1, 2): "yuvj440p"}
+_PNG_PIX_FMTS = {(0, 8): "gray", (0, 16): "gray16be", (2, 8): "rgb24", (2, 16): "rgb48be", (3, 8): "pal8",
+                 (4, 8): "ya8", (4, 16): "ya16be", (6, 8): "rgba", (6, 16): "rgba64be"}
+
+def _read_tiff_info(read_at) -> dict | None:
+    """
+    Reads size, bit depth and capture time from a TIFF structure (a .tif file or a JPEG's Exif block).
+    read_at(offset, size) returns bytes relative to the TIFF header.
+    """
+    header = read_at(0, 8)
+    if header[:4] not in (b"II*\x00", b"MM\x00*"):
+        return None
+    byte_order = "little" if header[:2] == b"II" else "big"
+
+    def read_ifd(offset: int) -> dict:
+        entry_count = int.from_bytes(read_at(offset, 2), byte_order)
+        ifd = read_at(offset + 2, entry_count * 12)
+        return {int.from_bytes(ifd[i:i + 2], byte_order): ifd[i + 2:i + 12] for i in range(0, len(ifd) - 11, 12)}
+
+    def tag_value(ifd: dict, tag: int):
+        entry = ifd.get(tag)
+        if entry is None:
+            return None
+        field_type = int.from_bytes(entry[0:2], byte_order)
+        count = int.from_bytes(entry[2:6], byte_order)
+        size = _TIFF_TYPE_SIZES.get(field_type)
+        if size is None or count == 0:
+            return None
+        data_len = size * count
+        # Values that fit are stored left-justified in the 4-byte field, otherwise it holds an offset
+        data = entry[6:6 + data_len] if data_len <= 4 else read_at(int.from_bytes(entry[6:10], byte_order), data_len)
+        if field_type == 2:
+            return data.split(b"\x00", 1)[0].decode("ascii", "replace").strip() or None
+        return int.from_bytes(data[:size], byte_order)  # First value is enough for the tags we read
+
+    ifd0 = read_ifd(int.from_bytes(header[4:8], byte_order))
+    capture_time = None
+    exif_ifd_offset = tag_value(ifd0, 0x8769)
+    if exif_ifd_offset:
+        capture_time = tag_value(read_ifd(exif_ifd_offset), 0x9003)  # DateTimeOriginal
+    return {"width": tag_value(ifd0, 256), "height": tag_value(ifd0, 257), "bit_depth": tag_value(ifd0, 258),
+            "pix_fmt": None, "capture_time": capture_time or tag_value(ifd0, 0x0132),  # Fallback: DateTime
+            "reduced_resolution": bool((tag_value(ifd0, 254) or 0) & 1)}
+
+def _read_jpeg_info(f) -> dict | None:
+    """Walks JPEG marker segments (seeking over their payloads) until the SOFn frame header."""
+    capture_time = None
+    while True:
+        byte = f.read(1)
+        while byte == b'\xff':  # Fill bytes / marker prefix
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # Standalone markers, no length field
+            continue
+        if marker in (0xD9, 0xDA):  # EOI or start of scan before any frame header
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        segment_length = int.from_bytes(length_bytes, "big")
+        if segment_length < 2:  # The length counts its own two bytes; anything less is a corrupt marker
+            return None
+        if marker == 0xE1 and capture_time is None:
+            app1 = f.read(segment_length - 2)
+            if app1[:6] == b"Exif\x00\x00":
+                tiff_block = app1[6:]
+                exif_info = _read_tiff_info(lambda offset, size: tiff_block[offset:offset + size])
+                capture_time = exif_info.get("capture_time") if exif_info else None
+        elif marker in _JPEG_SOF_MARKERS:
+            frame_header = f.read(segment_length - 2)  # precision, height, width, components, sampling...
+            if len(frame_header) < 6:
+                return None
+            height = int.from_bytes(frame_header[1:3], "big")
+            width = int.from_bytes(frame_header[3:5], "big")
+            if not (width and height):  # Height 0 means it is defined later (DNL)
+                return None
+            if frame_header[5] == 1:
+                pix_fmt = "gray"
+            else:
+                luma_sampling = frame_header[7] if len(frame_header) > 7 else 0x11
+                pix_fmt = _JPEG_SAMPLING_PIX_FMTS.get((luma_sampling >> 4, luma_sampling & 0x0F))
+            return {"width": width, "height": height, "bit_depth": frame_header[0], "pix_fmt": pix_fmt,
+                    "capture_time": capture_time}
+        else:
+            f.seek(segment_length - 2, os.SEEK_CUR)
+        byte = f.read(1)
+        if byte != b'\xff':
+            return None
+        f.seek(-1, os.SEEK_CUR)
+
+def read_image_header_info(image_path: Path) -> dict | None:
+    """
+    Reads width, height, bit depth, pixel format and EXIF capture time straight from the file header
+    (JPEG SOFn/APP1, PNG IHDR, TIFF IFD0), touching only the first few KB.
+    Returns None for formats it does not know; pix_fmt and capture_time may be None.
+    """
+    image_path = Path(image_path)
     try:
-        ffprobe_cmd = [
-            'ffprobe',
-            '-v', 'error',
-            '-select_streams', 'v:0',
-            '-show_entries', 'stream=width,height',
-            '-of', 'csv=s=x:p=0',
-            str(image_path)
-        ]
-        result = subprocess.run(ffprobe_cmd, capture_output=True, text=True, check=True)
-        width_str, height_str = result.stdout.strip().split('x')
-        return int(width_str), int(height_str)
+        with open(image_path, "rb") as f:
+            header = f.read(26)
+            if header[:2] == b"\xff\xd8":
+                f.seek(2)
+                return _read_jpeg_info(f)
+            if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+                bit_depth, color_type = header[24], header[25]
+                return {"width": int.from_bytes(header[16:20], "big"), "height": int.from_bytes(header[20:24], "big"),
+                        "bit_depth": bit_depth, "pix_fmt": _PNG_PIX_FMTS.get((color_type, bit_depth)),
+                        "capture_time": None}
+            if header[:4] in (b"II*\x00", b"MM\x00*") and image_path.suffix.lower() in _TIFF_SUFFIXES:
+                def read_at(offset, size):
+                    f.seek(offset)
+                    return f.read(size)
+                info = _read_tiff_info(read_at)
+                if info and info.pop("reduced_resolution") is False and info["width"] and info["height"]:
+                    return info
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def _ffprobe_image_info(image_path: Path) -> dict:
+    """Probes an image with an ffprobe subprocess. Raises on failure."""
+    ffprobe_cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height,pix_fmt,bits_per_raw_sample',
+        '-of', 'json',
+        str(image_path)
+    ]
+    result = subprocess.run(ffprobe_cmd, capture_output=True, text=True, check=True)
+    stream = json.loads(result.stdout)["streams"][0]
+    bits = stream.get("bits_per_raw_sample")
+    return {"width": int(stream["width"]), "height": int(stream["height"]), "pix_fmt": stream.get("pix_fmt"),
+            "bit_depth": int(bits) if bits and str(bits).isdigit() else None, "capture_time": None}
+
+class ProbeCache:
+    """
+    Two-level cache of image probe results keyed by (path, size, mtime_ns): an in-memory LRU in front of
+    a size-bounded SQLite table, so repeat renders of the same sequences never probe again.
+    Pass db_path=None for an in-memory only cache.
+    """
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: Path | None, max_entries: int = 200_000, memory_entries: int = 4096):
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # (path, size, mtime_ns) -> info dict, most recently used last
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(str(db_path) if db_path else ":memory:", check_same_thread=False)
+            self._init_schema()
+        except sqlite3.Error as e:
+            print(f"Engine Warning: Could not open probe cache '{db_path}': {e}. Using in-memory cache.")
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self._init_schema()
+        self._row_count = self._conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+
+    def _init_schema(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS probes")
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS probes ("
+            " path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " info_json TEXT NOT NULL, last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (path, size, mtime_ns))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)")
+        self._conn.commit()
+
+    def _remember(self, key: tuple, info: dict):
+        self._memory[key] = info
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def probe(self, image_path: Path) -> dict | None:
+        """Returns the cached probe info for an image, probing it (header reader, then ffprobe) on a miss."""
+        try:
+            file_stat = os.stat(image_path)
+        except OSError as e:
+            print(f"Engine Warning: Could not stat {image_path}: {e}")
+            return None
+        key = (os.path.abspath(image_path), file_stat.st_size, file_stat.st_mtime_ns)
+        with self._lock:
+            info = self._memory.get(key)
+            if info is not None:
+                self._memory.move_to_end(key)
+                return info
+            row = self._conn.execute("SELECT info_json FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                                     key).fetchone()
+            if row is not None:
+                info = json.loads(row[0])
+                self._conn.execute("UPDATE probes SET last_used = ? WHERE path = ? AND size = ? AND mtime_ns = ?",
+                                   (time.time_ns(), *key))
+                self._conn.commit()
+                self._remember(key, info)
+                return info
+
+        info = _probe_image_uncached(image_path)  # Outside the lock; may start ffprobe
+        if info is None:
+            return None
+        with self._lock:
+            self._remember(key, info)
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?)",
+                                   (*key, json.dumps(info), time.time_ns()))
+                self._row_count += 1
+                if self._row_count > self.max_entries:  # Evict the least recently used tenth in one statement
+                    evict_count = self._row_count - self.max_entries + self.max_entries // 10
+                    self._conn.execute("DELETE FROM probes WHERE rowid IN "
+                                       "(SELECT rowid FROM probes ORDER BY last_used LIMIT ?)", (evict_count,))
+                    self._row_count = self._conn.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Engine Warning: Could not update probe cache for {image_path}: {e}")
+        return info
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_probe_cache: ProbeCache | None = None  # Shared cache used by probe_image, set with set_probe_cache()
+
+def set_probe_cache(probe_cache: ProbeCache | None):
+    global _probe_cache
+    _probe_cache = probe_cache
+
+def _probe_image_uncached(image_path: Path) -> dict | None:
+    probe_start = time.monotonic()
+    info = read_image_header_info(image_path)
+    if info:
+        log_event("probe", path=image_path, source="header", ok=True,
+                  duration_s=round(time.monotonic() - probe_start, 4))
+        return info
+    try:
+        info = _ffprobe_image_info(image_path)
+        log_event("probe", path=image_path, source="ffprobe", ok=True,
+                  duration_s=round(time.monotonic() - probe_start, 4))
+        return info
     except Exception as e:
-        print(f"Engine Warning: Could not get dimensions for {image_path}: {e}")
+        print(f"Engine Warning: Could not probe {image_path}: {e}")
+        log_event("probe", path=image_path, source="ffprobe", ok=False, error=str(e),
+                  duration_s=round(time.monotonic() - probe_start, 4))
         return None
 
+def probe_image(image_path: Path) -> dict | None:
+    """
+    Returns {"width", "height", "pix_fmt", "bit_depth", "capture_time"} for an image, or None.
+    Uses the shared ProbeCache when one is set.
+    """
+    if _probe_cache is not None:
+        return _probe_cache.probe(image_path)
+    return _probe_image_uncached(image_path)
+
+def get_image_dimensions(image_path: Path) -> tuple[int, int] | None:
+    """Gets width and height of an image from its header, falling back to ffprobe for other formats."""
+    info = probe_image(image_path)
+    if info is None:
+        print(f"Engine Warning: Could not get dimensions for {image_path}")
+        return None
+    return info["width"], info["height"]
+
+def default_concurrent_jobs(video_codec: str, cpu_count: int | None = None) -> int:
+    """
+    Picks how many ffmpeg encodes to run side by side. Each image2 job decodes its frames on one thread,
+    so cores left idle by the encoder are filled with more jobs; hardware encoders are limited by sessions.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if video_codec.endswith(("_nvenc", "_qsv", "_amf")):
+        return 2  # Consumer GPUs cap concurrent encode sessions, and one session rarely saturates the encoder
+    if video_codec in ("libx264", "libx265"):
+        cores_per_job = 8  # Frame/WPP threading stops scaling well beyond roughly this at 1080p-4K
+    else:  # prores_ks, dnxhd, libvpx-vp9: slice/tile threading keeps only a few cores busy per job
+        cores_per_job = 4
+    return max(1, min(8, cpu_count // cores_per_job))
+
+class StderrRingBuffer:
+    """
+    Bounded capture of an ffmpeg process's stderr: the last tail_lines lines plus up to issue_lines
+    error/warning lines from anywhere in the run. Memory stays constant however long the job runs.
+    """
+    ISSUE_PATTERN = re.compile(r"error|warning|invalid|failed|unable|could not|no such", re.IGNORECASE)
+
+    def __init__(self, tail_lines: int = 200, issue_lines: int = 100, max_line_length: int = 1000):
+        self.tail = deque(maxlen=tail_lines)
+        self.issues = deque(maxlen=issue_lines)  # (line number, text)
+        self.max_line_length = max_line_length
+        self.total_lines = 0
+
+    def append(self, line: str) -> bool:
+        """Stores one line; returns True if it looks like an error or warning."""
+        line = line.rstrip()[:self.max_line_length]
+        if not line:
+            return False
+        self.total_lines += 1
+        self.tail.append((self.total_lines, line))
+        is_issue = bool(self.ISSUE_PATTERN.search(line))
+        if is_issue:
+            self.issues.append((self.total_lines, line))
+        return is_issue
+
+    def format_diagnostics(self) -> str:
+        """Error/warning lines that scrolled out of the tail, followed by the tail itself."""
+        first_tail_line_number = self.tail[0][0] if self.tail else self.total_lines + 1
+        earlier_issues = [text for line_number, text in self.issues if line_number < first_tail_line_number]
+        parts = []
+        if earlier_issues:
+            parts.append("Earlier errors/warnings:\n" + "\n".join(earlier_issues))
+        if self.tail:
+            if first_tail_line_number > 1:
+                parts.append(f"Last {len(self.tail)} of {self.total_lines} lines:")
+            parts.append("\n".join(text for _, text in self.tail))
+        return "\n".join(parts)
+
+class ThroughputTracker:
+    """
+    Smoothed encode throughput of one job or a whole batch, fed from ffmpeg's -progress fields.
+    Frame rate is an exponential moving average over samples at least min_interval seconds apart,
+    so the ETA does not jump with every progress block.
+    """
+    def __init__(self, total_frames: int, smoothing: float = 0.2, min_interval: float = 1.0):
+        self.total_frames = total_frames
+        self.smoothing = smoothing
+        self.min_interval = min_interval
+        self.frames_done = 0
+        self.bytes_written = 0
+        self.frames_per_second = None
+        self.speed = None        # Encode speed multiplier reported by ffmpeg (output seconds per wall second)
+        self.bitrate_bps = None  # Average output bitrate so far
+        self._sample_time = None
+        self._sample_frames = 0
+
+    def update(self, frames_done: int, bytes_written: int | None = None, out_time_us: int | None = None,
+               speed: float | None = None, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        self.frames_done = frames_done
+        if bytes_written is not None:
+            self.bytes_written = bytes_written
+            if out_time_us:
+                self.bitrate_bps = bytes_written * 8 / (out_time_us / 1_000_000)
+        if speed is not None:
+            self.speed = speed
+        if self._sample_time is None:
+            self._sample_time, self._sample_frames = now, frames_done
+            return
+        elapsed = now - self._sample_time
+        if elapsed < self.min_interval:
+            return
+        instant_fps = max(0, frames_done - self._sample_frames) / elapsed
+        if self.frames_per_second is None:
+            self.frames_per_second = instant_fps
+        else:
+            self.frames_per_second += self.smoothing * (instant_fps - self.frames_per_second)
+        self._sample_time, self._sample_frames = now, frames_done
+
+    @property
+    def eta_seconds(self) -> float | None:
+        if not self.frames_per_second:
+            return None
+        return max(0, self.total_frames - self.frames_done) / self.frames_per_second
+
+def add_progress_args(ffmpeg_cmd: list) -> list[str]:
+    """Copy of an ffmpeg command that writes -progress key=value blocks to stdout and no stats lines to stderr."""
+    cmd = [str(arg) for arg in ffmpeg_cmd]
+    i_index = cmd.index("-i") if "-i" in cmd else 1
+    return cmd[:i_index] + ["-progress", "pipe:1", "-nostats"] + cmd[i_index:]
+
+class FFmpegProgressParser:
+    """
+    Incremental parser for ffmpeg's -progress output: key=value lines in blocks ending with "progress=continue"
+    (or "progress=end" for the last one). feed() returns True when a block is complete; frame and stats then
+    hold its values.
+    """
+    __slots__ = ("frame", "stats", "ended")
+
+    def __init__(self):
+        self.frame = 0
+        self.stats = {}  # "fps", "speed", "out_time_us", "total_size"; None while ffmpeg reports N/A
+        self.ended = False
+
+    def feed(self, line: str) -> bool:
+        key, _, value = line.strip().partition("=")
+        key, value = key.strip(), value.strip()
+        if key == "frame":
+            self.frame = int(value) if value.isdigit() else self.frame
+        elif key in ("fps", "speed"):
+            try:
+                self.stats[key] = float(value.rstrip("x"))
+            except ValueError:  # "N/A" before the first frames are out
+                self.stats[key] = None
+        elif key in ("out_time_us", "total_size"):
+            self.stats[key] = int(value) if value.isdigit() else None
+        elif key == "progress":
+            self.ended = value == "end"
+            return True
+        return False
+
+def format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "--"
+    seconds = int(round(seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+def format_byte_count(byte_count: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if byte_count < 1024:
+            return f"{byte_count:.0f} {unit}" if unit == "B" else f"{byte_count:.1f} {unit}"
+        byte_count /= 1024
+    return f"{byte_count:.1f} TB"
+
+# --- Sequence Model ---
+class Sequence:
+    """
+    Numbered frames in one directory, as found by a scan.
+    Frames are kept as flat (start, count) run pairs in an array('I') instead of per-frame names or Paths,
+    and __slots__ drops the per-instance dict, so a scan of millions of frames stays a few MB.
+    A sequence has one run unless bridge_frame_gaps() joined runs separated by a few missing frames.
+    """
+    __slots__ = ("directory_path", "filename_prefix", "filename_suffix", "padding", "frame_runs", "frame_count")
+
+    def __init__(self, directory_path: Path, filename_prefix: str, filename_suffix: str,
+                 start_number_str: str, frame_count: int):
+        self.directory_path = directory_path if isinstance(directory_path, Path) else Path(directory_path)
+        self.filename_prefix = filename_prefix
+        self.filename_suffix = filename_suffix
+        self.padding = len(start_number_str)  # Width as written in the first filename, e.g. 4 for "0001"
+        self.frame_runs = array("I", (int(start_number_str), frame_count))
+        self.frame_count = frame_count
+
+    def append_run(self, start_number: int, frame_count: int):
+        """Adds frames after a gap; start_number must be past the current last frame."""
+        self.frame_runs.extend((start_number, frame_count))
+        self.frame_count += frame_count
+
+    @property
+    def needs_frame_list(self) -> bool:
+        """True when image2's %0Nd walk cannot read the frames (it stops at the first gap)."""
+        return len(self.frame_runs) > 2
+
+    @property
+    def start_number(self) -> int:
+        return self.frame_runs[0]
+
+    @property
+    def start_number_str(self) -> str:
+        return f"{self.frame_runs[0]:0{self.padding}d}"
+
+    @property
+    def last_number(self) -> int:
+        return self.frame_runs[-2] + self.frame_runs[-1] - 1
+
+    @property
+    def image_pattern(self) -> str:
+        """ffmpeg image2 pattern basename, e.g. "P%04d.JPG"."""
+        return f"{self.filename_prefix}%0{self.padding}d{self.filename_suffix}"
+
+    def slot_count(self, hold_gaps: bool = True) -> int:
+        """Frame periods the encode reads: one per frame, plus one per missing frame when gaps are held."""
+        return self.last_number - self.start_number + 1 if hold_gaps else self.frame_count
+
+    def frame_path(self, frame_number: int) -> Path:
+        return self.directory_path / f"{self.filename_prefix}{frame_number:0{self.padding}d}{self.filename_suffix}"
+
+    @property
+    def first_frame_path(self) -> Path:
+        return self.frame_path(self.start_number)
+
+    @property
+    def last_frame_path(self) -> Path:
+        return self.frame_path(self.last_number)
+
+    def iter_frames(self):
+        """Yields (frame path, number of missing frames that follow it) for every frame, in order."""
+        frame_runs = self.frame_runs
+        for run_index in range(0, len(frame_runs), 2):
+            run_start, run_count = frame_runs[run_index], frame_runs[run_index + 1]
+            for frame_number in range(run_start, run_start + run_count - 1):
+                yield self.frame_path(frame_number), 0
+            following_gap = frame_runs[run_index + 2] - (run_start + run_count) if run_index + 2 < len(frame_runs) else 0
+            yield self.frame_path(run_start + run_count - 1), following_gap
+
+    def __repr__(self):
+        gaps_text = f", gaps={len(self.frame_runs) // 2 - 1}" if self.needs_frame_list else ""
+        return (f"Sequence({str(self.directory_path)!r}, {self.image_pattern!r}, "
+                f"start={self.start_number_str}, frames={self.frame_count}{gaps_text})")
+
+class SequenceChain:
+    """
+    Sequences that continue one another across camera folder rollovers (100CANON/IMG_9999.JPG ->
+    101CANON/IMG_0001.JPG), encoded as one input. Naming and display follow the first part.
+    """
+    __slots__ = ("parts",)
+    needs_frame_list = True  # Spans directories, so it is fed to ffmpeg as an ffconcat frame list
+
+    def __init__(self, parts: list[Sequence]):
+        self.parts = parts
+
+    directory_path = property(lambda self: self.parts[0].directory_path)
+    filename_prefix = property(lambda self: self.parts[0].filename_prefix)
+    filename_suffix = property(lambda self: self.parts[0].filename_suffix)
+    padding = property(lambda self: self.parts[0].padding)
+    start_number = property(lambda self: self.parts[0].start_number)
+    start_number_str = property(lambda self: self.parts[0].start_number_str)
+    image_pattern = property(lambda self: self.parts[0].image_pattern)
+    first_frame_path = property(lambda self: self.parts[0].first_frame_path)
+    last_frame_path = property(lambda self: self.parts[-1].last_frame_path)
+
+    @property
+    def frame_count(self) -> int:
+        return sum(part.frame_count for part in self.parts)
+
+    def slot_count(self, hold_gaps: bool = True) -> int:
+        return sum(part.slot_count(hold_gaps) for part in self.parts)
+
+    def iter_frames(self):
+        for part in self.parts:
+            yield from part.iter_frames()
+
+    def __repr__(self):
+        return f"SequenceChain({self.parts!r})"
+
+
+# --- Persistent Scan Index ---
+class ScanIndex:
+    """
+    On-disk SQLite index of the sequences detected in each directory.
+    An entry is reused while the directory's mtime, inode and entry count are unchanged (adding, removing
+    or renaming a file updates the directory mtime), so a warm rescan needs one stat and one name-only
+    listing per directory. Directories modified within MTIME_SETTLE_S of the scan are not stored, since
+    FAT/exFAT cards keep 2 s mtimes and a file added in the same tick would leave the mtime unchanged.
+    Falls back to an in-memory database if the index file cannot be opened.
+    """
+    SCHEMA_VERSION = 2  # 2: keyed by filename pattern; runs carry their concrete prefix and suffix
+    MTIME_SETTLE_S = 2.0
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()  # One connection shared by the GUI and scan threads
+        try:
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._init_schema()
+        except sqlite3.Error as e:
+            print(f"Engine Warning: Could not open scan index '{self.db_path}': {e}. Using in-memory index.")
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self._init_schema()
+
+    def _init_schema(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS dir_sequences")
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dir_sequences ("
+            " dir_path TEXT NOT NULL, filename_prefix TEXT NOT NULL, filename_suffix TEXT NOT NULL,"
+            " ignore_case INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, inode INTEGER NOT NULL, entry_count INTEGER NOT NULL,"
+            " runs_json TEXT NOT NULL,"
+            " PRIMARY KEY (dir_path, filename_prefix, filename_suffix, ignore_case))")
+        self._conn.commit()
+
+    @staticmethod
+    def _dir_key(directory_path: Path) -> str:
+        return os.path.abspath(directory_path)  # No I/O, unlike Path.resolve()
+
+    def lookup(self, directory_path: Path, filename_prefix: str, filename_suffix: str,
+               ignore_case: bool = False) -> list[tuple[str, str, str, int]] | None:
+        """Returns the stored (prefix, suffix, start_number_str, frame_count) runs if still valid, else None."""
+        try:
+            dir_stat = os.stat(directory_path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, inode, entry_count, runs_json FROM dir_sequences"
+                " WHERE dir_path = ? AND filename_prefix = ? AND filename_suffix = ? AND ignore_case = ?",
+                (self._dir_key(directory_path), filename_prefix, filename_suffix, int(ignore_case))).fetchone()
+        if row is None or row[0] != dir_stat.st_mtime_ns or row[1] != dir_stat.st_ino:
+            return None
+        try:
+            if _count_dir_entries(directory_path) != row[2]:  # Catches changes a coarse mtime does not show
+                return None
+        except OSError:
+            return None
+        return [tuple(run) for run in json.loads(row[3])]
+
+    def get_runs(self, directory_path: Path, filename_prefix: str, filename_suffix: str,
+                 ignore_case: bool = False) -> list[tuple[str, str, str, int]]:
+        """Returns the contiguous runs for a directory, from the index when valid, otherwise by listing it."""
+        cached_runs = self.lookup(directory_path, filename_prefix, filename_suffix, ignore_case)
+        if cached_runs is not None:
+            return cached_runs
+        dir_stat = os.stat(directory_path)  # Taken before listing so a concurrent change invalidates the entry
+        frame_groups, entry_count = _list_numbered_frames(
+            directory_path, compile_filename_pattern(filename_prefix, filename_suffix, ignore_case))
+        runs = _runs_from_frame_groups(frame_groups)
+        if time.time() - dir_stat.st_mtime < self.MTIME_SETTLE_S:
+            return runs  # Still being written to; a later change could keep the same mtime
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dir_sequences VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self._dir_key(directory_path), filename_prefix, filename_suffix, int(ignore_case),
+                     dir_stat.st_mtime_ns, dir_stat.st_ino, entry_count, json.dumps(runs)))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Engine Warning: Could not update scan index for {directory_path}: {e}")
+        return runs
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
 # --- Core Logic Functions ---
-def find_potential_sequence_dirs(parent_dir_path: Path, filename_prefix: str, filename_suffix: str) -> list[Path]:
+def _dir_has_matching_file(subdir_path: Path, filename_prefix: str, filename_suffix: str,
+                           scan_index: ScanIndex | None = None, ignore_case: bool = False) -> bool:
+    """Returns True as soon as one matching file is found; uses the scan index for unchanged directories."""
+    if scan_index is not None:
+        cached_runs = scan_index.lookup(subdir_path, filename_prefix, filename_suffix, ignore_case)
+        if cached_runs is not None:  # Unchanged since the last scan, no need to list it
+            return bool(cached_runs)
+    pattern = compile_filename_pattern(filename_prefix, filename_suffix, ignore_case)
+    try:
+        with os.scandir(subdir_path) as entries:
+            for entry in entries:
+                if entry.is_file() and pattern.match(entry.name) is not None:
+                    return True  # Found one, no need to check further in this subdir for *this* purpose
+    except OSError as e:
+        print(f"Engine Warning: Could not list '{subdir_path}': {e}")
+    return False
+
+def list_subdirectories(parent_dir_path: Path) -> list[Path]:
+    """The subdirectories of parent_dir_path, sorted by name; one listing, nothing inside them is read."""
     parent_dir_path = Path(parent_dir_path)
-    found_dirs = []
     if not parent_dir_path.is_dir():
         print(f"Engine Error: Parent directory '{parent_dir_path}' not found.")
-        return found_dirs
-
-    print(f"Engine: Scanning '{parent_dir_path}' for subdirectories...") # More specific
-    item_count = 0
-    for item in parent_dir_path.iterdir():
-        item_count += 1
-        print(f"  Engine: Checking item: {item}, IsDir: {item.is_dir()}") # ADD THIS
-        if item.is_dir():
-            files_in_subdir_count = 0
-            has_matching_file = False
-            for f in item.iterdir():
-                if f.is_file():
-                    files_in_subdir_count +=1
-                    # print(f"    Engine: Checking file in subdir: {f.name}") # Can be very verbose
-                    numeric_part = get_numeric_part(f.name, filename_prefix, filename_suffix)
-                    if numeric_part is not None:
-                        print(f"    Engine: Found matching file in {item.name}: {f.name}") # ADD THIS
-                        has_matching_file = True
-                        break # Found one, no need to check further in this subdir for *this* purpose
-            # print(f"  Engine: Subdir {item.name} has {files_in_subdir_count} files. Matching file found: {has_matching_file}") # ADD THIS
-            if has_matching_file:
-                print(f"  Engine: Adding potential sequence directory: {item}") # ADD THIS
-                found_dirs.append(item)
-    if item_count == 0:
-        print(f"Engine: No items (files or subdirs) found in '{parent_dir_path}'.")
+        return []
+    print(f"Engine: Scanning '{parent_dir_path}' for subdirectories...")
+    with os.scandir(parent_dir_path) as entries:
+        subdir_paths = [Path(entry.path) for entry in entries if entry.is_dir()]
+    if not subdir_paths:
+        print(f"Engine: No subdirectories found in '{parent_dir_path}'.")
+    return sorted(subdir_paths, key=lambda p: p.name)  # Stable order regardless of listing order
+
+def find_potential_sequence_dirs(parent_dir_path: Path, filename_prefix: str, filename_suffix: str,
+                                 scan_index: ScanIndex | None = None,
+                                 max_workers: int = ENGINE_DEFAULT_DISCOVERY_WORKERS,
+                                 ignore_case: bool = False) -> list[Path]:
+    """
+    Returns the subdirectories of parent_dir_path that contain at least one matching file, sorted by name.
+    Subdirectories are checked concurrently on a pool of max_workers threads (1 = sequential), which
+    hides per-directory latency on network storage.
+    """
+    discovery_start = time.monotonic()
+    subdir_paths = list_subdirectories(parent_dir_path)
+
+    def check_subdir(subdir_path: Path) -> bool:
+        return _dir_has_matching_file(subdir_path, filename_prefix, filename_suffix, scan_index, ignore_case)
+
+    if max_workers > 1 and len(subdir_paths) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(subdir_paths))) as executor:
+            has_match_flags = list(executor.map(check_subdir, subdir_paths))
+    else:
+        has_match_flags = [check_subdir(p) for p in subdir_paths]
+
+    found_dirs = [p for p, has_match in zip(subdir_paths, has_match_flags) if has_match]
+    print(f"Engine: Checked {len(subdir_paths)} subdirectories, "
+          f"{len(found_dirs)} contain matching files.")
+    log_event("scan_discovery", parent_dir=parent_dir_path, prefix=filename_prefix, suffix=filename_suffix,
+              subdirs_checked=len(subdir_paths), dirs_found=len(found_dirs),
+              duration_s=round(time.monotonic() - discovery_start, 4))
     return found_dirs
 
+_FRAME_WIDTH_BITS = 6  # Frame keys pack (value << 6) | digit count into one unsigned 64-bit integer
+_MAX_FRAME_NUMBER = 0xFFFFFFFF  # Larger numbers do not fit array('I'), nor ffmpeg's -start_number
+
+def _count_dir_entries(directory_path: Path) -> int:
+    """Counts a directory's entries by name only, without a stat per entry."""
+    with os.scandir(directory_path) as entries:
+        return sum(1 for _ in entries)
+
+def _list_numbered_frames(directory_path: Path, pattern: FilenamePattern) -> tuple[dict[tuple[str, str], array], int]:
+    """
+    Lists a directory once with os.scandir and parses the frame number of every matching file.
+    Returns ({(prefix, suffix): array('Q') of frame keys}, total entry count), one group per naming scheme
+    found. A key packs the number and its digit count, so "0001" and "001" stay distinct without keeping
+    one string per frame.
+    """
+    frame_groups = {}
+    entry_count = 0
+
+    def iter_file_names(entries):
+        nonlocal entry_count
+        for entry in entries:
+            entry_count += 1
+            if entry.is_file():
+                yield entry.name
+
+    with os.scandir(directory_path) as entries:
+        for prefix, num_str, suffix in pattern.iter_matches(iter_file_names(entries)):
+            if len(num_str) < (1 << _FRAME_WIDTH_BITS):
+                num_val = int(num_str)
+                if num_val <= _MAX_FRAME_NUMBER:
+                    group = frame_groups.get((prefix, suffix))
+                    if group is None:
+                        group = frame_groups[(prefix, suffix)] = array("Q")
+                    group.append(num_val << _FRAME_WIDTH_BITS | len(num_str))
+    return frame_groups, entry_count
+
+def _runs_from_numbered_frames(frame_keys: array, filename_prefix: str,
+                               filename_suffix: str) -> list[tuple[str, int]]:
+    """Splits parsed frame keys into contiguous (start_number_str, frame_count) runs, in processing order."""
+    keys = array("Q", sorted(frame_keys))  # Ordered by (value, digit count)
+    processed = bytearray(len(keys))
+    width_mask = (1 << _FRAME_WIDTH_BITS) - 1
+    runs = []
+    index = 0
+    while index < len(keys):
+        # Starts are taken in (value, filename) order; only equal values with different paddings need names.
+        group_end = index + 1
+        value = keys[index] >> _FRAME_WIDTH_BITS
+        while group_end < len(keys) and keys[group_end] >> _FRAME_WIDTH_BITS == value:
+            group_end += 1
+        group = range(index, group_end)
+        if len(group) > 1:
+            group = sorted(group, key=lambda i: f"{filename_prefix}{value:0{keys[i] & width_mask}d}{filename_suffix}")
+        for start_index in group:
+            if processed[start_index]:
+                continue
+            # Same walk as ffmpeg's image2 demuxer: %0<width>d from the start number until the first break.
+            width = keys[start_index] & width_mask
+            digits = max(width, len(str(value)))
+            next_digits_at = 10 ** digits  # Numbers past the padding width grow a digit, as "%02d" % 100 does
+            frame_count = 0
+            found_index = start_index
+            while True:
+                expected_val = value + frame_count
+                if expected_val == next_digits_at:
+                    digits += 1
+                    next_digits_at *= 10
+                expected_key = expected_val << _FRAME_WIDTH_BITS | digits
+                if found_index >= len(keys) or keys[found_index] != expected_key:  # Usually the next key
+                    found_index = bisect_left(keys, expected_key, found_index)
+                    if found_index == len(keys) or keys[found_index] != expected_key:
+                        break
+                processed[found_index] = 1
+                found_index += 1
+                frame_count += 1
+            runs.append((f"{value:0{width}d}", frame_count))
+        index = group_end
+    return runs
+
+def _runs_from_frame_groups(frame_groups: dict[tuple[str, str], array]) -> list[tuple[str, str, str, int]]:
+    """Returns (prefix, suffix, start_number_str, frame_count) runs for every naming scheme, ordered by scheme."""
+    return [(prefix, suffix, start_number_str, frame_count)
+            for prefix, suffix in sorted(frame_groups)
+            for start_number_str, frame_count in _runs_from_numbered_frames(frame_groups[(prefix, suffix)],
+                                                                             prefix, suffix)]
+
+def _detect_contiguous_runs(directory_path: Path, filename_prefix: str, filename_suffix: str,
+                            ignore_case: bool = False) -> list[tuple[str, str, str, int]]:
+    """
+    Detects contiguous frame runs from a single os.scandir listing.
+    Returns a list of (prefix, suffix, start_number_str, frame_count) tuples in processing order.
+    Frame numbers are parsed once; no per-frame stat calls are made after the listing.
+    """
+    frame_groups, _ = _list_numbered_frames(
+        directory_path, compile_filename_pattern(filename_prefix, filename_suffix, ignore_case))
+    return _runs_from_frame_groups(frame_groups)
+
+def iter_sequences_in_paths(
+        directory_paths: list[Path],
+        filename_prefix: str,
+        filename_suffix: str,
+        scan_index: ScanIndex | None = None,
+        ignore_case: bool = False,
+        max_frame_gap: int = ENGINE_DEFAULT_MAX_FRAME_GAP
+):
+    """
+    Lightweight enumeration: yields a Sequence (start number, padding, frame count) for every sequence
+    in the given directories. Only lists directories; never probes images or builds ffmpeg commands.
+    """
+    for directory_path in directory_paths:
+        directory_path = Path(directory_path)
+        if not directory_path.is_dir():
+            continue
+        yield from find_sequences_in_dir(directory_path, filename_prefix, filename_suffix, scan_index=scan_index,
+                                         ignore_case=ignore_case, max_frame_gap=max_frame_gap)
+
 def count_total_sequences_in_paths(
         parent_dir_paths: list[Path],
         filename_prefix: str,
-        filename_suffix: str
+        filename_suffix: str,
+        ignore_case: bool = False,
+        max_frame_gap: int = ENGINE_DEFAULT_MAX_FRAME_GAP
 ) -> int:
     """
     Counts the total number of distinct image sequences across multiple parent directories.
     This is a "dry run" version of the sequence detection.
     """
-    total_sequence_count = 0
-    for directory_path in parent_dir_paths:
-        if not directory_path.is_dir():
+    return sum(1 for _ in iter_sequences_in_paths(parent_dir_paths, filename_prefix, filename_suffix,
+                                                  ignore_case=ignore_case, max_frame_gap=max_frame_gap))
+
+
+def find_sequences_in_dir(directory_path: Path, filename_prefix: str, filename_suffix: str,
+                          scan_index: ScanIndex | None = None, ignore_case: bool = False,
+                          max_frame_gap: int = ENGINE_DEFAULT_MAX_FRAME_GAP) -> list[Sequence]:
+    """
+    Returns the sequences in a directory, using the scan index when one is given.
+    filename_prefix and filename_suffix are FilenamePattern texts; each Sequence gets the concrete prefix and
+    suffix its files use, so one pass picks up several naming schemes. Runs separated by at most
+    max_frame_gap missing frames are joined into one sequence (see bridge_frame_gaps).
+    """
+    directory_path = Path(directory_path)
+    scan_start = time.monotonic()
+    if scan_index is not None:
+        runs = scan_index.get_runs(directory_path, filename_prefix, filename_suffix, ignore_case)
+    else:
+        runs = _detect_contiguous_runs(directory_path, filename_prefix, filename_suffix, ignore_case)
+    sequences = bridge_frame_gaps([Sequence(directory_path, prefix, suffix, start_number_str, frame_count)
+                                   for prefix, suffix, start_number_str, frame_count in runs], max_frame_gap)
+    log_event("scan_dir", dir=directory_path, sequences=len(sequences), frames=sum(run[3] for run in runs),
+              duration_s=round(time.monotonic() - scan_start, 4))
+    return sequences
+
+def bridge_frame_gaps(sequences: list[Sequence], max_frame_gap: int) -> list[Sequence]:
+    """
+    Joins sequences of one naming scheme (prefix, suffix and padding) whose numbering resumes after at most
+    max_frame_gap missing frames, so dropped intervalometer frames do not split a shoot into fragments.
+    The joined sequences are encoded from a frame list; see write_frame_list.
+    """
+    if max_frame_gap <= 0 or len(sequences) < 2:
+        return sequences
+    bridged = []
+    previous_by_scheme = {}
+    for sequence in sorted(sequences, key=lambda seq: (seq.filename_prefix, seq.filename_suffix, seq.padding,
+                                                       seq.start_number)):
+        scheme = (sequence.filename_prefix, sequence.filename_suffix, sequence.padding)
+        previous = previous_by_scheme.get(scheme)
+        if previous is not None and 0 <= sequence.start_number - previous.last_number - 1 <= max_frame_gap:
+            for run_index in range(0, len(sequence.frame_runs), 2):
+                previous.append_run(sequence.frame_runs[run_index], sequence.frame_runs[run_index + 1])
             continue
+        bridged.append(sequence)
+        previous_by_scheme[scheme] = sequence
+    return bridged
+
+# --- Camera Folder Rollovers ---
+_DCF_DIR_NAME_RE = re.compile(r"^(\d{3})[0-9A-Za-z_]{5}$")  # DCF camera folders: 100CANON, 101CANON, 102_PANA, ...
+
+def _rollover_dir_key(directory_path: Path) -> tuple:
+    match = _DCF_DIR_NAME_RE.match(directory_path.name)
+    return (0, int(match.group(1)), directory_path.name) if match else (1, 0, directory_path.name)
 
-        all_potential_files_info = []
-        for file_path in directory_path.iterdir():
-            if file_path.is_file():
-                num_str = get_numeric_part(file_path.name, filename_prefix, filename_suffix)
-                if num_str:
-                    try:
-                        all_potential_files_info.append((file_path, num_str, int(num_str)))
-                    except ValueError:
-                        continue
+def _is_dcf_dir(directory_path: Path) -> bool:
+    return _DCF_DIR_NAME_RE.match(directory_path.name) is not None
+
+def _capture_timestamp(image_path: Path) -> float | None:
+    info = probe_image(image_path)
+    capture_time = info.get("capture_time") if info else None
+    if not capture_time:
+        return None
+    try:
+        return datetime.strptime(str(capture_time).strip()[:19], "%Y:%m:%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+
+def _continues_sequence(previous: Sequence, following: Sequence, max_gap_s: float, use_capture_time: bool) -> bool:
+    """
+    True if following picks up where previous stopped. Capture times decide when both frames have them: the
+    gap may be up to max_gap_s, or three of previous's capture intervals if longer. Otherwise both folders
+    must be DCF camera folders (NNNxxxxx) and the numbering must carry on, either directly or by wrapping
+    the counter (IMG_9999 -> IMG_0000/IMG_0001); for other folder names, matching numbers prove nothing.
+    """
+    if use_capture_time:
+        last_time = _capture_timestamp(previous.last_frame_path)
+        next_time = _capture_timestamp(following.first_frame_path)
+        if last_time is not None and next_time is not None:
+            allowed_gap_s = max_gap_s
+            if previous.frame_count > 1:
+                first_time = _capture_timestamp(previous.first_frame_path)
+                if first_time is not None:
+                    allowed_gap_s = max(allowed_gap_s, 3 * (last_time - first_time) / (previous.frame_count - 1))
+            return 0 <= next_time - last_time <= allowed_gap_s
+    if not (_is_dcf_dir(previous.directory_path) and _is_dcf_dir(following.directory_path)):
+        return False
+    if following.start_number == previous.last_number + 1:
+        return True
+    return previous.last_number == 10 ** previous.padding - 1 and following.start_number <= 1
 
-        if not all_potential_files_info: continue
-        all_potential_files_info.sort(key=lambda x: (x[2], x[0].name))
+def merge_rollover_sequences(sequences: list, max_gap_s: float = ENGINE_DEFAULT_ROLLOVER_MAX_GAP_S,
+                             use_capture_time: bool = True) -> list:
+    """
+    Joins sequences split by camera folder rollovers into SequenceChains.
+    Candidates are sequences with the same prefix and suffix in sibling directories, taken in folder number
+    order; the last sequence of one folder is linked to the first of the next when _continues_sequence says
+    so. Returns the sequences in their original order, with each chain in place of its first part.
+    """
+    groups = {}
+    for sequence in sequences:
+        key = (sequence.directory_path.parent, sequence.filename_prefix, sequence.filename_suffix)
+        groups.setdefault(key, []).append(sequence)
+    chain_by_first_part = {}
+    merged_parts = set()
+    for group in groups.values():
+        group.sort(key=lambda seq: (_rollover_dir_key(seq.directory_path), seq.start_number))
+        chain = [group[0]]
+        for previous, following in zip(group, group[1:]):
+            # Sorted by folder, so crossing into the next folder means last-of-folder to first-of-folder
+            crosses_folder = following.directory_path != previous.directory_path
+            if crosses_folder and _continues_sequence(previous, following, max_gap_s, use_capture_time):
+                chain.append(following)
+                continue
+            if len(chain) > 1:
+                chain_by_first_part[id(chain[0])] = SequenceChain(chain)
+                merged_parts.update(id(part) for part in chain[1:])
+            chain = [following]
+        if len(chain) > 1:
+            chain_by_first_part[id(chain[0])] = SequenceChain(chain)
+            merged_parts.update(id(part) for part in chain[1:])
+    return [chain_by_first_part.get(id(sequence), sequence) for sequence in sequences
+            if id(sequence) not in merged_parts]
 
-        processed_files_in_this_dir = set()
-        current_dir_sequence_count = 0
+# --- Frame List Input ---
+def frame_list_path_for_output(output_path: Path) -> Path:
+    """Where the ffconcat frame list for an output (or chunk) file is written: <stem>.frames.ffconcat beside it."""
+    return output_path.with_name(f"{output_path.stem}.frames.ffconcat")
 
-        for start_file_path, start_num_str_from_scan, start_num_val in all_potential_files_info:
-            if start_file_path in processed_files_in_this_dir:
+def write_frame_list(sequence, list_path: Path, input_fps: float, slot_offset: int = 0,
+                     slot_count: int | None = None, hold_gaps: bool = True) -> int:
+    """
+    Writes slots [slot_offset, slot_offset + slot_count) of a sequence as an ffconcat list (see slot_count()).
+    Each frame lasts 1/input_fps; with hold_gaps, a frame followed by missing frames is held for their
+    duration too, so the shoot keeps its timing. A frame held across the start of the range is listed again
+    for its remaining slots, so chunks split inside a gap join seamlessly. Returns the number of slots listed.
+    """
+    frame_seconds = 1.0 / float(input_fps)
+    slot_end = None if slot_count is None else slot_offset + slot_count
+    slot = 0
+    listed_slots = 0
+    last_line = None
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for frame_path, following_gap in sequence.iter_frames():
+            frame_start = slot
+            slot += 1 + following_gap if hold_gaps else 1
+            if slot <= slot_offset:
                 continue
+            if slot_end is not None and frame_start >= slot_end:
+                break
+            frame_slots = (slot if slot_end is None else min(slot, slot_end)) - max(frame_start, slot_offset)
+            last_line = _concat_list_line(frame_path)
+            f.write(last_line)
+            f.write(f"duration {frame_slots * frame_seconds:.9f}\n")
+            listed_slots += frame_slots
+        if last_line:
+            f.write(last_line)  # The concat demuxer drops the last entry's duration unless it is listed again
+    return listed_slots
 
-            current_dir_sequence_count += 1
-            # Simplified counting: just find the start and mark based on that for this count
-            # A more accurate count would do the full contiguous check, but this is faster for total estimation.
-            # For full accuracy, we'd replicate the inner while loop of generate_ffmpeg_commands...
-            # For now, assume each distinct start_file_path found this way is one sequence.
-            # To be more robust for counting, we should at least mark the first file.
-            # A truly robust count would do the inner contiguous counting.
-            # Let's do a slightly more robust count:
+def write_concat_list(concat_list_path: Path, chunk_paths: list[Path]):
+    """Writes the ffconcat list that joins encoded chunks in order."""
+    with open(concat_list_path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for chunk_path in chunk_paths:
+            f.write(_concat_list_line(chunk_path))
 
-            num_digits_for_pattern = len(start_num_str_from_scan)
-            image_pattern_basename_for_count = f"{filename_prefix}%0{num_digits_for_pattern}d{filename_suffix}"
+def remove_frame_list(output_path: Path):
+    """Deletes the frame list written for output_path, if any."""
+    try:
+        frame_list_path_for_output(Path(output_path)).unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Engine Warning: Could not remove frame list for {output_path}: {e}")
 
-            temp_current_num_val = start_num_val
-            sequence_had_frames = False
-            while True:
-                expected_filename = image_pattern_basename_for_count % temp_current_num_val
-                expected_file_path = directory_path / expected_filename
-                if expected_file_path.is_file():
-                    processed_files_in_this_dir.add(expected_file_path)  # Mark as processed for *this dir's count*
-                    sequence_had_frames = True
-                    temp_current_num_val += 1
-                else:
-                    break
-            if not sequence_had_frames:  # If the first file itself didn't start a sequence
-                current_dir_sequence_count -= 1
+def build_ffmpeg_command_for_sequence(sequence: Sequence, common_settings: dict) -> tuple[list[str], Path, int]:
+    """
+    Builds the ffmpeg command for one sequence without touching the filesystem. Returns
+    (ffmpeg_cmd, final_output_path, output_frames), where output_frames is what -vframes allows: the input
+    slots resampled from input_fps to output_fps. For sequences that need a frame list, the command reads
+    frame_list_path_for_output(final_output_path), which write_frame_list() must create before it runs.
+    """
+    directory_path = sequence.directory_path
+    actual_ffmpeg_start_number_str = sequence.start_number_str
+    num_frames_to_process = sequence.slot_count(common_settings.get("hold_frame_gaps", True))
+    image_pattern_basename_for_ffmpeg = sequence.image_pattern
+    first_image_path_of_sequence = sequence.first_frame_path
+
+    # --- HW Accel Scaling Logic (Keep your existing logic here) ---
+    current_scale_filter_from_ui = common_settings.get("scale_filter_string", "");
+    current_resolution_desc_from_ui = common_settings.get("resolution_desc", "Original");
+    video_codec = common_settings.get("video_codec", "libx264")
+    img_width, img_height = 0, 0;
+    # The width is only used for the NVENC auto-downscale below, so other jobs never start a probe
+    if not current_scale_filter_from_ui and video_codec in ("h264_nvenc", "hevc_nvenc"):
+        dimensions = get_image_dimensions(first_image_path_of_sequence)
+        if dimensions:
+            img_width, img_height = dimensions
+        else:
+            print(f"  Engine Warning: Could not get dimensions for {first_image_path_of_sequence.name}.")
+    MAX_NVENC_H264_WIDTH = 4096;
+    MAX_NVENC_HEVC_WIDTH = 8192;
+    needs_hw_scaling_adjustment = False;
+    target_hw_scale_width = 0
+    if img_width > 0 and not current_scale_filter_from_ui:
+        if video_codec == "h264_nvenc" and img_width > MAX_NVENC_H264_WIDTH:
+            needs_hw_scaling_adjustment = True; target_hw_scale_width = MAX_NVENC_H264_WIDTH
+        elif video_codec == "hevc_nvenc" and img_width > MAX_NVENC_H264_WIDTH:
+            needs_hw_scaling_adjustment = True; target_hw_scale_width = MAX_NVENC_H264_WIDTH  # Simplified
+    effective_scale_filter = current_scale_filter_from_ui;
+    effective_resolution_desc = current_resolution_desc_from_ui
+    if needs_hw_scaling_adjustment:
+        effective_scale_filter = f"scale={target_hw_scale_width}:-2:flags=lanczos";
+        effective_resolution_desc = f"AutoScaled-{target_hw_scale_width}w"
+    # --- End HW Accel Scaling Logic ---
+
+    # --- Construct Filename ---
+    # Use user-defined base name if provided, else use directory name
+    user_defined_basename = common_settings.get("output_basename_ui", "").strip()
+    file_base = user_defined_basename if user_defined_basename else directory_path.name
 
-        total_sequence_count += current_dir_sequence_count
-    return total_sequence_count
+    seq_tag = f"seq{actual_ffmpeg_start_number_str}"
+    # A filename pattern can match several naming schemes in one folder; name them apart so outputs don't collide
+    if (sequence.filename_prefix, sequence.filename_suffix) != (
+            common_settings.get("filename_prefix_ui", sequence.filename_prefix),
+            common_settings.get("filename_suffix_ui", sequence.filename_suffix)):
+        scheme_tag = re.sub(r"[^A-Za-z0-9]+", "", sequence.filename_prefix + sequence.filename_suffix)
+        seq_tag = f"{scheme_tag}_{seq_tag}" if scheme_tag else seq_tag
+    codec_for_fn = video_codec.replace("_nvenc", "Nvenc").replace("_qsv", "QSV").replace("_amf", "AMF")
+
+    output_filename_parts = [file_base, seq_tag, codec_for_fn]  # Use file_base
+    # ... (Rest of your existing output_filename_parts construction) ...
+    if common_settings.get("prores_profile_val") is not None and video_codec == "prores_ks":
+        for pk, pv in common_settings.get("prores_profiles_map", {}).items():
+            if pv == common_settings["prores_profile_val"]: output_filename_parts.append(
+                f"p{pk.lower()}"); break
+    if common_settings.get("dnx_bitrate_or_profile") and video_codec == "dnxhd":
+        output_filename_parts.append(
+            common_settings["dnx_bitrate_or_profile"].replace("dnxhr_", "").replace("M", "").replace("K", ""))
+    output_filename_parts.append(
+        f"{common_settings.get('input_fps', 10.0)}in-{common_settings.get('output_fps', 30.0)}out")
+    if common_settings.get("hw_cq_value") is not None and common_settings.get("hwaccel_type", "none") != "none":
+        output_filename_parts.append(f"cq{common_settings['hw_cq_value']}")
+    elif common_settings.get("is_crf_based") and common_settings.get("crf_value") is not None:
+        output_filename_parts.append(f"crf{common_settings['crf_value']}")
+    if common_settings.get("hw_preset"):
+        output_filename_parts.append(common_settings['hw_preset'])
+    elif common_settings.get("codec_preset"):
+        if video_codec == "libvpx-vp9":
+            output_filename_parts.append(f"dl{common_settings['codec_preset']}")
+            if common_settings.get("vp9_cpu_used") is not None: output_filename_parts.append(
+                f"cpu{common_settings['vp9_cpu_used']}")
+        elif video_codec in ["libx264", "libx265"]:
+            output_filename_parts.append(common_settings['codec_preset'])
+
+    if effective_scale_filter:
+        res_tag_fn = effective_resolution_desc.split('(')[0].strip().replace(' ', '_').replace('%_of_original',
+                                                                                               '%orig').lower()
+        output_filename_parts.append(res_tag_fn)
+    else:
+        output_filename_parts.append("orig")
+
+    output_video_filename = "_".join(str(p) for p in output_filename_parts if p) + common_settings.get(
+        "output_extension", ".mp4")
+    final_output_path = common_settings.get("main_output_dir", Path(".")) / output_video_filename
+
+    # ... (Rest of your FFmpeg command construction using effective_scale_filter etc. - keep as is) ...
+    if sequence.needs_frame_list:
+        input_args = ['-f', 'concat', '-safe', '0', '-i', str(frame_list_path_for_output(final_output_path))]
+    else:
+        input_args = ['-framerate', str(common_settings.get('input_fps', 10.0)), '-start_number',
+                      actual_ffmpeg_start_number_str, '-i', str(directory_path / image_pattern_basename_for_ffmpeg)]
+    num_frames_to_process = output_frame_count(num_frames_to_process, common_settings.get('input_fps', 10.0),
+                                               common_settings.get('output_fps', 30.0))
+    ffmpeg_cmd = ['ffmpeg', '-y', *input_args, '-vframes', str(num_frames_to_process)]
+    final_vf_string = ""
+    if effective_scale_filter: final_vf_string = effective_scale_filter
+    if common_settings.get("pixel_format_final"):
+        if final_vf_string:
+            final_vf_string += f",format={common_settings['pixel_format_final']}"
+        else:
+            final_vf_string = f"format={common_settings['pixel_format_final']}"
+    if final_vf_string: ffmpeg_cmd.extend(['-vf', final_vf_string])
+    ffmpeg_cmd.extend(['-c:v', video_codec])
+    is_hw_encoder_active = (
+                common_settings.get("hwaccel_type", "none") != "none" and video_codec != common_settings.get(
+            "base_codec"))
+    if is_hw_encoder_active:
+        if common_settings.get("hw_cq_value") is not None:
+            hw_type = common_settings.get("hwaccel_type");
+            cq_value = str(common_settings['hw_cq_value'])
+            if hw_type == "nvenc":
+                ffmpeg_cmd.extend(['-cq', cq_value])
+            elif hw_type == "qsv":
+                ffmpeg_cmd.extend(['-global_quality', cq_value])
+            elif hw_type == "amf":
+                print(
+                    f"Engine Note: AMF CQ/QP for {final_output_path} may need specific flags for CQ {cq_value}.")
+        if common_settings.get("hw_preset"):
+            hw_type = common_settings.get("hwaccel_type");
+            hw_preset_val = common_settings['hw_preset']
+            if hw_type == "nvenc":
+                ffmpeg_cmd.extend(['-preset:v', hw_preset_val])
+            elif hw_type == "amf":
+                ffmpeg_cmd.extend(['-quality', hw_preset_val])
+            elif hw_type == "qsv" and hw_preset_val:
+                print(f"Engine Note: QSV preset '{hw_preset_val}' for {final_output_path} selected.")
+    else:  # Software params
+        if common_settings.get("codec_preset"):
+            if video_codec == "libvpx-vp9":
+                ffmpeg_cmd.extend(['-deadline', common_settings['codec_preset']])
+            elif video_codec in ["libx264", "libx265"]:
+                ffmpeg_cmd.extend(['-preset', common_settings['codec_preset']])
+        if common_settings.get("is_crf_based") and common_settings.get("crf_value") is not None:
+            ffmpeg_cmd.extend(['-crf', str(common_settings['crf_value'])])
+            if video_codec == "libvpx-vp9": ffmpeg_cmd.extend(['-b:v', '0'])
+        if common_settings.get(
+            "prores_profile_val") is not None and video_codec == "prores_ks": ffmpeg_cmd.extend(
+            ['-profile:v', str(common_settings['prores_profile_val'])])
+        if common_settings.get("dnx_bitrate_or_profile") and video_codec == "dnxhd":
+            dnx_val = common_settings.get("dnx_bitrate_or_profile", "")
+            if dnx_val.lower().endswith(('m', 'k')):
+                ffmpeg_cmd.extend(['-b:v', dnx_val])
+            else:
+                ffmpeg_cmd.extend(['-profile:v', dnx_val])
+        if common_settings.get("vp9_cpu_used") is not None and video_codec == "libvpx-vp9": ffmpeg_cmd.extend(
+            ['-cpu-used', str(common_settings['vp9_cpu_used'])])
+    ffmpeg_cmd.extend(['-r', str(common_settings.get('output_fps', 30.0)), '-pix_fmt',
+                       common_settings.get('pixel_format_final', 'yuv420p'), str(final_output_path)])
+
+    return ffmpeg_cmd, final_output_path, num_frames_to_process
 
 
-# Modify generate_ffmpeg_commands_for_sequences_in_dir for the new output_basename_ui
 def generate_ffmpeg_commands_for_sequences_in_dir(
         directory_path: Path,
         filename_prefix: str,
         filename_suffix: str,
-        common_settings: dict
+        common_settings: dict,
+        ignore_case: bool = False
 ):
-    # ... (Existing logic at the start: find all_potential_files_info, sort, etc. - keep as is) ...
-    directory_path = Path(directory_path)
-    all_potential_files_info = []
-    for file_path in directory_path.iterdir():
-        if file_path.is_file():
-            num_str = get_numeric_part(file_path.name, filename_prefix, filename_suffix)
-            if num_str:
-                try:
-                    all_potential_files_info.append((file_path, num_str, int(num_str)))
-                except ValueError:
-                    continue
-    if not all_potential_files_info: return
-    all_potential_files_info.sort(key=lambda x: (x[2], x[0].name))
-    processed_files_in_this_dir = set()
-    sequences_found_count = 0
-
-    for start_file_path, start_num_str_from_scan, start_num_val in all_potential_files_info:
-        if start_file_path in processed_files_in_this_dir: continue
-        sequences_found_count += 1
-        num_digits_for_pattern = len(start_num_str_from_scan)
-        image_pattern_basename_for_ffmpeg = f"{filename_prefix}%0{num_digits_for_pattern}d{filename_suffix}"
-        frames_in_this_sequence_paths = []
-        temp_current_num_val = start_num_val
-        while True:
-            expected_filename = image_pattern_basename_for_ffmpeg % temp_current_num_val
-            expected_file_path = directory_path / expected_filename
-            if expected_file_path.is_file():
-                frames_in_this_sequence_paths.append(expected_file_path)
-                processed_files_in_this_dir.add(expected_file_path)
-                temp_current_num_val += 1
-            else:
-                break
+    for sequence in find_sequences_in_dir(directory_path, filename_prefix, filename_suffix, ignore_case=ignore_case,
+                                          max_frame_gap=common_settings.get("max_frame_gap",
+                                                                            ENGINE_DEFAULT_MAX_FRAME_GAP)):
+        yield build_ffmpeg_command_for_sequence(sequence, common_settings)
 
-        if frames_in_this_sequence_paths:
-            num_frames_to_process = len(frames_in_this_sequence_paths)
-            actual_ffmpeg_start_number_str = get_numeric_part(frames_in_this_sequence_paths[0].name, filename_prefix,
-                                                              filename_suffix)
-            first_image_path_of_sequence = frames_in_this_sequence_paths[0]
-
-            # --- HW Accel Scaling Logic (Keep your existing logic here) ---
-            img_width, img_height = 0, 0;
-            dimensions = get_image_dimensions(first_image_path_of_sequence)
-            if dimensions:
-                img_width, img_height = dimensions
-            else:
-                print(f"  Engine Warning: Could not get dimensions for {first_image_path_of_sequence.name}.")
-            current_scale_filter_from_ui = common_settings.get("scale_filter_string", "");
-            current_resolution_desc_from_ui = common_settings.get("resolution_desc", "Original");
-            video_codec = common_settings.get("video_codec", "libx264")
-            MAX_NVENC_H264_WIDTH = 4096;
-            MAX_NVENC_HEVC_WIDTH = 8192;
-            needs_hw_scaling_adjustment = False;
-            target_hw_scale_width = 0
-            if img_width > 0 and not current_scale_filter_from_ui:
-                if video_codec == "h264_nvenc" and img_width > MAX_NVENC_H264_WIDTH:
-                    needs_hw_scaling_adjustment = True; target_hw_scale_width = MAX_NVENC_H264_WIDTH
-                elif video_codec == "hevc_nvenc" and img_width > MAX_NVENC_H264_WIDTH:
-                    needs_hw_scaling_adjustment = True; target_hw_scale_width = MAX_NVENC_H264_WIDTH  # Simplified
-            effective_scale_filter = current_scale_filter_from_ui;
-            effective_resolution_desc = current_resolution_desc_from_ui
-            if needs_hw_scaling_adjustment:
-                effective_scale_filter = f"scale={target_hw_scale_width}:-2:flags=lanczos";
-                effective_resolution_desc = f"AutoScaled-{target_hw_scale_width}w"
-            # --- End HW Accel Scaling Logic ---
-
-            # --- Construct Filename ---
-            # Use user-defined base name if provided, else use directory name
-            user_defined_basename = common_settings.get("output_basename_ui", "").strip()
-            file_base = user_defined_basename if user_defined_basename else directory_path.name
-
-            seq_tag = f"seq{actual_ffmpeg_start_number_str}"
-            codec_for_fn = video_codec.replace("_nvenc", "Nvenc").replace("_qsv", "QSV").replace("_amf", "AMF")
-
-            output_filename_parts = [file_base, seq_tag, codec_for_fn]  # Use file_base
-            # ... (Rest of your existing output_filename_parts construction) ...
-            if common_settings.get("prores_profile_val") is not None and video_codec == "prores_ks":
-                for pk, pv in common_settings.get("prores_profiles_map", {}).items():
-                    if pv == common_settings["prores_profile_val"]: output_filename_parts.append(
-                        f"p{pk.lower()}"); break
-            if common_settings.get("dnx_bitrate_or_profile") and video_codec == "dnxhd":
-                output_filename_parts.append(
-                    common_settings["dnx_bitrate_or_profile"].replace("dnxhr_", "").replace("M", "").replace("K", ""))
-            output_filename_parts.append(
-                f"{common_settings.get('input_fps', 10.0)}in-{common_settings.get('output_fps', 30.0)}out")
-            if common_settings.get("hw_cq_value") is not None and common_settings.get("hwaccel_type", "none") != "none":
-                output_filename_parts.append(f"cq{common_settings['hw_cq_value']}")
-            elif common_settings.get("is_crf_based") and common_settings.get("crf_value") is not None:
-                output_filename_parts.append(f"crf{common_settings['crf_value']}")
-            if common_settings.get("hw_preset"):
-                output_filename_parts.append(common_settings['hw_preset'])
-            elif common_settings.get("codec_preset"):
-                if video_codec == "libvpx-vp9":
-                    output_filename_parts.append(f"dl{common_settings['codec_preset']}")
-                    if common_settings.get("vp9_cpu_used") is not None: output_filename_parts.append(
-                        f"cpu{common_settings['vp9_cpu_used']}")
-                elif video_codec in ["libx264", "libx265"]:
-                    output_filename_parts.append(common_settings['codec_preset'])
-
-            if effective_scale_filter:
-                res_tag_fn = effective_resolution_desc.split('(')[0].strip().replace(' ', '_').replace('%_of_original',
-                                                                                                       '%orig').lower()
-                output_filename_parts.append(res_tag_fn)
+
+# --- Chunked Encoding ---
+ENGINE_MIN_FRAMES_PER_CHUNK = 500  # Below this, ffmpeg startup and the concat pass outweigh the parallel gain
+
+def _frame_rate_ratio(input_fps: float, output_fps: float) -> Fraction:
+    return Fraction(output_fps).limit_denominator(1001) / Fraction(input_fps).limit_denominator(1001)
+
+def output_frame_count(input_frames: int, input_fps: float, output_fps: float) -> int:
+    """Frames written for input_frames read at input_fps and resampled to output_fps (-r), rounded to nearest."""
+    if input_frames <= 0:
+        return 0
+    return max(1, math.floor(input_frames * _frame_rate_ratio(input_fps, output_fps) + Fraction(1, 2)))
+
+def sequence_output_frames(sequence, common_settings: dict) -> int:
+    """Output frames of a whole-sequence encode; the unit of ffmpeg's progress reports and of batch totals."""
+    return output_frame_count(sequence.slot_count(common_settings.get("hold_frame_gaps", True)),
+                              common_settings.get('input_fps', 10.0), common_settings.get('output_fps', 30.0))
+
+def plan_chunk_ranges(frame_count: int, chunk_count: int, input_fps: float, output_fps: float,
+                      min_frames_per_chunk: int = ENGINE_MIN_FRAMES_PER_CHUNK) -> list[tuple[int, int]]:
+    """
+    Splits a sequence of frame_count input slots into up to chunk_count (slot_offset, slot_count) ranges.
+    Every chunk except the last is a multiple of the input/output frame-rate ratio's denominator, so each
+    chunk maps to a whole number of output frames and the joined file has the same frame count as a
+    single-process encode.
+    """
+    frame_step = _frame_rate_ratio(input_fps, output_fps).denominator
+    chunk_count = max(1, min(chunk_count, frame_count // max(1, min_frames_per_chunk)))
+    if chunk_count <= 1:
+        return [(0, frame_count)]
+    chunk_frames = max(frame_step, (frame_count // chunk_count) // frame_step * frame_step)
+    ranges = []
+    frame_offset = 0
+    while frame_offset < frame_count and len(ranges) < chunk_count - 1:
+        ranges.append((frame_offset, min(chunk_frames, frame_count - frame_offset)))
+        frame_offset += chunk_frames
+    if frame_offset < frame_count:
+        ranges.append((frame_offset, frame_count - frame_offset))
+    return ranges
+
+def _concat_list_line(path: Path) -> str:
+    # The concat demuxer resolves relative entries against the list's directory, not the working directory
+    return "file '" + os.path.abspath(path).replace("'", "'\\''") + "'\n"
+
+def build_chunked_ffmpeg_commands(sequence: Sequence, common_settings: dict, chunk_count: int):
+    """
+    Builds commands to encode one sequence as parallel chunks joined losslessly, without touching the filesystem.
+    Each chunk selects its slots with -start_number/-vframes (or its own frame list, for sequences that need
+    one) and is encoded with closed GOPs; the chunks are then joined by the concat demuxer with stream copy.
+    Returns (chunk_jobs, concat_cmd, final_output_path, concat_list_path), where chunk_jobs is a list of
+    (ffmpeg_cmd, chunk_output_path, chunk_output_frames, (slot_offset, slot_count)). chunk_jobs has one entry
+    when chunking is not worthwhile. Before a job runs, its frame list (if the sequence needs one) is written
+    with write_frame_list() and, before the join, the concat list with write_concat_list().
+    """
+    input_fps = common_settings.get('input_fps', 10.0)
+    output_fps = common_settings.get('output_fps', 30.0)
+    ffmpeg_cmd, final_output_path, num_frames_to_process = build_ffmpeg_command_for_sequence(sequence, common_settings)
+    input_slots = sequence.slot_count(common_settings.get("hold_frame_gaps", True))
+    chunk_ranges = plan_chunk_ranges(input_slots, chunk_count, input_fps, output_fps)
+    if len(chunk_ranges) == 1:
+        return [(ffmpeg_cmd, final_output_path, num_frames_to_process, (0, input_slots))], None, final_output_path, None
+
+    if sequence.needs_frame_list:
+        input_index = ffmpeg_cmd.index('-i') + 1
+    else:
+        start_number_index = ffmpeg_cmd.index('-start_number') + 1
+    vframes_index = ffmpeg_cmd.index('-vframes') + 1
+    chunk_jobs = []
+    for chunk_index, (slot_offset, slot_count) in enumerate(chunk_ranges):
+        chunk_output_path = final_output_path.with_name(
+            f"{final_output_path.stem}.part{chunk_index:03d}{final_output_path.suffix}")
+        chunk_cmd = list(ffmpeg_cmd)
+        if sequence.needs_frame_list:
+            chunk_cmd[input_index] = str(frame_list_path_for_output(chunk_output_path))
+        else:
+            chunk_cmd[start_number_index] = str(sequence.start_number + slot_offset)
+        chunk_frames = output_frame_count(slot_count, input_fps, output_fps)
+        chunk_cmd[vframes_index] = str(chunk_frames)  # -vframes counts output frames, not input frames
+        chunk_cmd[-1:] = ['-flags', '+cgop', str(chunk_output_path)]  # Closed GOPs so every chunk stands alone
+        chunk_jobs.append((chunk_cmd, chunk_output_path, chunk_frames, (slot_offset, slot_count)))
+
+    concat_list_path = final_output_path.with_name(f"{final_output_path.stem}.concat.txt")
+    concat_cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', str(concat_list_path),
+                  '-c', 'copy', str(final_output_path)]
+    return chunk_jobs, concat_cmd, final_output_path, concat_list_path
+
+class BatchScheduler:
+    """
+    Decides which ffmpeg job of a batch starts next; the GUI and the CLI only run the jobs it hands out.
+    Each sequence becomes one "sequence" job, or "chunk" jobs followed by a "concat" job that joins them.
+    Chunks and joins of sequences already started go before new sequences. A job's frame list or concat list
+    is written when it is handed out, so nothing is left on disk for jobs that never start. When a chunk
+    fails, the other pending chunks of its sequence are dropped and job_finished() returns the running ones
+    for the caller to stop, and a group's temporary files are removed once it is done.
+    Frames are output frames, the unit of ffmpeg's progress reports: finished_frames counts finished, skipped
+    and dropped work, total_frames the whole batch. Not thread-safe; call it from one thread.
+    """
+    def __init__(self, sequences: list, common_settings: dict, chunks_per_sequence: int = 1, log=print,
+                 on_sequence_finished=None):
+        self.common_settings = common_settings
+        self.chunks_per_sequence = max(1, chunks_per_sequence)
+        self.log = log
+        self.on_sequence_finished = on_sequence_finished  # Called as (sequence, success, output description)
+        self.sequence_count = len(sequences)
+        self.total_frames = sum(sequence_output_frames(sequence, common_settings) for sequence in sequences)
+        self.finished_frames = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = False
+        self._sequence_queue = deque(sequences)
+        self._pending_jobs = deque()
+        self._running_jobs = {}  # Job id -> job, for jobs handed out and not yet finished
+        self._next_job_id = 0
+
+    @property
+    def sequences_finished(self) -> int:
+        return self.succeeded + self.failed
+
+    @property
+    def has_queued_jobs(self) -> bool:
+        """True while next_job() can still hand out work; the batch is over once this is False and nothing runs."""
+        return not self.cancelled and bool(self._pending_jobs or self._sequence_queue)
+
+    def next_job(self) -> dict | None:
+        """
+        The next job to start, with its input list already written, or None if there is none. Jobs are dicts
+        with "id", "kind" ("sequence", "chunk" or "concat"), "cmd", "output_path", "total_frames",
+        "frames_done", "sequence", "group" and "slot_range".
+        """
+        while not self.cancelled:
+            if self._pending_jobs:
+                job = self._pending_jobs.popleft()
+            elif self._sequence_queue:
+                self._queue_sequence(self._sequence_queue.popleft())
+                continue
             else:
-                output_filename_parts.append("orig")
-
-            output_video_filename = "_".join(str(p) for p in output_filename_parts if p) + common_settings.get(
-                "output_extension", ".mp4")
-            final_output_path = common_settings.get("main_output_dir", Path(".")) / output_video_filename
-
-            # ... (Rest of your FFmpeg command construction using effective_scale_filter etc. - keep as is) ...
-            ffmpeg_cmd = ['ffmpeg', '-y', '-framerate', str(common_settings.get('input_fps', 10.0)), '-start_number',
-                          actual_ffmpeg_start_number_str, '-i', str(directory_path / image_pattern_basename_for_ffmpeg),
-                          '-vframes', str(num_frames_to_process)]
-            final_vf_string = ""
-            if effective_scale_filter: final_vf_string = effective_scale_filter
-            if common_settings.get("pixel_format_final"):
-                if final_vf_string:
-                    final_vf_string += f",format={common_settings['pixel_format_final']}"
+                return None
+            try:
+                self._write_job_inputs(job)
+            except OSError as e:
+                self.log(f"  Could not write the input list for {Path(job['output_path']).name}: {e}")
+                self.job_finished(job, False)
+                continue
+            self._running_jobs[job["id"]] = job
+            return job
+        return None
+
+    def _queue_sequence(self, sequence):
+        self.log(f"--- Preparing sequence starting ~{sequence.start_number_str} in {sequence.directory_path.name}"
+                 f" ({self.sequence_count - len(self._sequence_queue)}/{self.sequence_count}) ---")
+        chunk_jobs = None
+        try:
+            chunk_jobs, concat_cmd, output_path, concat_list_path = build_chunked_ffmpeg_commands(
+                sequence, self.common_settings, self.chunks_per_sequence)
+        except Exception as e:
+            self.log(f"  Error building FFmpeg command: {e}")
+        if not chunk_jobs:
+            self.log(f"  Could not generate command for sequence starting ~{sequence.start_number_str}. Skipping.")
+            self.finished_frames += sequence_output_frames(sequence, self.common_settings)
+            self._finish_sequence(sequence, False, f"Sequence starting {sequence.start_number_str} (no command)")
+        elif concat_cmd is None:
+            cmd, _, frames, slot_range = chunk_jobs[0]
+            self._pending_jobs.append(self._new_job("sequence", cmd, output_path, frames, sequence,
+                                                    slot_range=slot_range))
+        else:
+            self.log(f"  Splitting {sequence.frame_count} frames into {len(chunk_jobs)} parallel chunks.")
+            group = {"remaining": len(chunk_jobs), "failed": False, "output_path": output_path,
+                     "total_frames": sum(frames for _, _, frames, _ in chunk_jobs), "concat_cmd": concat_cmd,
+                     "concat_list_path": concat_list_path, "chunk_paths": [path for _, path, _, _ in chunk_jobs]}
+            self._pending_jobs.extend(self._new_job("chunk", chunk_cmd, chunk_path, chunk_frames, sequence, group,
+                                                    slot_range)
+                                      for chunk_cmd, chunk_path, chunk_frames, slot_range in chunk_jobs)
+
+    def _write_job_inputs(self, job: dict):
+        if job["kind"] == "concat":
+            write_concat_list(job["group"]["concat_list_path"], job["group"]["chunk_paths"])
+        elif job["sequence"].needs_frame_list:
+            write_frame_list(job["sequence"], frame_list_path_for_output(job["output_path"]),
+                             self.common_settings.get('input_fps', 10.0), *job["slot_range"],
+                             hold_gaps=self.common_settings.get("hold_frame_gaps", True))
+
+    def job_finished(self, job: dict, success: bool) -> list[dict]:
+        """
+        Books a finished job: counts its frames, queues the join of completed chunk groups and cleans up.
+        Returns the still running jobs that should be stopped, the sibling chunks of a chunk that just failed;
+        pass each of them back here as failed once it has ended.
+        """
+        self._running_jobs.pop(job["id"], None)
+        group = job["group"]
+        jobs_to_stop = []
+        if job["kind"] == "sequence":
+            remove_frame_list(job["output_path"])
+            self.finished_frames += job["total_frames"]
+            self._finish_sequence(job["sequence"], success, str(job["output_path"]))
+        elif job["kind"] == "chunk":
+            group["remaining"] -= 1
+            newly_failed = not group["failed"] and (not success or self.cancelled)
+            group["failed"] = group["failed"] or newly_failed
+            self.finished_frames += job["total_frames"]  # Chunk frames count as soon as they are encoded
+            if group["failed"]:  # No point encoding the rest of a sequence that cannot be joined
+                for pending_job in [j for j in self._pending_jobs if j["group"] is group]:
+                    self._pending_jobs.remove(pending_job)
+                    group["remaining"] -= 1
+                    self.finished_frames += pending_job["total_frames"]
+            if newly_failed:
+                jobs_to_stop = [j for j in self._running_jobs.values() if j["group"] is group]
+            if group["remaining"] == 0:
+                if group["failed"]:
+                    self._remove_chunk_files(group)
+                    self._finish_sequence(job["sequence"], False, f"{group['output_path']} (chunk failed)")
                 else:
-                    final_vf_string = f"format={common_settings['pixel_format_final']}"
-            if final_vf_string: ffmpeg_cmd.extend(['-vf', final_vf_string])
-            ffmpeg_cmd.extend(['-c:v', video_codec])
-            is_hw_encoder_active = (
-                        common_settings.get("hwaccel_type", "none") != "none" and video_codec != common_settings.get(
-                    "base_codec"))
-            if is_hw_encoder_active:
-                if common_settings.get("hw_cq_value") is not None:
-                    hw_type = common_settings.get("hwaccel_type");
-                    cq_value = str(common_settings['hw_cq_value'])
-                    if hw_type == "nvenc":
-                        ffmpeg_cmd.extend(['-cq', cq_value])
-                    elif hw_type == "qsv":
-                        ffmpeg_cmd.extend(['-global_quality', cq_value])
-                    elif hw_type == "amf":
-                        print(
-                            f"Engine Note: AMF CQ/QP for {final_output_path} may need specific flags for CQ {cq_value}.")
-                if common_settings.get("hw_preset"):
-                    hw_type = common_settings.get("hwaccel_type");
-                    hw_preset_val = common_settings['hw_preset']
-                    if hw_type == "nvenc":
-                        ffmpeg_cmd.extend(['-preset:v', hw_preset_val])
-                    elif hw_type == "amf":
-                        ffmpeg_cmd.extend(['-quality', hw_preset_val])
-                    elif hw_type == "qsv" and hw_preset_val:
-                        print(f"Engine Note: QSV preset '{hw_preset_val}' for {final_output_path} selected.")
-            else:  # Software params
-                if common_settings.get("codec_preset"):
-                    if video_codec == "libvpx-vp9":
-                        ffmpeg_cmd.extend(['-deadline', common_settings['codec_preset']])
-                    elif video_codec in ["libx264", "libx265"]:
-                        ffmpeg_cmd.extend(['-preset', common_settings['codec_preset']])
-                if common_settings.get("is_crf_based") and common_settings.get("crf_value") is not None:
-                    ffmpeg_cmd.extend(['-crf', str(common_settings['crf_value'])])
-                    if video_codec == "libvpx-vp9": ffmpeg_cmd.extend(['-b:v', '0'])
-                if common_settings.get(
-                    "prores_profile_val") is not None and video_codec == "prores_ks": ffmpeg_cmd.extend(
-                    ['-profile:v', str(common_settings['prores_profile_val'])])
-                if common_settings.get("dnx_bitrate_or_profile") and video_codec == "dnxhd":
-                    dnx_val = common_settings.get("dnx_bitrate_or_profile", "")
-                    if dnx_val.lower().endswith(('m', 'k')):
-                        ffmpeg_cmd.extend(['-b:v', dnx_val])
-                    else:
-                        ffmpeg_cmd.extend(['-profile:v', dnx_val])
-                if common_settings.get("vp9_cpu_used") is not None and video_codec == "libvpx-vp9": ffmpeg_cmd.extend(
-                    ['-cpu-used', str(common_settings['vp9_cpu_used'])])
-            ffmpeg_cmd.extend(['-r', str(common_settings.get('output_fps', 30.0)), '-pix_fmt',
-                               common_settings.get('pixel_format_final', 'yuv420p'), str(final_output_path)])
-
-            yield ffmpeg_cmd, final_output_path, num_frames_to_process
-
-    # if sequences_found_count == 0: # No need to print from engine, GUI can handle it
-    #     pass
\ No newline at end of file
+                    self.log(f"  All chunks done, joining into {group['output_path'].name}...")
+                    self._pending_jobs.appendleft(self._new_job("concat", group["concat_cmd"], group["output_path"],
+                                                                group["total_frames"], job["sequence"], group))
+        elif job["kind"] == "concat":
+            self._remove_chunk_files(group)
+            self._finish_sequence(job["sequence"], success, str(job["output_path"]))
+        return jobs_to_stop
+
+    def cancel(self):
+        """
+        Stops handing out jobs and drops the pending ones. Chunk groups with nothing left running are removed
+        now; the others once their last running chunk is passed to job_finished().
+        """
+        self.cancelled = True
+        pending_jobs, self._pending_jobs = self._pending_jobs, deque()
+        for job in pending_jobs:
+            group = job["group"]
+            group["failed"] = True
+            if job["kind"] == "chunk":
+                group["remaining"] -= 1
+                self.finished_frames += job["total_frames"]
+            if group["remaining"] == 0:  # Its last pending chunk, or a join that will never run
+                self._remove_chunk_files(group)
+                self._finish_sequence(job["sequence"], False, f"{group['output_path']} (cancelled)")
+
+    def _new_job(self, kind: str, cmd: list, output_path: Path, total_frames: int, sequence, group=None,
+                 slot_range=None) -> dict:
+        self._next_job_id += 1
+        return {"id": self._next_job_id, "kind": kind, "cmd": cmd, "output_path": output_path,
+                "total_frames": total_frames, "frames_done": 0, "sequence": sequence, "group": group,
+                "slot_range": slot_range}
+
+    def _finish_sequence(self, sequence, success: bool, description: str):
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        if self.on_sequence_finished is not None:
+            self.on_sequence_finished(sequence, success, description)
+
+    def _remove_chunk_files(self, group: dict):
+        for chunk_path in group["chunk_paths"]:
+            remove_frame_list(chunk_path)
+        for leftover_path in group["chunk_paths"] + [group["concat_list_path"]]:
+            try:
+                Path(leftover_path).unlink(missing_ok=True)
+            except OSError as e:
+                self.log(f"  Could not remove temporary chunk file {leftover_path}: {e}")